@@ -27,6 +27,15 @@ applied to my aio_aws project.
     - https://github.com/spulec/moto/blob/master/tests/test_batch/test_batch.py
 """
 
+import copy
+from functools import partial
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import pytest
 import pytest_asyncio
 from aiobotocore.config import AioConfig
 from aiobotocore.session import AioSession
@@ -35,138 +44,216 @@ from aiobotocore.session import get_session
 from pytest_aiomoto.aiomoto_batch import AioAwsBatchClients
 from pytest_aiomoto.aiomoto_batch import AioAwsBatchInfrastructure
 from pytest_aiomoto.aiomoto_batch import aio_batch_infrastructure
+from pytest_aiomoto.aiomoto_inprocess import aio_moto_inprocess_register
 from pytest_aiomoto.aiomoto_services import AioMotoService
-from pytest_aiomoto.moto_services import moto_service_reset
+from pytest_aiomoto.aiomoto_services import aio_moto_service
+from pytest_aiomoto.aiomoto_services import aio_moto_service_pool
+from pytest_aiomoto.aiomoto_services import aio_moto_services
+from pytest_aiomoto.aws_batch_models import AWS_BATCH_SERVICES
+from pytest_aiomoto.moto_backends import BackendSnapshot
+from pytest_aiomoto.moto_backends import isolated_account
+from pytest_aiomoto.moto_services import MOTO_ALL_SERVICES
+from pytest_aiomoto.moto_services import MOTO_SERVER_PROCESS
+from pytest_aiomoto.moto_services import moto_resets
+from pytest_aiomoto.plugin import aiomoto_option
+from pytest_aiomoto.plugin import aiomoto_server_options
+from pytest_aiomoto.utils import AIO_AWS_CONCURRENCY
 from pytest_aiomoto.utils import AWS_ACCESS_KEY_ID
 from pytest_aiomoto.utils import AWS_SECRET_ACCESS_KEY
 
 
+@pytest.fixture(scope="session")
+def aio_aws_server_options(pytestconfig) -> Dict:
+    """
+    Options for any AioMotoService, from the aiomoto plugin options
+    """
+    return aiomoto_server_options(pytestconfig)
+
+
+@pytest.fixture(scope="session")
+def aio_aws_moto_server(pytestconfig, aio_aws_server_options) -> Optional[AioMotoService]:
+    """
+    AioMotoService(MOTO_ALL_SERVICES) for the session, when the
+    `aiomoto_shared_server` ini option or the `--aiomoto-shared-server`
+    flag is enabled; otherwise this is None and each aio_aws_*_server
+    fixture starts a moto server for the service.  The server is kept in
+    the session pool, so it can be started early by the `aiomoto_preload`
+    option and it is stopped when the session finishes.
+    """
+    if not aiomoto_option(pytestconfig, "aiomoto_shared_server"):
+        return None
+
+    # a session fixture has no event loop, so the pool starts it synchronously
+    return aio_moto_service_pool.get(MOTO_ALL_SERVICES, **aio_aws_server_options)
+
+
+@pytest.fixture(scope="session")
+def aio_aws_moto_service(
+    pytestconfig, aio_aws_moto_server, aio_aws_server_options
+) -> Callable:
+    """
+    A factory for an async context that provides an AioMotoService
+    for a service, using the plugin options; it is used like so:
+
+        async with aio_aws_moto_service("s3") as svc:
+            s3_endpoint_url = svc.endpoint_url
+
+    With the `aiomoto_server_pool` ini option or the `--aiomoto-server-pool`
+    flag, each service is started once and it lingers in a pool until the
+    session finishes.
+    """
+    moto_pool = None
+    if aiomoto_option(pytestconfig, "aiomoto_server_pool"):
+        moto_pool = aio_moto_service_pool
+    return partial(
+        aio_moto_service,
+        moto_server=aio_aws_moto_server,
+        moto_pool=moto_pool,
+        **aio_aws_server_options,
+    )
+
+
+@pytest.fixture(scope="session")
+def aio_aws_moto_services(
+    pytestconfig, aio_aws_moto_server, aio_aws_server_options
+) -> Callable:
+    """
+    A factory for an async context that provides AioMotoService servers
+    for several services, which are started concurrently; it is used like so:
+
+        async with aio_aws_moto_services(["ec2", "iam"]) as (ec2_svc, iam_svc):
+            ec2_endpoint_url = ec2_svc.endpoint_url
+    """
+    moto_pool = None
+    if aiomoto_option(pytestconfig, "aiomoto_server_pool"):
+        moto_pool = aio_moto_service_pool
+    return partial(
+        aio_moto_services,
+        moto_server=aio_aws_moto_server,
+        moto_pool=moto_pool,
+        **aio_aws_server_options,
+    )
+
+
 @pytest_asyncio.fixture
-async def aio_aws_batch_server() -> AioMotoService:
+async def aio_aws_batch_server(aio_aws_moto_service) -> AioMotoService:
     """
     AioMotoService("batch")
     """
-    async with AioMotoService("batch") as svc:
-        svc.reset()
+    async with aio_aws_moto_service("batch") as svc:
         yield svc
-        svc.reset()
 
 
 @pytest_asyncio.fixture
-async def aio_aws_cloudformation_server() -> AioMotoService:
+async def aio_aws_cloudformation_server(aio_aws_moto_service) -> AioMotoService:
     """
     AioMotoService("cloudformation")
     """
-    async with AioMotoService("cloudformation") as svc:
-        svc.reset()
+    async with aio_aws_moto_service("cloudformation") as svc:
         yield svc
-        svc.reset()
 
 
 @pytest_asyncio.fixture
-async def aio_aws_ec2_server() -> AioMotoService:
+async def aio_aws_ec2_server(aio_aws_moto_service) -> AioMotoService:
     """
     AioMotoService("ec2")
     """
-    async with AioMotoService("ec2") as svc:
-        svc.reset()
+    async with aio_aws_moto_service("ec2") as svc:
         yield svc
-        svc.reset()
 
 
 @pytest_asyncio.fixture
-async def aio_aws_ecs_server() -> AioMotoService:
+async def aio_aws_ecs_server(aio_aws_moto_service) -> AioMotoService:
     """
     AioMotoService("ecs")
     """
-    async with AioMotoService("ecs") as svc:
-        svc.reset()
+    async with aio_aws_moto_service("ecs") as svc:
         yield svc
-        svc.reset()
 
 
 @pytest_asyncio.fixture
-async def aio_aws_iam_server() -> AioMotoService:
+async def aio_aws_iam_server(aio_aws_moto_service) -> AioMotoService:
     """
     AioMotoService("iam")
     """
-    async with AioMotoService("iam") as svc:
-        svc.reset()
+    async with aio_aws_moto_service("iam") as svc:
         yield svc
-        svc.reset()
 
 
 @pytest_asyncio.fixture
-async def aio_aws_dynamodb2_server() -> AioMotoService:
+async def aio_aws_dynamodb2_server(aio_aws_moto_service) -> AioMotoService:
     """
     AioMotoService("dynamodb2")
     """
-    async with AioMotoService("dynamodb2") as svc:
-        svc.reset()
+    async with aio_aws_moto_service("dynamodb2") as svc:
         yield svc
-        svc.reset()
 
 
 @pytest_asyncio.fixture
-async def aio_aws_lambda_server() -> AioMotoService:
+async def aio_aws_lambda_server(aio_aws_moto_service) -> AioMotoService:
     """
     AioMotoService("lambda")
     """
-    async with AioMotoService("lambda") as svc:
-        svc.reset()
+    async with aio_aws_moto_service("lambda") as svc:
         yield svc
-        svc.reset()
 
 
 @pytest_asyncio.fixture
-async def aio_aws_logs_server() -> AioMotoService:
+async def aio_aws_logs_server(aio_aws_moto_service) -> AioMotoService:
     """
     AioMotoService("logs")
     """
     # cloud watch logs
-    async with AioMotoService("logs") as svc:
-        svc.reset()
+    async with aio_aws_moto_service("logs") as svc:
         yield svc
-        svc.reset()
 
 
 @pytest_asyncio.fixture
-async def aio_aws_s3_server() -> AioMotoService:
+async def aio_aws_s3_server(aio_aws_moto_service) -> AioMotoService:
     """
     AioMotoService("s3")
     """
-    async with AioMotoService("s3") as svc:
-        svc.reset()
+    async with aio_aws_moto_service("s3") as svc:
         yield svc
-        svc.reset()
 
 
 @pytest_asyncio.fixture
-async def aio_aws_sns_server() -> AioMotoService:
+async def aio_aws_sns_server(aio_aws_moto_service) -> AioMotoService:
     """
     AioMotoService("sns")
     """
-    async with AioMotoService("sns") as svc:
-        svc.reset()
+    async with aio_aws_moto_service("sns") as svc:
         yield svc
-        svc.reset()
 
 
 @pytest_asyncio.fixture
-async def aio_aws_sqs_server() -> AioMotoService:
+async def aio_aws_sqs_server(aio_aws_moto_service) -> AioMotoService:
     """
     AioMotoService("sqs")
     """
-    async with AioMotoService("sqs") as svc:
-        svc.reset()
+    async with aio_aws_moto_service("sqs") as svc:
         yield svc
-        svc.reset()
+
+
+def _moto_account_header(account_id: str, request, **kwargs):
+    request.headers["x-moto-account-id"] = account_id
+
+
+@pytest.fixture
+def aio_aws_concurrency() -> int:
+    """
+    The number of concurrent requests for the aio helpers (e.g. `aio_create_buckets`),
+    which is also the max_pool_connections for the clients of the aio_aws_session;
+    override this fixture for another concurrency.
+    """
+    return AIO_AWS_CONCURRENCY
 
 
 @pytest_asyncio.fixture
-def aio_aws_session(aws_credentials, aws_region, event_loop) -> AioSession:
+def aio_aws_session(aws_credentials, aws_region, event_loop, aio_aws_concurrency) -> AioSession:
     """
-    An AioSession configured with credentials for moto services
+    An AioSession configured with credentials for moto services, where the
+    clients have a connection pool for the aio_aws_concurrency
     """
     # pytest-asyncio provides and manages the `event_loop`
     # and it should be set as the default loop for this session
@@ -176,7 +263,7 @@ def aio_aws_session(aws_credentials, aws_region, event_loop) -> AioSession:
     session.user_agent_name = "aiomoto"
 
     assert session.get_default_client_config() is None
-    aioconfig = AioConfig(max_pool_connections=1, region_name=aws_region)
+    aioconfig = AioConfig(max_pool_connections=aio_aws_concurrency, region_name=aws_region)
 
     # Note: tried to use proxies for the aiobotocore.endpoint, to replace
     #      'https://batch.us-west-2.amazonaws.com/v1/describejobqueues', but
@@ -195,13 +282,25 @@ def aio_aws_session(aws_credentials, aws_region, event_loop) -> AioSession:
     session.set_credentials(AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY)
     session.set_debug_logger(logger_name="aiomoto")
 
+    # clients for an in-process AioMotoService do not send any requests
+    aio_moto_inprocess_register(session)
+
+    # a moto server process does not have the MOTO_ACCOUNT_ID for the test
+    account_id = isolated_account()
+    if account_id:
+        session.register(
+            "before-sign",
+            partial(_moto_account_header, account_id),
+            unique_id="moto_account_header",
+        )
+
     yield session
 
 
 @pytest_asyncio.fixture
-def aio_aws_client(aio_aws_session):
+def aio_aws_client(aio_aws_session, aio_aws_moto_service):
     async def _get_client(service_name):
-        async with AioMotoService(service_name) as srv:
+        async with aio_aws_moto_service(service_name) as srv:
             async with aio_aws_session.create_client(
                 service_name, endpoint_url=srv.endpoint_url
             ) as client:
@@ -219,7 +318,7 @@ async def aio_aws_batch_client(aio_aws_session, aio_aws_batch_server):
         "batch", endpoint_url=aio_aws_batch_server.endpoint_url
     ) as client:
         yield client
-    moto_service_reset("batch")
+    moto_resets.reset("batch", aio_aws_batch_server)
 
 
 @pytest_asyncio.fixture
@@ -231,7 +330,7 @@ async def aio_aws_ec2_client(aio_aws_session, aio_aws_ec2_server):
         "ec2", endpoint_url=aio_aws_ec2_server.endpoint_url
     ) as client:
         yield client
-    moto_service_reset("ec2")
+    moto_resets.reset("ec2", aio_aws_ec2_server)
 
 
 @pytest_asyncio.fixture
@@ -243,7 +342,7 @@ async def aio_aws_ecs_client(aio_aws_session, aio_aws_ecs_server):
         "ecs", endpoint_url=aio_aws_ecs_server.endpoint_url
     ) as client:
         yield client
-    moto_service_reset("ecs")
+    moto_resets.reset("ecs", aio_aws_ecs_server)
 
 
 @pytest_asyncio.fixture
@@ -256,7 +355,7 @@ async def aio_aws_iam_client(aio_aws_session, aio_aws_iam_server):
     ) as client:
         client.meta.config.region_name = "aws-global"  # not AWS_REGION
         yield client
-    moto_service_reset("iam")
+    moto_resets.reset("iam", aio_aws_iam_server)
 
 
 @pytest_asyncio.fixture
@@ -268,7 +367,7 @@ async def aio_aws_lambda_client(aio_aws_session, aio_aws_lambda_server):
         "lambda", endpoint_url=aio_aws_lambda_server.endpoint_url
     ) as client:
         yield client
-    moto_service_reset("lambda")
+    moto_resets.reset("lambda", aio_aws_lambda_server)
 
 
 @pytest_asyncio.fixture
@@ -280,7 +379,7 @@ async def aio_aws_logs_client(aio_aws_session, aio_aws_logs_server):
         "logs", endpoint_url=aio_aws_logs_server.endpoint_url
     ) as client:
         yield client
-    moto_service_reset("logs")
+    moto_resets.reset("logs", aio_aws_logs_server)
 
 
 @pytest_asyncio.fixture
@@ -299,11 +398,33 @@ async def aio_aws_s3_client(aio_aws_session, aio_aws_s3_server, mocker):
         #     )
         # )
         yield client
-    moto_service_reset("s3")
+    moto_resets.reset("s3", aio_aws_s3_server)
+
+
+@pytest_asyncio.fixture
+async def aio_aws_batch_servers(
+    aio_aws_moto_server, aio_aws_server_options, aio_aws_moto_services
+) -> List[AioMotoService]:
+    """
+    AioMotoService servers for the AWS Batch Infrastructure, which are started
+    concurrently; the aio_aws_*_server fixtures for these services then use
+    the running servers.  A test is skipped when each service would run in its
+    own server process, because the services must share the moto backends
+    (e.g. batch uses the IAM roles), unless there is an aiomoto_shared_server.
+    """
+    server_mode = aio_aws_server_options["server_mode"]
+    if aio_aws_moto_server is None and server_mode == MOTO_SERVER_PROCESS:
+        pytest.skip(
+            "The AWS Batch services need the aiomoto_shared_server with"
+            " aiomoto_server_mode = process, because each server process has its own backends"
+        )
+    async with aio_aws_moto_services(AWS_BATCH_SERVICES) as services:
+        yield services
 
 
 @pytest_asyncio.fixture
 async def aio_aws_batch_clients(
+    aio_aws_batch_servers,
     aio_aws_batch_client,
     aio_aws_ec2_client,
     aio_aws_ecs_client,
@@ -324,8 +445,20 @@ async def aio_aws_batch_clients(
     )
 
 
+@pytest.fixture(scope="session")
+def aio_aws_batch_snapshots() -> Dict[str, Tuple[BackendSnapshot, AioAwsBatchInfrastructure]]:
+    """
+    The moto backend snapshots of the AWS Batch Infrastructure, by region,
+    for the aiomoto_batch_snapshot option
+    """
+    return dict()
+
+
 @pytest_asyncio.fixture
 async def aio_aws_batch_infrastructure(
+    pytestconfig,
+    aio_aws_batch_snapshots,
+    aio_aws_batch_servers: List[AioMotoService],
     aio_aws_batch_clients: AioAwsBatchClients,
     compute_env_name: str,
     job_queue_name: str,
@@ -333,9 +466,25 @@ async def aio_aws_batch_infrastructure(
     iam_role_name: str,
 ) -> AioAwsBatchInfrastructure:
     """
-    AWS Batch Infrastructure with Async Clients
+    AWS Batch Infrastructure with Async Clients; with the aiomoto_batch_snapshot
+    option, it is created once and then a snapshot of it is restored for each test.
     """
     aws_region = aio_aws_batch_clients.region
+    moto_server = aio_aws_batch_servers[0]
+    use_snapshot = (
+        aiomoto_option(pytestconfig, "aiomoto_batch_snapshot")
+        and moto_server.server_mode != MOTO_SERVER_PROCESS
+        and not isolated_account()  # a snapshot is for one account
+    )
+    if use_snapshot and aws_region in aio_aws_batch_snapshots:
+        # the aio_aws_batch_servers reset the backends after each test
+        snapshot, infrastructure = aio_aws_batch_snapshots[aws_region]
+        moto_server.restore(snapshot)
+        infrastructure = copy.copy(infrastructure)
+        infrastructure.aio_aws_clients = aio_aws_batch_clients
+        yield infrastructure
+        return
+
     async with aio_batch_infrastructure(
         aio_aws_batch_clients=aio_aws_batch_clients,
         aws_region=aws_region,
@@ -344,4 +493,9 @@ async def aio_aws_batch_infrastructure(
         job_definition_name=job_definition_name,
         iam_role_name=iam_role_name
     ) as aio_batch_resources:
+        if use_snapshot:
+            aio_aws_batch_snapshots[aws_region] = (
+                moto_server.snapshot(AWS_BATCH_SERVICES),
+                copy.copy(aio_batch_resources),
+            )
         yield aio_batch_resources
@@ -0,0 +1,186 @@
+# Copyright 2019-2023 Darren Weber
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-process moto requests for aiobotocore clients
+
+An aiobotocore endpoint emits a 'before-send' event for each request and it
+uses any response from an event handler instead of sending the request.  The
+`aio_moto_inprocess_send` handler passes the requests for an in-process
+endpoint_url to the moto.server WSGI application for it, so the response is
+the same as it is from a moto server, but there is no socket, thread or HTTP
+parsing.  The response body is wrapped in an object that can be read like an
+aiohttp response, including the streaming body of an s3 object.
+"""
+
+import inspect
+import io
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import Optional
+from typing import Tuple
+from urllib.parse import urlsplit
+
+from aiobotocore.awsrequest import AioAWSResponse
+from aiobotocore.session import AioSession
+from multidict import CIMultiDict
+
+from pytest_aiomoto.aiomoto_server import HOP_BY_HOP_HEADERS
+from pytest_aiomoto.aiomoto_server import wsgi_call
+from pytest_aiomoto.aiomoto_server import wsgi_request_environ
+
+_inprocess_apps: Dict[str, Callable] = dict()  # {endpoint_url: wsgi_app}
+
+
+def register_inprocess_app(endpoint_url: str, wsgi_app: Callable):
+    """Serve any aiobotocore requests for the endpoint_url with a WSGI application"""
+    _inprocess_apps[endpoint_url.rstrip("/")] = wsgi_app
+
+
+def unregister_inprocess_app(endpoint_url: str):
+    _inprocess_apps.pop(endpoint_url.rstrip("/"), None)
+
+
+def inprocess_app(url: str) -> Optional[Callable]:
+    """The WSGI application for a request url, if it is for an in-process endpoint"""
+    url_parts = urlsplit(url)
+    return _inprocess_apps.get(f"{url_parts.scheme}://{url_parts.netloc}")
+
+
+class InProcessContent:
+    """The body of an in-process response, which is read like an aiohttp.StreamReader"""
+
+    def __init__(self, body: bytes):
+        self._body = io.BytesIO(body)
+        self._size = len(body)
+
+    def at_eof(self) -> bool:
+        return self._body.tell() >= self._size
+
+    async def read(self, n: int = -1) -> bytes:
+        return self._body.read(n if n is not None and n >= 0 else -1)
+
+    async def readany(self) -> bytes:
+        return await self.read()
+
+
+class InProcessRawResponse:
+    """An in-process response, which is read like an aiohttp.ClientResponse"""
+
+    def __init__(self, url: str, status: int, headers: Iterable[Tuple[str, str]], body: bytes):
+        self.url = url
+        self.status = status
+        self.headers = CIMultiDict(headers)
+        self.raw_headers = tuple(
+            (key.encode("utf-8"), value.encode("utf-8")) for key, value in self.headers.items()
+        )
+        self.content = InProcessContent(body)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def at_eof(self) -> bool:
+        return self.content.at_eof()
+
+    async def read(self) -> bytes:
+        return await self.content.read()
+
+    def release(self):
+        pass
+
+    def close(self):
+        pass
+
+
+async def _request_body(body) -> bytes:
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    if isinstance(body, (bytes, bytearray)):
+        return bytes(body)
+    if hasattr(body, "read"):
+        data = body.read()
+        if inspect.isawaitable(data):
+            data = await data
+        return data.encode("utf-8") if isinstance(data, str) else data
+    # any other iterable of bytes, e.g. a generator for a chunked body
+    chunks = []
+    if hasattr(body, "__aiter__"):
+        async for chunk in body:
+            chunks.append(chunk)
+    else:
+        chunks.extend(body)
+    return b"".join(chunks)
+
+
+def _header_str(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+async def aio_moto_inprocess_send(request, **kwargs) -> Optional[AioAWSResponse]:
+    """
+    A 'before-send' event handler that responds to the requests for any
+    in-process endpoint_url, using the moto.server WSGI application for it
+    """
+    wsgi_app = inprocess_app(request.url)
+    if wsgi_app is None:
+        return None  # send the request
+
+    url_parts = urlsplit(request.url)
+    headers = [(key, _header_str(value)) for key, value in request.headers.items()]
+    if not any(key.lower() == "host" for key, _ in headers):
+        headers.append(("Host", url_parts.netloc))
+
+    raw_path = url_parts.path or "/"
+    if url_parts.query:
+        raw_path = f"{raw_path}?{url_parts.query}"
+
+    body = await _request_body(request.body)
+    environ = wsgi_request_environ(
+        request.method,
+        raw_path,
+        headers,
+        body,
+        url_scheme=url_parts.scheme,
+        server_name=url_parts.hostname or "",
+        server_port=url_parts.port or 80,
+    )
+    status, response_headers, response_body = wsgi_call(wsgi_app, environ)
+    if request.method == "HEAD":
+        response_body = b""
+
+    response_headers = [
+        (key, value)
+        for key, value in response_headers
+        if key.lower() not in HOP_BY_HOP_HEADERS
+    ]
+    if not any(key.lower() == "content-length" for key, _ in response_headers):
+        response_headers.append(("Content-Length", str(len(response_body))))
+
+    raw = InProcessRawResponse(request.url, status, response_headers, response_body)
+    return AioAWSResponse(request.url, status, raw.headers, raw)
+
+
+def aio_moto_inprocess_register(session: AioSession):
+    """
+    Register the in-process 'before-send' handler for any clients from an AioSession
+    """
+    session.register(
+        "before-send", aio_moto_inprocess_send, unique_id="aio_moto_inprocess_send"
+    )
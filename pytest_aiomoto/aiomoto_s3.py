@@ -11,15 +11,97 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
 import uuid
+from contextlib import closing
+from itertools import count
+from typing import Awaitable
+from typing import Callable
+from typing import Iterable
 from typing import List
+from typing import Optional
 
 import pytest
 import pytest_asyncio
 
+from pytest_aiomoto.s3_multipart import S3_MULTIPART_PART_SIZE
+from pytest_aiomoto.s3_multipart import S3MultipartUpload
+from pytest_aiomoto.s3_multipart import S3MultipartUploader
+from pytest_aiomoto.s3_multipart import S3SourceFile
+from pytest_aiomoto.s3_verify import s3_verify_policy
+from pytest_aiomoto.utils import AIO_AWS_CONCURRENCY
 from pytest_aiomoto.utils import response_success
 
 
+async def aio_create_bucket(bucket_name: str, aio_s3_client, aws_region: str) -> str:
+    """Create an s3 bucket, with a head request to verify it"""
+    resp = await aio_s3_client.create_bucket(
+        Bucket=bucket_name,
+        ACL="public-read-write",
+        CreateBucketConfiguration={"LocationConstraint": aws_region},
+    )
+    assert response_success(resp)
+    if s3_verify_policy.verify():
+        head = await aio_s3_client.head_bucket(Bucket=bucket_name)
+        assert response_success(head)
+    return bucket_name
+
+
+async def aio_create_buckets(
+    bucket_names: Iterable[str],
+    aio_s3_client,
+    aws_region: str,
+    concurrency: int = AIO_AWS_CONCURRENCY,
+) -> List[str]:
+    """
+    Create s3 buckets, like `aio_create_bucket`, with up to `concurrency`
+    buckets at a time; the client needs a connection pool of that size
+    (the max_pool_connections), or the requests wait for a connection.
+
+    :return: the bucket names
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def create_bucket(bucket_name: str) -> str:
+        async with semaphore:
+            return await aio_create_bucket(bucket_name, aio_s3_client, aws_region)
+
+    return list(await asyncio.gather(*(create_bucket(name) for name in bucket_names)))
+
+
+async def aio_create_s3_multipart_object(
+    bucket_name: str,
+    key: str,
+    source: S3SourceFile,
+    aio_s3_client,
+    part_size: int = S3_MULTIPART_PART_SIZE,
+    memory_limit: Optional[int] = None,
+) -> S3MultipartUpload:
+    """
+    Upload a file to an s3 object with a multipart upload, like
+    `create_s3_multipart_object`, with an aiobotocore client.
+
+    :param source: a file path, or a binary file that has a fileno
+    :param memory_limit: a `memory_ceiling` (bytes) for the upload of the parts
+    :return: an S3MultipartUpload, with the size and the upload time
+    """
+    uploader = S3MultipartUploader(bucket_name, key, source, part_size, memory_limit)
+    uploader.start(await aio_s3_client.create_multipart_upload(**uploader.object_request()))
+    try:
+        with closing(uploader.part_requests()) as part_requests:
+            for request in part_requests:
+                uploader.add_part(request, await aio_s3_client.upload_part(**request))
+        uploader.complete(
+            await aio_s3_client.complete_multipart_upload(**uploader.complete_request())
+        )
+    except BaseException:
+        await aio_s3_client.abort_multipart_upload(**uploader.upload_request())
+        raise
+    if s3_verify_policy.verify():
+        uploader.check_head(await aio_s3_client.head_object(**uploader.object_request()))
+    return uploader.result()
+
+
 @pytest.fixture
 def aio_s3_uuid() -> str:
     """A UUID for S3 artifacts"""
@@ -80,37 +162,32 @@ def aio_s3_object_text() -> str:
 
 @pytest_asyncio.fixture
 async def aio_s3_bucket(aio_s3_bucket_name, aio_s3_key, aio_aws_s3_client, aws_region) -> str:
-    resp = await aio_aws_s3_client.create_bucket(
-        Bucket=aio_s3_bucket_name,
-        ACL="public-read-write",
-        CreateBucketConfiguration={"LocationConstraint": aws_region},
-    )
-    assert response_success(resp)
-    head = await aio_aws_s3_client.head_bucket(Bucket=aio_s3_bucket_name)
-    assert response_success(head)
+    await aio_create_bucket(aio_s3_bucket_name, aio_aws_s3_client, aws_region)
 
     yield aio_s3_bucket_name
     # TODO: cleanup bucket
 
 
+@pytest.fixture
+def aio_s3_bucket_count() -> int:
+    """The number of buckets for the aio_s3_buckets fixture"""
+    return 20
+
+
 @pytest_asyncio.fixture
 async def aio_s3_buckets(
-    aio_s3_bucket_name, aio_aws_s3_client, aws_region
+    aio_s3_bucket_name, aio_aws_s3_client, aws_region, aio_s3_bucket_count, aio_aws_concurrency
 ) -> List[str]:
-    bucket_names = []
-    for i in range(20):
-        bucket_name = f"{aio_s3_bucket_name}_{i:02d}"
-        resp = await aio_aws_s3_client.create_bucket(
-            Bucket=bucket_name,
-            ACL="public-read-write",
-            CreateBucketConfiguration={"LocationConstraint": aws_region},
-        )
-        assert response_success(resp)
-        head = await aio_aws_s3_client.head_bucket(Bucket=bucket_name)
-        assert response_success(head)
-        bucket_names.append(bucket_name)
-
-    return bucket_names
+    """
+    The aio_s3_buckets fixture creates the aio_s3_bucket_count buckets for the
+    aio_s3_bucket_name, with a numeric suffix for each bucket, where up to the
+    aio_aws_concurrency buckets are created at a time.
+    :return: a list of bucket names
+    """
+    bucket_names = [f"{aio_s3_bucket_name}_{i:02d}" for i in range(aio_s3_bucket_count)]
+    return await aio_create_buckets(
+        bucket_names, aio_aws_s3_client, aws_region, concurrency=aio_aws_concurrency
+    )
 
 
 @pytest_asyncio.fixture
@@ -125,7 +202,42 @@ async def aio_s3_object_uri(
         ACL="public-read-write",
     )
     assert response_success(resp)
-    resp = await aio_aws_s3_client.head_object(Bucket=aio_s3_bucket_name, Key=aio_s3_key)
-    assert response_success(resp)
+    if s3_verify_policy.verify():
+        resp = await aio_aws_s3_client.head_object(Bucket=aio_s3_bucket_name, Key=aio_s3_key)
+        assert response_success(resp)
 
     return aio_s3_uri
+
+
+@pytest.fixture
+def aio_s3_multipart_factory(
+    aio_s3_bucket, aio_s3_key_path, aio_s3_uuid, aio_aws_s3_client, s3_source_file_factory
+) -> Callable[..., Awaitable[S3MultipartUpload]]:
+    """
+    A factory for large objects in the aio_s3_bucket, which are uploaded with
+    a multipart upload from a new source file, like `s3_multipart_factory`, e.g.
+
+    .. code-block::
+
+        upload = await aio_s3_multipart_factory(size=64 * 2**20)
+
+    :return: an async function that creates an S3MultipartUpload
+    """
+    numbers = count()
+
+    async def create_s3_multipart(
+        size: int = 4 * S3_MULTIPART_PART_SIZE,
+        part_size: int = S3_MULTIPART_PART_SIZE,
+        memory_limit: Optional[int] = None,
+        key: Optional[str] = None,
+        seed: int = 0,
+    ) -> S3MultipartUpload:
+        if key is None:
+            key = f"{aio_s3_key_path}/{aio_s3_uuid}/multipart_{next(numbers):02d}.bin"
+        source = s3_source_file_factory(size, seed)
+        return await aio_create_s3_multipart_object(
+            aio_s3_bucket, key, source, aio_aws_s3_client, part_size, memory_limit
+        )
+
+    # the uploads are reset with the moto s3 backends after a test
+    return create_s3_multipart
@@ -15,12 +15,16 @@
 from functools import partial
 
 import pytest
+import pytest_asyncio
 
+from pytest_aiomoto.aiomoto_services import aio_moto_service_pool
 
-@pytest.fixture()
-def aio_s3fs(
+
+@pytest_asyncio.fixture
+async def aio_s3fs(
     aio_aws_session,
     aio_aws_s3_server,
+    aio_aws_server_options,
     mocker,
     monkeypatch,
 ):
@@ -30,31 +34,38 @@ def aio_s3fs(
     The `aio_s3fs` fixture is simply a context to apply the mock, it is not intended to be a
     replacement for `s3fs`.  Just add the `aio_s3fs` fixture to a test function and then use
     `s3fs` as normal.
+
+    A blocking s3fs call waits on the event loop of the test, so when the
+    aio_aws_s3_server is an asyncio server on that loop, s3fs uses a pooled
+    asyncio server on an event loop thread, which has the same s3 backends.
     """
     try:
         import s3fs
+    except ImportError:
+        pytest.skip("The extra pytest_aiomoto[s3fs] dependency is missing")
 
-        try:
-            monkeypatch.setenv("S3_ENDPOINT_URL", aio_aws_s3_server.endpoint_url)
-            # TODO: find a way to apply this method mock only for creating "s3" clients;
-            aio_client_patch = mocker.patch(
-                "aiobotocore.session.AioSession.create_client",
-                side_effect=partial(
-                    aio_aws_session.create_client, "s3", endpoint_url=aio_aws_s3_server.endpoint_url
-                )
-            )
-            s3fs.S3FileSystem.clear_instance_cache()
+    s3_server = aio_aws_s3_server
+    if s3_server.on_event_loop:
+        s3_server = await aio_moto_service_pool.aio_get("s3", **aio_aws_server_options)
 
-            yield
+    try:
+        monkeypatch.setenv("S3_ENDPOINT_URL", s3_server.endpoint_url)
+        # TODO: find a way to apply this method mock only for creating "s3" clients;
+        aio_client_patch = mocker.patch(
+            "aiobotocore.session.AioSession.create_client",
+            side_effect=partial(
+                aio_aws_session.create_client, "s3", endpoint_url=s3_server.endpoint_url
+            )
+        )
+        s3fs.S3FileSystem.clear_instance_cache()
 
-            assert aio_client_patch.call_count > 0
+        yield
 
-        finally:
-            s3fs.S3FileSystem.clear_instance_cache()
-            monkeypatch.delenv("S3_ENDPOINT_URL", raising=False)
+        assert aio_client_patch.call_count > 0
 
-    except ImportError:
-        pytest.skip("The extra pytest_aiomoto[s3fs] dependency is missing")
+    finally:
+        s3fs.S3FileSystem.clear_instance_cache()
+        monkeypatch.delenv("S3_ENDPOINT_URL", raising=False)
 
 
 # NOTE: S3FileSystem is very hard to patch completely; keeping these
@@ -0,0 +1,166 @@
+# Copyright 2019-2023 Darren Weber
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+An asyncio HTTP server for moto
+
+This mounts a moto.server WSGI application on an aiohttp web application,
+so that an asyncio event loop can serve the moto backends without the
+werkzeug server threads.  The moto WSGI application is synchronous, so
+each request is handled on the event loop; the number of requests that
+are reading a body or waiting to be handled is bounded by a semaphore.
+"""
+
+import asyncio
+import io
+import sys
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Tuple
+from urllib.parse import unquote
+from urllib.parse import urlsplit
+
+from aiohttp import web
+from multidict import CIMultiDict
+
+# hop-by-hop headers are managed by the aiohttp server
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding"}
+
+
+def _wsgi_str(value: str) -> str:
+    # WSGI strings are bytes that are decoded as latin-1
+    return value.encode("utf-8", "surrogateescape").decode("latin-1")
+
+
+def wsgi_request_environ(
+    method: str,
+    raw_path: str,
+    headers: Iterable[Tuple[str, str]],
+    body: bytes,
+    url_scheme: str = "http",
+    server_name: str = "",
+    server_port: int = 0,
+    server_protocol: str = "HTTP/1.1",
+    remote_addr: str = "",
+    remote_port: int = 0,
+) -> Dict:
+    """
+    Create a WSGI environ for an HTTP request, with the request body
+    """
+    request_url = urlsplit(raw_path)
+    environ = {
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": url_scheme,
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": False,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+        "REQUEST_METHOD": method,
+        "SCRIPT_NAME": "",
+        "PATH_INFO": _wsgi_str(unquote(request_url.path)),
+        "QUERY_STRING": _wsgi_str(request_url.query),
+        "REQUEST_URI": _wsgi_str(raw_path),
+        "RAW_URI": _wsgi_str(raw_path),
+        "REMOTE_ADDR": remote_addr,
+        "REMOTE_PORT": remote_port,
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": server_protocol,
+        "CONTENT_LENGTH": str(len(body)),
+    }
+
+    for key, value in headers:
+        key = key.upper().replace("-", "_")
+        if key in ("CONTENT_LENGTH", "TRANSFER_ENCODING"):
+            continue  # the body is already read
+        if key != "CONTENT_TYPE":
+            key = f"HTTP_{key}"
+            if key in environ:
+                value = f"{environ[key]},{value}"
+        environ[key] = _wsgi_str(value)
+
+    return environ
+
+
+def wsgi_environ(request: web.BaseRequest, body: bytes) -> Dict:
+    """
+    Create a WSGI environ for an aiohttp request, with the request body
+    """
+    server_name, server_port = "", 0
+    sockname = request.transport.get_extra_info("sockname") if request.transport else None
+    if sockname:
+        server_name, server_port = sockname[:2]
+    peername = request.transport.get_extra_info("peername") if request.transport else None
+
+    return wsgi_request_environ(
+        request.method,
+        request.raw_path,
+        request.headers.items(),
+        body,
+        url_scheme=request.scheme,
+        server_name=server_name,
+        server_port=server_port,
+        server_protocol="HTTP/{}.{}".format(*request.version),
+        remote_addr=peername[0] if peername else "",
+        remote_port=peername[1] if peername else 0,
+    )
+
+
+def wsgi_call(wsgi_app: Callable, environ: Dict) -> Tuple[int, List[Tuple[str, str]], bytes]:
+    """
+    Call a WSGI application and collect the response status, headers and body
+    """
+    response = {}
+
+    def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+        response["status"] = status
+        response["headers"] = headers
+        return lambda data: None  # the legacy write callable is not supported
+
+    app_iter = wsgi_app(environ, start_response)
+    try:
+        body = b"".join(app_iter)
+    finally:
+        if hasattr(app_iter, "close"):
+            app_iter.close()
+
+    status = int(response["status"].split(" ", 1)[0])
+    return status, response["headers"], body
+
+
+def aio_wsgi_app(wsgi_app: Callable, max_concurrency: int = 100) -> web.Application:
+    """
+    An aiohttp web application that serves any request with a WSGI application;
+    this must be created in the event loop that will run the web application.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def wsgi_handler(request: web.Request) -> web.Response:
+        async with semaphore:
+            body = await request.read()
+            environ = wsgi_environ(request, body)
+            status, headers, body = wsgi_call(wsgi_app, environ)
+
+        response_headers = CIMultiDict(
+            (k, v) for k, v in headers if k.lower() not in HOP_BY_HOP_HEADERS
+        )
+        return web.Response(status=status, headers=response_headers, body=body)
+
+    # client_max_size=0 allows any request body size
+    app = web.Application(client_max_size=0)
+    app.router.add_route("*", "/{path:.*}", wsgi_handler)
+    return app
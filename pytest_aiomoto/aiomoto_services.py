@@ -14,19 +14,35 @@
 
 import asyncio
 import functools
-import threading
-import time
+from contextlib import asynccontextmanager
+from typing import Iterable
+from typing import List
+from typing import Optional
 
 import aiohttp
 
 from pytest_aiomoto.moto_services import CONNECT_TIMEOUT
+from pytest_aiomoto.moto_services import MOTO_SERVER_ASYNCIO
+from pytest_aiomoto.moto_services import MOTO_SERVER_INPROCESS
 from pytest_aiomoto.moto_services import MotoService
+from pytest_aiomoto.moto_services import MotoServicePool
+from pytest_aiomoto.moto_services import moto_resets
+from pytest_aiomoto.moto_services import serialize_s3_responses
 
 
 class AioMotoService(MotoService):
     """Will Create AioMotoService.
     Service is ref-counted so there will only be one per process. Real Service will
-    be returned by `__aenter__`."""
+    be returned by `__aenter__`.
+
+    With server_mode=MOTO_SERVER_ASYNCIO, `__aenter__` runs the server on the
+    event loop of the caller; it can only serve asyncio clients on that loop,
+    because any blocking client on that loop would block the server."""
+
+    @property
+    def on_event_loop(self) -> bool:
+        """Whether the server runs on the event loop that started it"""
+        return self._runner is not None and self._loop is None
 
     def __call__(self, func):
         # override on this prevents any use of this class as a synchronous server
@@ -36,6 +52,7 @@ class AioMotoService(MotoService):
                 result = await func(*args, **kwargs)
             finally:
                 await self._aio_stop()
+                self._close_socket()
             return result
 
         functools.update_wrapper(wrapper, func)
@@ -43,56 +60,232 @@ class AioMotoService(MotoService):
         return wrapper
 
     async def __aenter__(self):
-        svc = self._services.get(self._service_name)
-        if svc is None:
-            self._services[self._service_name] = self
-            self._refcount = 1
-            await self._aio_start()
-            return self
-        else:
-            svc._refcount += 1
+        svc, is_new = self._acquire()
+        if is_new:
+            with self._starting():
+                await self._aio_start()
             return svc
 
+        if not svc._started.is_set():
+            # another task or thread is starting the service
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, svc._started.wait, CONNECT_TIMEOUT)
+        if not svc._started.is_set() or svc._start_error:
+            self._release()
+            raise svc._start_failed() from svc._start_error
+        return svc
+
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        self._refcount -= 1
+        self._close_socket()
+        svc = self._release()
+        if svc:
+            await svc._aio_stop()
+
+    @classmethod
+    async def start_many(cls, service_names: Iterable[str], **kwargs) -> List["AioMotoService"]:
+        """
+        Start services concurrently, so it takes about as long as the slowest
+        start; any kwargs are options for each new AioMotoService.  The services
+        are ref-counted like `async with AioMotoService(name)` and they must be
+        stopped by `stop_many`.  If any service cannot start, the other services
+        are stopped and the first error is raised.
+        """
+        services = [cls(name, **kwargs) for name in service_names]
+        results = await asyncio.gather(
+            *(svc.__aenter__() for svc in services), return_exceptions=True
+        )
+
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            await cls.stop_many(
+                [result for result in results if not isinstance(result, BaseException)]
+            )
+            raise errors[0]
+        return results
+
+    @classmethod
+    async def stop_many(cls, services: Iterable["AioMotoService"]):
+        """Stop services from `start_many` concurrently"""
+        await asyncio.gather(*(svc.__aexit__(None, None, None) for svc in services))
+
+    async def _aio_start(self, loop_thread: bool = False):
+        serialize_s3_responses()
+        if self._server_mode == MOTO_SERVER_ASYNCIO and not loop_thread:
+            await self._aio_start_web_server()
+        elif self._server_mode == MOTO_SERVER_INPROCESS:
+            self._start_inprocess()
+        else:
+            await self._aio_start_thread()
 
-        if self._socket:
-            self._socket.close()
-            self._socket = None
+        if not self._ready.is_set() or self._start_error:
+            await self._aio_stop()  # pytest.fail doesn't call stop_process
+            raise self._start_failed() from self._start_error
 
-        if self._refcount == 0:
+        if self._health_check and not await self.aio_health_check():
             await self._aio_stop()
-            del self._services[self._service_name]
-
-    async def _aio_start(self):
-        self._thread = threading.Thread(target=self._server_entry, daemon=True)
-        self._thread.start()
-
-        async with aiohttp.ClientSession() as session:
-            start = time.time()
-
-            while time.time() - start < 10:
-                if not self._thread.is_alive():
-                    break
-
-                try:
-                    # we need to bypass the proxies due to monkeypatches
-                    async with session.get(
-                        self.endpoint_url + "/static", timeout=CONNECT_TIMEOUT
-                    ):
-                        pass
-                    break
-                except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
-                    await asyncio.sleep(0.2)
-            else:
-                await self._aio_stop()  # pytest.fail doesn't call stop_process
-                raise Exception(
-                    "Cannot start AioMotoService: {}".format(self._service_name)
-                )
+            raise self._start_failed()
+
+    async def _aio_start_thread(self):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+
+        def set_ready():
+            if not ready.done():
+                ready.set_result(None)
+
+        self._ready_callback = functools.partial(loop.call_soon_threadsafe, set_ready)
+        try:
+            self._start_thread()
+            await asyncio.wait_for(ready, CONNECT_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._ready_callback = None
+
+    async def _aio_start_web_server(self):
+        # serve requests on the event loop of the caller, without any threads
+        self._ready.clear()
+        try:
+            self._runner = await self._start_web_server()
+        except Exception as err:
+            self._logger.error("Cannot start server for %s: %r", self._service_name, err)
+            self._server_ready(err)
+        else:
+            self._server_ready()
+
+    async def aio_health_check(self) -> bool:
+        """
+        An optional probe of a running server; any HTTP response is healthy.
+        """
+        if self._server_mode == MOTO_SERVER_INPROCESS:
+            return self.health_check()
+
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(
+                    self.endpoint_url + "/static", timeout=CONNECT_TIMEOUT
+                ):
+                    return True
+        except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+            return False
 
     async def _aio_stop(self):
+        loop = asyncio.get_running_loop()
+
+        if self._server_mode == MOTO_SERVER_INPROCESS:
+            moto_resets.reset(self._service_name, self)  # clear the service backends
+            self._stop_inprocess()
+
         if self._server:
-            self.reset()  # clear the service backends
-            self._server.shutdown()
+            moto_resets.reset(self._service_name, self)  # clear the service backends
+            # shutdown waits for the serve_forever poll interval
+            await loop.run_in_executor(None, self._server.shutdown)
+
+        if self._runner and self._loop is None:
+            # the server is running on this event loop
+            moto_resets.reset(self._service_name, self)  # clear the service backends
+            await self._runner.cleanup()
+            self._runner = None
+
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+        if self._process:
+            self._process.terminate()
+
+        if self._thread:
+            await loop.run_in_executor(None, self._thread.join)
+
+
+class AioMotoServicePool(MotoServicePool):
+    """
+    A MotoServicePool of AioMotoService, which an event loop can start with
+    `aio_get`; the pooled services outlive the event loop of a test, so an
+    asyncio server runs on a dedicated event loop thread.
+    """
+
+    def __init__(self, service_class=AioMotoService):
+        super().__init__(service_class)
+
+    async def aio_get(self, service_name: str, **kwargs) -> AioMotoService:
+        """
+        Get a running service, which is started with any kwargs the first time.
+        """
+        svc, is_new = self._acquire(service_name, kwargs)
+        if is_new:
+            with self._starting(service_name, kwargs, svc):
+                await svc._aio_start(loop_thread=True)
+            return svc
+
+        if not svc._started.is_set():
+            # another task or thread is starting the service
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, svc._started.wait, CONNECT_TIMEOUT)
+        if not svc._started.is_set() or svc._start_error:
+            raise svc._start_failed() from svc._start_error
+        return svc
+
+
+# AioMotoService instances that linger until the pytest session finishes
+aio_moto_service_pool = AioMotoServicePool()
+
+
+@asynccontextmanager
+async def aio_moto_service(
+    service_name: str,
+    moto_server: Optional[MotoService] = None,
+    moto_pool: Optional[AioMotoServicePool] = None,
+    **kwargs,
+) -> AioMotoService:
+    """
+    Provide a moto server for a service, with the service backends reset
+    before and after use.  When a running moto_server is given, e.g. a
+    session-scoped AioMotoService(MOTO_ALL_SERVICES), it is used instead of
+    starting a new AioMotoService for the service; when a moto_pool is given,
+    the pooled service is used, or started once and kept in the pool.
+    Any kwargs are options for a new AioMotoService.
+    """
+    if moto_server is None and moto_pool is not None:
+        moto_server = await moto_pool.aio_get(service_name, **kwargs)
+
+    if moto_server is not None:
+        moto_resets.reset(service_name, moto_server)
+        yield moto_server
+        moto_resets.reset(service_name, moto_server)
+    else:
+        async with AioMotoService(service_name, **kwargs) as svc:
+            moto_resets.reset(service_name, svc)
+            yield svc
+            moto_resets.reset(service_name, svc)
+
+
+@asynccontextmanager
+async def aio_moto_services(
+    service_names: Iterable[str],
+    moto_server: Optional[MotoService] = None,
+    moto_pool: Optional[AioMotoServicePool] = None,
+    **kwargs,
+) -> List[AioMotoService]:
+    """
+    Provide moto servers for several services, like `aio_moto_service`,
+    where any new AioMotoService servers are started concurrently.
+    """
+    service_names = list(service_names)
+    if moto_server is not None:
+        services = [moto_server for _ in service_names]
+    elif moto_pool is not None:
+        services = await asyncio.gather(
+            *(moto_pool.aio_get(name, **kwargs) for name in service_names)
+        )
+    else:
+        services = await AioMotoService.start_many(service_names, **kwargs)
 
-        self._thread.join()
+    try:
+        for name, svc in zip(service_names, services):
+            moto_resets.reset(name, svc)
+        yield services
+        for name, svc in zip(service_names, services):
+            moto_resets.reset(name, svc)
+    finally:
+        if moto_server is None and moto_pool is None:
+            await AioMotoService.stop_many(services)
@@ -11,13 +11,22 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import copy
 import uuid
 from contextlib import contextmanager
+from typing import Dict
 from typing import Optional
+from typing import Tuple
 
 import pytest
 
+from pytest_aiomoto.aws_batch_models import AWS_BATCH_SERVICES
 from pytest_aiomoto.aws_clients import AwsBatchClients
+from pytest_aiomoto.moto_backends import BackendSnapshot
+from pytest_aiomoto.moto_backends import isolated_account
+from pytest_aiomoto.moto_backends import restore_backends
+from pytest_aiomoto.moto_services import moto_service_snapshot
+from pytest_aiomoto.plugin import aiomoto_option
 
 
 @pytest.fixture
@@ -194,14 +203,36 @@ def batch_infrastructure(
         aws_clients.ec2.delete_vpc(VpcId=infrastructure.vpc_id)
 
 
+@pytest.fixture(scope="session")
+def aws_batch_snapshots() -> Dict[str, Tuple[BackendSnapshot, AwsBatchInfrastructure]]:
+    """
+    The moto backend snapshots of the AWS Batch Infrastructure, by region,
+    for the aiomoto_batch_snapshot option
+    """
+    return dict()
+
+
 @pytest.fixture
 def aws_batch_infrastructure(
+    pytestconfig,
+    aws_batch_snapshots,
     aws_batch_clients: AwsBatchClients,
     compute_env_name: str,
     job_queue_name: str,
     job_definition_name: str,
     iam_role_name: str,
 ) -> AwsBatchInfrastructure:
+    # a snapshot is for one account
+    use_snapshot = aiomoto_option(pytestconfig, "aiomoto_batch_snapshot") and not isolated_account()
+    if use_snapshot and aws_batch_clients.region in aws_batch_snapshots:
+        # the moto mocks reset the backends after each test
+        snapshot, infrastructure = aws_batch_snapshots[aws_batch_clients.region]
+        restore_backends(snapshot)
+        infrastructure = copy.copy(infrastructure)
+        infrastructure.aws_clients = aws_batch_clients
+        yield infrastructure
+        return
+
     with batch_infrastructure(
         aws_clients=aws_batch_clients,
         compute_env_name=compute_env_name,
@@ -209,4 +240,9 @@ def aws_batch_infrastructure(
         job_definition_name=job_definition_name,
         iam_role_name=iam_role_name
     ) as batch:
+        if use_snapshot:
+            aws_batch_snapshots[aws_batch_clients.region] = (
+                moto_service_snapshot(AWS_BATCH_SERVICES),
+                copy.copy(batch),
+            )
         yield batch
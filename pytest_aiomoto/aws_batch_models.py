@@ -25,6 +25,9 @@ from typing import Dict
 from typing import List
 from typing import Union
 
+# the moto services for the AWS Batch Infrastructure
+AWS_BATCH_SERVICES = ["batch", "ec2", "ecs", "iam", "logs"]
+
 
 def gb_to_mib(gb: Union[int, float]) -> float:
     """
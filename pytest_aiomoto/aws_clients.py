@@ -29,7 +29,7 @@ from moto import mock_s3
 from moto import mock_secretsmanager
 from moto import mock_sqs
 
-from pytest_aiomoto.moto_services import moto_service_reset
+from pytest_aiomoto.moto_services import moto_resets
 
 
 class AwsBatchClient(botocore.client.BaseClient):
@@ -93,82 +93,82 @@ class AwsBatchClients(NamedTuple):
 def aws_batch_client(aws_region) -> AwsBatchClient:
     with mock_batch():
         yield boto3.client("batch", region_name=aws_region)
-    moto_service_reset("batch")
+    moto_resets.reset("batch")
 
 
 @pytest.fixture
 def aws_cognito_client(aws_region) -> AwsCognitoClient:
     with mock_cognitoidp():
         yield boto3.client("cognito-idp", region_name=aws_region)
-    moto_service_reset("cognito-idp")
+    moto_resets.reset("cognito-idp")
 
 
 @pytest.fixture
 def aws_ec2_client(aws_region) -> AwsEC2Client:
     with mock_ec2():
         yield boto3.client("ec2", region_name=aws_region)
-    moto_service_reset("ec2")
+    moto_resets.reset("ec2")
 
 
 @pytest.fixture
 def aws_ecs_client(aws_region) -> AwsECSClient:
     with mock_ecs():
         yield boto3.client("ecs", region_name=aws_region)
-    moto_service_reset("ecs")
+    moto_resets.reset("ecs")
 
 
 @pytest.fixture
 def aws_iam_client(aws_region) -> AwsIAMClient:
     with mock_iam():
         yield boto3.client("iam", region_name=aws_region)
-    moto_service_reset("iam")
+    moto_resets.reset("iam")
 
 
 @pytest.fixture
 def aws_lambda_client(aws_region) -> AwsLambdaClient:
     with mock_lambda():
         yield boto3.client("lambda", region_name=aws_region)
-    moto_service_reset("lambda")
+    moto_resets.reset("lambda")
 
 
 @pytest.fixture
 def aws_logs_client(aws_region) -> AwsLogsClient:
     with mock_logs():
         yield boto3.client("logs", region_name=aws_region)
-    moto_service_reset("logs")
+    moto_resets.reset("logs")
 
 
 @pytest.fixture
 def aws_s3_client(aws_region) -> AwsS3Client:
     with mock_s3():
         yield boto3.client("s3", region_name=aws_region)
-    moto_service_reset("s3")
+    moto_resets.reset("s3")
 
 
 @pytest.fixture
 def aws_s3_resource(aws_region) -> AwsS3Resource:
     with mock_s3():
         yield boto3.resource("s3", region_name=aws_region)
-    moto_service_reset("s3")
+    moto_resets.reset("s3")
 
 
 @pytest.fixture
 def aws_secrets_client(aws_region) -> AwsSecretsClient:
     with mock_secretsmanager():
         yield boto3.client("secretsmanager", region_name=aws_region)
-    moto_service_reset("secretsmanager")
+    moto_resets.reset("secretsmanager")
 
 
 @pytest.fixture
 def aws_sqs_client(aws_region) -> AwsSqsClient:
     with mock_sqs():
         yield boto3.client("sqs", region_name=aws_region)
-    moto_service_reset("sqs")
+    moto_resets.reset("sqs")
 
 
 @pytest.fixture
 def aws_sqs_resource(aws_region) -> AwsSqsResource:
     with mock_sqs():
         yield boto3.resource("sqs", region_name=aws_region)
-    moto_service_reset("sqs")
+    moto_resets.reset("sqs")
 
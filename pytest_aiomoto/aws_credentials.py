@@ -27,6 +27,7 @@ import pytest
 from botocore.exceptions import ProfileNotFound
 from s3fs import S3FileSystem
 
+from pytest_aiomoto.moto_backends import isolated_account
 from pytest_aiomoto.utils import AWS_ACCESS_KEY_ID
 from pytest_aiomoto.utils import AWS_REGION
 from pytest_aiomoto.utils import AWS_SECRET_ACCESS_KEY
@@ -305,6 +306,11 @@ def aws_credentials(aws_region, monkeypatch):
         monkeypatch.setenv("AWS_SECURITY_TOKEN", "testing")
         monkeypatch.setenv("AWS_SESSION_TOKEN", "testing")
 
+        # with account isolation, each test uses the moto backends for a new account
+        account_id = isolated_account()
+        if account_id:
+            monkeypatch.setenv("MOTO_ACCOUNT_ID", account_id)
+
         yield
         clean_aws_credentials(monkeypatch)
 
@@ -26,17 +26,45 @@ according to the moto license.
     - https://github.com/spulec/moto/blob/master/tests/test_batch/test_batch.py
 """
 import json
+import logging
+import threading
+import time
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from itertools import chain
+from itertools import count
 from pathlib import Path
+from typing import Callable
+from typing import Dict
+from typing import Iterable
 from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
 
+import boto3.session
 import botocore.waiter
 import pytest
 from botocore.exceptions import ClientError
 from moto import mock_s3
 
+from pytest_aiomoto.moto_s3 import drop_s3_bucket
+from pytest_aiomoto.moto_s3 import moto_s3_backend
+from pytest_aiomoto.moto_s3 import seed_s3_objects
+from pytest_aiomoto.s3_corpus import S3Corpus
+from pytest_aiomoto.s3_corpus_cache import s3_corpus_cache
+from pytest_aiomoto.s3_multipart import S3_MULTIPART_PART_SIZE
+from pytest_aiomoto.s3_multipart import S3MultipartUpload
+from pytest_aiomoto.s3_multipart import S3MultipartUploader
+from pytest_aiomoto.s3_multipart import S3PartBody
+from pytest_aiomoto.s3_multipart import S3SourceFile
+from pytest_aiomoto.s3_multipart import write_s3_source_file
+from pytest_aiomoto.s3_object import S3KeyIndex
 from pytest_aiomoto.s3_object import S3Object
+from pytest_aiomoto.s3_object import S3ObjectSet
+from pytest_aiomoto.s3_verify import s3_verify_policy
 from pytest_aiomoto.utils import assert_status_code
 from pytest_aiomoto.utils import has_moto_mocks
 from pytest_aiomoto.utils import response_success
@@ -45,6 +73,16 @@ from pytest_aiomoto.utils import response_success
 # import moto.settings
 # moto.settings.TEST_SERVER_MODE = True
 
+# delete_objects has a limit of 1000 keys, and a bucket is deleted with
+# a bounded thread pool for the pages of the object versions
+S3_DELETE_BATCH = 1000
+S3_DELETE_WORKERS = 4
+
+# the thread pool size for the bulk s3 helpers, e.g. create_s3_objects
+S3_BULK_WORKERS = 8
+
+LOGGER = logging.getLogger(__name__)
+
 
 ##################################################################
 #
@@ -87,10 +125,11 @@ def create_s3_bucket(bucket_name, s3_client, aws_region):
         CreateBucketConfiguration={"LocationConstraint": aws_region},
     )
     assert response_success(resp)
-    exists_waiter = s3_client.get_waiter("bucket_exists")
-    exists_waiter.wait(Bucket=bucket_name)
-    head = s3_client.head_bucket(Bucket=bucket_name)
-    assert response_success(head)
+    if s3_verify_policy.verify(2):
+        exists_waiter = s3_client.get_waiter("bucket_exists")
+        exists_waiter.wait(Bucket=bucket_name)
+        head = s3_client.head_bucket(Bucket=bucket_name)
+        assert response_success(head)
 
 
 def create_s3_bucket_resource(bucket_name, s3_resource, aws_region) -> "s3.Bucket":
@@ -99,10 +138,11 @@ def create_s3_bucket_resource(bucket_name, s3_resource, aws_region) -> "s3.Bucke
         ACL="public-read-write",
         CreateBucketConfiguration={"LocationConstraint": aws_region},
     )
-    bucket.wait_until_exists()
-    s3_client = s3_resource.meta.client
-    head = s3_client.head_bucket(Bucket=bucket_name)
-    assert response_success(head)
+    if s3_verify_policy.verify(2):
+        bucket.wait_until_exists()
+        s3_client = s3_resource.meta.client
+        head = s3_client.head_bucket(Bucket=bucket_name)
+        assert response_success(head)
     return bucket
 
 
@@ -111,15 +151,183 @@ def create_s3_object(
 ) -> "s3.ObjectSummary":
     bucket = s3_resource.Bucket(bucket_name)
     s3_obj = bucket.put_object(Key=key, Body=object_body)
-    exists_waiter = s3_client.get_waiter("object_exists")
-    exists_waiter.wait(Bucket=bucket_name, Key=key)
-    head = s3_client.head_object(Bucket=bucket_name, Key=key)
-    assert response_success(head)
+    if s3_verify_policy.verify(2):
+        exists_waiter = s3_client.get_waiter("object_exists")
+        exists_waiter.wait(Bucket=bucket_name, Key=key)
+        head = s3_client.head_object(Bucket=bucket_name, Key=key)
+        assert response_success(head)
     return s3_obj
 
 
-def delete_s3_bucket(bucket_name, s3_client):
+class S3ThreadClients(threading.local):
+    """
+    An s3 client for each thread of a thread pool, like another s3 client;
+    a boto3 session is not thread safe, so each thread has a new session.
+    """
+
+    def __init__(self, s3_client):
+        super().__init__()
+        meta = s3_client.meta
+        self.kwargs = dict(region_name=meta.region_name, config=meta.config)
+        if "amazonaws.com" not in meta.endpoint_url:
+            self.kwargs["endpoint_url"] = meta.endpoint_url
+        credentials = s3_client._request_signer._credentials
+        if credentials is not None:
+            credentials = credentials.get_frozen_credentials()
+            self.kwargs.update(
+                aws_access_key_id=credentials.access_key,
+                aws_secret_access_key=credentials.secret_key,
+                aws_session_token=credentials.token,
+            )
+        self.client = None
+
+    def get(self):
+        if self.client is None:
+            self.client = boto3.session.Session().client("s3", **self.kwargs)
+        return self.client
+
+
+def _log_throughput(action: str, count: int, start: float):
+    seconds = time.perf_counter() - start
+    rate = count / seconds if seconds else 0.0
+    LOGGER.info("%s %d in %.3f s (%.1f per second)", action, count, seconds, rate)
+
+
+def create_s3_buckets(
+    bucket_names: Iterable[str],
+    s3_client,
+    aws_region: str,
+    max_workers: int = S3_BULK_WORKERS,
+) -> List[str]:
+    """
+    Create s3 buckets, like `create_s3_bucket`, with a thread pool
+    that has an s3 client for each thread.
+
+    :return: the bucket names
+    """
+    bucket_names = list(bucket_names)
+    start = time.perf_counter()
+    clients = S3ThreadClients(s3_client)
+
+    def create_bucket(bucket_name: str) -> str:
+        create_s3_bucket(bucket_name, clients.get(), aws_region)
+        return bucket_name
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        bucket_names = list(executor.map(create_bucket, bucket_names))
+    _log_throughput("Created s3 buckets:", len(bucket_names), start)
+    return bucket_names
+
+
+def create_s3_objects(
+    bucket_name: str,
+    objects: Iterable[Tuple[str, Union[str, bytes, memoryview]]],
+    s3_client,
+    max_workers: int = S3_BULK_WORKERS,
+    seed: bool = True,
+) -> S3ObjectSet:
+    """
+    Put the (key, body) pairs in an s3 bucket, like `create_s3_object`, with a
+    thread pool that has an s3 client for each thread.  When the bucket is in
+    the moto backend of the test process, for a moto-mocked client, the
+    objects are seeded in the backend (unless seed=False).
+
+    :return: an S3ObjectSet of the keys
+    """
+    start = time.perf_counter()
+    if (
+        seed
+        and has_moto_mocks(s3_client, "before-send.s3.PutObject")
+        and bucket_name in moto_s3_backend().buckets
+    ):
+        s3_objects = seed_s3_objects(bucket_name, objects)
+        _log_throughput("Seeded s3 objects:", len(s3_objects), start)
+        return s3_objects
+
+    clients = S3ThreadClients(s3_client)
+
+    def create_object(item: Tuple[str, Union[str, bytes, memoryview]]) -> str:
+        key, body = item
+        if isinstance(body, memoryview):
+            # botocore only accepts bytes or a file for a Body
+            body = S3PartBody(body)
+        client = clients.get()
+        resp = client.put_object(Bucket=bucket_name, Key=key, Body=body)
+        assert response_success(resp)
+        if s3_verify_policy.verify(2):
+            exists_waiter = client.get_waiter("object_exists")
+            exists_waiter.wait(Bucket=bucket_name, Key=key)
+            head = client.head_object(Bucket=bucket_name, Key=key)
+            assert response_success(head)
+        return key
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        keys = _bounded_map(executor, create_object, objects, max_workers * 4)
+        s3_objects = S3ObjectSet(bucket_name, keys)
+    _log_throughput("Created s3 objects:", len(s3_objects), start)
+    return s3_objects
+
+
+def _bounded_map(executor: ThreadPoolExecutor, func: Callable, items: Iterable, window: int):
+    # like executor.map, but it only takes the next items from an iterable
+    # (e.g. a generator of object bodies) when there is room in a window
+    futures = deque()
+    for item in items:
+        if len(futures) >= window:
+            yield futures.popleft().result()
+        futures.append(executor.submit(func, item))
+    while futures:
+        yield futures.popleft().result()
+
+
+def create_s3_multipart_object(
+    bucket_name: str,
+    key: str,
+    source: S3SourceFile,
+    s3_client,
+    part_size: int = S3_MULTIPART_PART_SIZE,
+    memory_limit: Optional[int] = None,
+) -> S3MultipartUpload:
+    """
+    Upload a file to an s3 object with a multipart upload, where each part is
+    a memoryview of the file mapped into memory (see S3MultipartUploader); the
+    upload is aborted when it fails.  It logs the throughput.
+
+    :param source: a file path, or a binary file that has a fileno
+    :param memory_limit: a `memory_ceiling` (bytes) for the upload of the parts
+    :return: an S3MultipartUpload, with the size and the upload time
+    """
+    uploader = S3MultipartUploader(bucket_name, key, source, part_size, memory_limit)
+    uploader.start(s3_client.create_multipart_upload(**uploader.object_request()))
+    try:
+        with closing(uploader.part_requests()) as part_requests:
+            for request in part_requests:
+                uploader.add_part(request, s3_client.upload_part(**request))
+        uploader.complete(s3_client.complete_multipart_upload(**uploader.complete_request()))
+    except BaseException:
+        s3_client.abort_multipart_upload(**uploader.upload_request())
+        raise
+    if s3_verify_policy.verify():
+        uploader.check_head(s3_client.head_object(**uploader.object_request()))
+    return uploader.result()
+
+
+def _delete_s3_versions(s3_client, bucket_name, versions: List[Dict]):
+    for i in range(0, len(versions), S3_DELETE_BATCH):
+        resp = s3_client.delete_objects(
+            Bucket=bucket_name,
+            Delete={"Objects": versions[i : i + S3_DELETE_BATCH], "Quiet": True},
+        )
+        assert response_success(resp)
+        assert not resp.get("Errors"), resp["Errors"]
+
+
+def delete_s3_bucket(bucket_name, s3_client, drop: bool = True):
     # Recursively deletes a bucket and all of its contents.
+    #
+    # When the bucket is in the moto backend of the test process, it is dropped
+    # from the backend (unless drop=False); otherwise, the pages of the object
+    # versions are deleted with batches of delete_objects, in a thread pool.
 
     try:
         # - ensure the s3-client is loaded with moto mocks
@@ -127,32 +335,38 @@ def delete_s3_bucket(bucket_name, s3_client):
         # - the event-name mocks are dynamically generated after calling the method
         assert has_moto_mocks(s3_client, "before-send.s3.HeadBucket")
 
-        paginator = s3_client.get_paginator("list_object_versions")
+        if drop and drop_s3_bucket(bucket_name):
+            return
 
-        for n in paginator.paginate(Bucket=bucket_name, Prefix=""):
-            for obj in chain(
-                n.get("Versions", []),
-                n.get("DeleteMarkers", []),
-                n.get("Contents", []),
-                n.get("CommonPrefixes", []),
-            ):
-                kwargs = dict(Bucket=bucket_name, Key=obj["Key"])
-                if "VersionId" in obj:
-                    kwargs["VersionId"] = obj["VersionId"]
-                resp = s3_client.delete_object(**kwargs)
-                assert response_success(resp)
+        paginator = s3_client.get_paginator("list_object_versions")
+        with ThreadPoolExecutor(max_workers=S3_DELETE_WORKERS) as executor:
+            futures = []
+            for n in paginator.paginate(Bucket=bucket_name, Prefix=""):
+                versions = [
+                    {"Key": obj["Key"], "VersionId": obj["VersionId"]}
+                    if "VersionId" in obj
+                    else {"Key": obj["Key"]}
+                    for obj in chain(n.get("Versions", []), n.get("DeleteMarkers", []))
+                ]
+                if versions:
+                    futures.append(
+                        executor.submit(_delete_s3_versions, s3_client, bucket_name, versions)
+                    )
+            for future in futures:
+                future.result()
 
         resp = s3_client.delete_bucket(Bucket=bucket_name)
         assert response_success(resp)
-        # Ensure the bucket is gone
-        waiter = s3_client.get_waiter("bucket_not_exists")
-        waiter.wait(Bucket=bucket_name)
-        try:
-            head = s3_client.head_bucket(Bucket=bucket_name)
-            assert_status_code(head, 404)
-        except ClientError as err:
-            resp = err.response
-            assert_status_code(resp, 404)
+        if s3_verify_policy.verify(2):
+            # Ensure the bucket is gone
+            waiter = s3_client.get_waiter("bucket_not_exists")
+            waiter.wait(Bucket=bucket_name)
+            try:
+                head = s3_client.head_bucket(Bucket=bucket_name)
+                assert_status_code(head, 404)
+            except ClientError as err:
+                resp = err.response
+                assert_status_code(resp, 404)
 
     except ClientError as err:
         print(f"COULD NOT CLEANUP S3 BUCKET: {bucket_name}")
@@ -163,12 +377,33 @@ def delete_s3_bucket_resource(bucket_name, s3_resource):
     delete_s3_bucket(bucket_name, s3_resource.meta.client)
 
 
-def delete_s3_prefix(s3_client, bucket_name, prefix):
+def _s3_prefix_has_keys(bucket_name, prefix) -> bool:
+    # Whether any keys are below a prefix, e.g. keys that a test wrote, from the
+    # moto backend of the test process; when the bucket is not in it, a listing
+    # is required to know.
+    bucket = moto_s3_backend().buckets.get(bucket_name)
+    if bucket is None:
+        return True
+    return any(key.startswith(prefix) for key in list(bucket.keys))
+
+
+def delete_s3_prefix(s3_client, bucket_name, prefix, key_index: Optional[S3KeyIndex] = None):
+    # Deletes the keys below a prefix.
+    #
+    # With a key_index, the keys that fixtures created are deleted with batches
+    # of delete_objects, without a listing; the listing is only a fallback for
+    # any other keys below the prefix, e.g. keys that a test wrote.
+
     try:
         # - ensure the s3-client is loaded with moto mocks
         # - never allow this to apply to live s3 resources
         # - the event-name mocks are dynamically generated after calling the method
         assert has_moto_mocks(s3_client, "before-send.s3.HeadBucket")
+        if key_index is not None:
+            keys = key_index.pop_prefix(bucket_name, prefix)
+            _delete_s3_versions(s3_client, bucket_name, [{"Key": key} for key in keys])
+            if not _s3_prefix_has_keys(bucket_name, prefix):
+                return
         paginator = s3_client.get_paginator("list_objects_v2")
         for objects in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
             if objects["KeyCount"]:
@@ -250,11 +485,8 @@ def s3_buckets(s3_bucket_name, aws_s3_client, aws_region) -> List[str]:
     :return: a list of bucket names
     """
     with mock_s3():
-        bucket_names = []
-        for i in range(10):
-            bucket_name = f"{s3_bucket_name}-{i:02d}"
-            create_s3_bucket(bucket_name, aws_s3_client, aws_region)
-            bucket_names.append(bucket_name)
+        bucket_names = [f"{s3_bucket_name}-{i:02d}" for i in range(10)]
+        create_s3_buckets(bucket_names, aws_s3_client, aws_region)
 
         yield bucket_names
 
@@ -339,34 +571,42 @@ def s3_temp_dir(s3_key_path, s3_uuid) -> str:
     return f"{s3_key_path}/{s3_uuid}"
 
 
+@pytest.fixture
+def s3_key_index() -> S3KeyIndex:
+    """
+    An index of the keys that the s3 fixtures of a test create, so the
+    cleanup of a prefix deletes them without a listing
+    """
+    return S3KeyIndex()
+
+
 @pytest.fixture
 def s3_temp_file(
-    aws_s3_client, aws_s3_resource, s3_bucket, s3_temp_dir, s3_uuid
+    aws_s3_client, aws_s3_resource, s3_bucket, s3_temp_dir, s3_uuid, s3_key_index
 ) -> S3Object:
     file_path = f"{s3_temp_dir}/{s3_uuid}.txt"
     aws_s3_resource.Object(s3_bucket, file_path).put(Body="foo".encode())
+    s3_key_index.add(s3_bucket, [file_path])
 
     yield S3Object(bucket=s3_bucket, key=file_path)
 
-    delete_s3_prefix(aws_s3_client, s3_bucket, s3_temp_dir)
+    delete_s3_prefix(aws_s3_client, s3_bucket, s3_temp_dir, key_index=s3_key_index)
 
 
 @pytest.fixture
 def s3_temp_objects(
-    aws_s3_client, aws_s3_resource, s3_bucket, s3_temp_dir, s3_uuid
-) -> List[S3Object]:
+    aws_s3_client, s3_bucket, s3_temp_dir, s3_uuid, s3_key_index
+) -> S3ObjectSet:
     """
-    This creates 10 files, 5 with .txt and 5 with .tif file extensions,
+    This creates 21 files, 11 with .txt and 10 with .tif file extensions,
     below the s3://s3_bucket/s3_temp_dir path
     """
     # Since a mock_s3 context is created by the s3_bucket
-    # and aws_s3_client fixtures, it is not required here.
+    # and aws_s3_client fixtures, it is not required here;
+    # create_s3_objects seeds the moto backend for that mock.
 
     file_key = f"{s3_temp_dir}/{s3_uuid}.txt"
-    s3_file = create_s3_object(
-        s3_bucket, file_key, s3_uuid, aws_s3_resource, aws_s3_client
-    )
-    s3_objects = [s3_file]
+    objects = [(file_key, s3_uuid)]
 
     files_prefix = f"{s3_temp_dir}/{s3_uuid}"
     for i in range(10):
@@ -375,9 +615,7 @@ def s3_temp_objects(
             key = f"{file_stem}.txt"
         else:
             key = f"{file_stem}.tif"
-        body = file_stem.encode()
-        s3_obj = create_s3_object(s3_bucket, key, body, aws_s3_resource, aws_s3_client)
-        s3_objects.append(s3_obj)
+        objects.append((key, file_stem.encode()))
 
     # create a sub-key path for derivative files
     derivative_path = str(uuid.uuid4())
@@ -388,49 +626,133 @@ def s3_temp_objects(
             key = f"{file_stem}.txt"
         else:
             key = f"{file_stem}.tif"
-        body = file_stem.encode()
-        s3_obj = create_s3_object(s3_bucket, key, body, aws_s3_resource, aws_s3_client)
-        s3_objects.append(s3_obj)
+        objects.append((key, file_stem.encode()))
 
-    s3_objects = [
-        S3Object(bucket=s3_obj.bucket_name, key=s3_obj.key) for s3_obj in s3_objects
-    ]
+    s3_objects = create_s3_objects(s3_bucket, objects, aws_s3_client)
+    s3_key_index.add(s3_bucket, s3_objects)
 
     yield s3_objects
 
-    delete_s3_prefix(aws_s3_client, s3_bucket, s3_temp_dir)
+    delete_s3_prefix(aws_s3_client, s3_bucket, s3_temp_dir, key_index=s3_key_index)
 
 
 @pytest.fixture
 def s3_temp_1000s_objects(
-    aws_s3_client, aws_s3_resource, s3_bucket, s3_temp_dir, s3_uuid
-) -> List[S3Object]:
+    aws_s3_client, s3_bucket, s3_temp_dir, s3_uuid, s3_key_index
+) -> S3ObjectSet:
     """
-    This creates 1010 files, half with .txt and others with .tif file extensions,
+    This creates 1011 files, half with .txt and others with .tif file extensions,
     below the s3://s3_bucket/s3_temp_dir path; the default page limit for s3
     object listings is usually 1000, so this should exceed 1 page.
     """
     # Since a mock_s3 context is created by the s3_bucket
-    # and aws_s3_client fixtures, it is not required here.
+    # and aws_s3_client fixtures, it is not required here;
+    # create_s3_objects seeds the moto backend for that mock.
     file_key = f"{s3_temp_dir}/{s3_uuid}.txt"
-    s3_file = create_s3_object(
-        s3_bucket, file_key, s3_uuid, aws_s3_resource, aws_s3_client
-    )
-    s3_objects = [s3_file]
+    objects = [(file_key, s3_uuid)]
 
     for i in range(1010):
         if i % 2 > 0:
             key = f"{s3_temp_dir}/{s3_uuid}_{i:04d}.txt"
         else:
             key = f"{s3_temp_dir}/{s3_uuid}_{i:04d}.tif"
-        body = f"{s3_uuid}-{i:04d}".encode()
-        s3_obj = create_s3_object(s3_bucket, key, body, aws_s3_resource, aws_s3_client)
-        s3_objects.append(s3_obj)
+        objects.append((key, f"{s3_uuid}-{i:04d}".encode()))
 
-    s3_objects = [
-        S3Object(bucket=s3_obj.bucket_name, key=s3_obj.key) for s3_obj in s3_objects
-    ]
+    s3_objects = create_s3_objects(s3_bucket, objects, aws_s3_client)
+    s3_key_index.add(s3_bucket, s3_objects)
 
     yield s3_objects
 
-    delete_s3_prefix(aws_s3_client, s3_bucket, s3_temp_dir)
+    delete_s3_prefix(aws_s3_client, s3_bucket, s3_temp_dir, key_index=s3_key_index)
+
+
+@pytest.fixture
+def s3_corpus_factory(aws_s3_client, s3_bucket, s3_temp_dir) -> Callable[..., S3Corpus]:
+    """
+    A factory for synthetic s3 corpora in the s3_bucket, e.g.
+
+    .. code-block::
+
+        corpus = s3_corpus_factory(
+            count=100_000, fanout=20, depth=3, extensions={"tif": 9, "json": 1},
+            sizes=(1024, 64 * 1024), seed=42,
+        )
+
+    The arguments are those for an S3Corpus, which is below a new prefix in the
+    s3_temp_dir (unless it has a prefix).  The objects are created one at a
+    time from the corpus, which has a compact listing of them.  With the
+    `aiomoto_s3_corpus_cache` option, the bodies are read from a cache of them
+    in the pytest cache_dir, rather than generated for every run.
+    :return: a function that creates an S3Corpus
+    """
+    numbers = count()
+
+    def create_s3_corpus(count: int = 1000, prefix: Optional[str] = None, **kwargs) -> S3Corpus:
+        if prefix is None:
+            prefix = f"{s3_temp_dir}/corpus_{next(numbers):02d}"
+        corpus = S3Corpus(s3_bucket, prefix, count, **kwargs)
+        if s3_corpus_cache.enabled:
+            with s3_corpus_cache.open(corpus) as pack:
+                create_s3_objects(s3_bucket, pack.objects(), aws_s3_client)
+        else:
+            create_s3_objects(s3_bucket, corpus.objects(), aws_s3_client)
+        return corpus
+
+    # the s3_bucket is deleted with all of the corpora in it
+    return create_s3_corpus
+
+
+@pytest.fixture
+def s3_source_file_factory(tmp_path) -> Callable[..., Path]:
+    """
+    A factory for large source files, for the multipart uploads of large
+    objects; a file has `size` bytes from a seeded random generator,
+    which are written one chunk at a time.
+    :return: a function of (size, seed=0) that creates a file Path
+    """
+    numbers = count()
+
+    def create_s3_source_file(size: int, seed: int = 0) -> Path:
+        source = tmp_path / f"s3_source_{next(numbers):02d}.bin"
+        write_s3_source_file(source, size, seed)
+        return source
+
+    # the tmp_path is removed by pytest
+    return create_s3_source_file
+
+
+@pytest.fixture
+def s3_multipart_factory(
+    aws_s3_client, s3_bucket, s3_temp_dir, s3_source_file_factory
+) -> Callable[..., S3MultipartUpload]:
+    """
+    A factory for large objects in the s3_bucket, which are uploaded with a
+    multipart upload from a new source file, e.g.
+
+    .. code-block::
+
+        upload = s3_multipart_factory(size=64 * 2**20)
+
+    Each part is a memoryview of the source file, mapped into memory, and the
+    upload of the parts is in a `memory_ceiling` when it has a memory_limit
+    (bytes).  The upload is in the s3_temp_dir (unless it has a key).
+    :return: a function that creates an S3MultipartUpload
+    """
+    numbers = count()
+
+    def create_s3_multipart(
+        size: int = 4 * S3_MULTIPART_PART_SIZE,
+        part_size: int = S3_MULTIPART_PART_SIZE,
+        memory_limit: Optional[int] = None,
+        key: Optional[str] = None,
+        seed: int = 0,
+    ) -> S3MultipartUpload:
+        if key is None:
+            key = f"{s3_temp_dir}/multipart_{next(numbers):02d}.bin"
+        source = s3_source_file_factory(size, seed)
+        return create_s3_multipart_object(
+            s3_bucket, key, source, aws_s3_client, part_size, memory_limit
+        )
+
+    # the s3_bucket is deleted with all of the uploads in it
+    return create_s3_multipart
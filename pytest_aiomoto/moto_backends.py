@@ -0,0 +1,420 @@
+# Copyright 2019-2023 Darren Weber
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Tracking, snapshots and resets for the moto backends
+
+A moto service has a backend for each account and region, which is created
+on first use, e.g. `ec2_backends[account_id][region_name]`, and a reset of
+a backend creates it again.  For some services, like ec2, that rebuilds a
+lot of default data, so a reset of every backend for a service can cost more
+than a test that uses one of them.  While tracking is enabled, any access to
+a regional backend marks it as dirty and a reset only resets the dirty
+backends; every reset is timed and logged.
+
+A snapshot is a copy of the state of the regional backends for some services,
+which can be restored before each test, instead of creating the same
+resources again with API requests; any objects that cannot be pickled, like
+a generator or a lock, are shared by the snapshot and the backends.
+
+With account isolation, each test uses a new account ID, so that tests never
+share any backends.  The backends for the account of a test are not reset
+after the test; they are discarded later, with the accounts of other tests.
+"""
+
+import io
+import itertools
+import logging
+import pickle
+import threading
+import time
+import types
+from collections import defaultdict
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+
+import moto.backends
+from moto.core.base_backend import AccountSpecificBackend
+from moto.core.base_backend import BackendDict
+from moto.core.base_backend import BaseBackend
+from moto.core.base_backend import backend_lock
+
+LOGGER = logging.getLogger(__name__)
+
+# {(service_name, account_id, region_name)} for the backends used since a reset
+_dirty_backends: Set[Tuple[str, str, str]] = set()
+_tracking_lock = threading.Lock()
+_backend_getitem = AccountSpecificBackend.__getitem__
+_create_account_backend = BackendDict._create_account_specific_backend
+
+# {(service_name, account_id, region_name): snapshot} for the restored backends
+_restored_backends: Dict[Tuple[str, str, str], "BackendSnapshot"] = dict()
+
+# objects that are shared by a snapshot and the backends, rather than copied;
+# a model can refer to its backend, which must be the backend that is restored
+SHARED_TYPES = (
+    BaseBackend,
+    AccountSpecificBackend,
+    BackendDict,
+    types.GeneratorType,
+    type(threading.Lock()),
+    type(threading.RLock()),
+    threading.Thread,
+    threading.Event,
+)
+
+# the account IDs for account isolation are above this one
+ISOLATED_ACCOUNT_BASE = 100000000000
+_account_ids = itertools.count(ISOLATED_ACCOUNT_BASE + 1)
+_account_isolation = False
+_isolated_account: Optional[str] = None  # the account for the current test
+_retired_accounts: Set[str] = set()  # the accounts of previous tests
+
+# {service_name: [count, seconds]} for the backend resets
+reset_stats: Dict[str, List] = defaultdict(lambda: [0, 0.0])
+
+
+def _tracked_getitem(self: AccountSpecificBackend, region_name: str):
+    # the moto method is cached, so this wrapper sees every access
+    backend = _backend_getitem(self, region_name)
+    _dirty_backends.add((self.service_name, self.account_id, region_name))
+    return backend
+
+
+def backend_tracking() -> bool:
+    return AccountSpecificBackend.__getitem__ is _tracked_getitem
+
+
+def start_backend_tracking():
+    """
+    Track the moto backends that are used, so a reset only resets those; any
+    backend that exists when tracking starts is dirty, because it could be used.
+    """
+    with _tracking_lock:
+        if backend_tracking():
+            return
+        for _, service_backends in moto.backends.loaded_backends():
+            if not isinstance(service_backends, BackendDict):
+                continue  # e.g. the moto_api backend
+            for account_backends in service_backends.values():
+                for region_name in account_backends.keys():
+                    _dirty_backends.add(
+                        (account_backends.service_name, account_backends.account_id, region_name)
+                    )
+        AccountSpecificBackend.__getitem__ = _tracked_getitem
+
+
+def stop_backend_tracking():
+    with _tracking_lock:
+        AccountSpecificBackend.__getitem__ = _backend_getitem
+        _dirty_backends.clear()
+
+
+def dirty_backends() -> Set[Tuple[str, str, str]]:
+    """The (service_name, account_id, region_name) of the backends used since a reset"""
+    return set(_dirty_backends)
+
+
+def _reset_backend(key: Tuple[str, str, str], backend):
+    start = time.perf_counter()
+    backend.reset()
+    duration = time.perf_counter() - start
+    _dirty_backends.discard(key)
+    _restored_backends.pop(key, None)
+
+    stats = reset_stats[key[0]]
+    stats[0] += 1
+    stats[1] += duration
+    LOGGER.debug("Reset moto backend %s in %.4f s", key, duration)
+
+
+def reset_backends(service_backends: Iterable[BackendDict]):
+    """
+    Reset the regional backends for some services; while tracking is enabled,
+    only the backends that are used or restored since they were reset.  With
+    account isolation, the backends for the accounts of previous tests are not
+    reset, because no test can use them again.
+    """
+    tracking = backend_tracking()
+    for backend_dict in service_backends:
+        if not isinstance(backend_dict, BackendDict):
+            continue
+        for account_backends in list(backend_dict.values()):
+            for region_name, backend in list(account_backends.items()):
+                key = (account_backends.service_name, account_backends.account_id, region_name)
+                if tracking and key not in _dirty_backends and key not in _restored_backends:
+                    continue
+                if account_backends.account_id in _retired_accounts:
+                    continue  # no test uses it again
+                _reset_backend(key, backend)
+
+
+def account_isolation() -> bool:
+    return _account_isolation
+
+
+def _create_isolated_account_backend(self: BackendDict, account_id: str):
+    # A new AccountSpecificBackend lists the regions for a service from a new
+    # boto3 session, which takes longer than a test, so the regions are copied
+    # from the backends for another account.
+    with backend_lock:
+        if dict.__contains__(self, account_id):
+            return
+        other_backends = next(iter(dict.values(self)), None)
+        if other_backends is None:
+            _create_account_backend(self, account_id)
+            return
+        backend = self.backend
+        if self.service_name == "iam":
+            backend = _iam_account_backend(backend, other_backends)
+        self[account_id] = AccountSpecificBackend(
+            service_name=self.service_name,
+            account_id=account_id,
+            backend=backend,
+            use_boto3_regions=False,
+            additional_regions=list(other_backends.regions),
+        )
+
+
+def _iam_account_backend(backend: type, other_backends: AccountSpecificBackend):
+    # moto keeps the AWS managed policies when it resets an IAM backend, because
+    # they take a long time to load, so the IAM backends for a new account share
+    # the policies with another account.
+    other_backend = next(iter(dict.values(other_backends)), None)
+    aws_policies = getattr(other_backend, "aws_managed_policies", None)
+    if not aws_policies:
+        return backend
+
+    def create_backend(region_name: str, account_id: str):
+        return backend(region_name, account_id=account_id, aws_policies=aws_policies)
+
+    return create_backend
+
+
+def start_account_isolation():
+    global _account_isolation
+    _account_isolation = True
+    BackendDict._create_account_specific_backend = _create_isolated_account_backend
+
+
+def stop_account_isolation():
+    global _account_isolation, _isolated_account
+    _account_isolation = False
+    _isolated_account = None
+    BackendDict._create_account_specific_backend = _create_account_backend
+
+
+def isolated_account() -> Optional[str]:
+    """The account ID for the current test, with account isolation"""
+    return _isolated_account
+
+
+def new_isolated_account() -> str:
+    """Start using a new account ID, e.g. for a new test"""
+    global _isolated_account
+    retire_isolated_account()
+    _isolated_account = str(next(_account_ids))
+    return _isolated_account
+
+
+def retire_isolated_account():
+    """Stop using the current account ID, so that its backends are never reset"""
+    global _isolated_account
+    if _isolated_account:
+        _retired_accounts.add(_isolated_account)
+    _isolated_account = None
+
+
+def discard_isolated_accounts(service_backends: Iterable[BackendDict]) -> int:
+    """
+    Discard the backends for the accounts of previous tests, without any reset;
+    this returns the number of account backends that are discarded.
+    """
+    discarded = 0
+    with backend_lock:
+        for backend_dict in service_backends:
+            if not isinstance(backend_dict, BackendDict):
+                continue
+            for account_id in _retired_accounts.intersection(backend_dict.keys()):
+                account_backends = dict.__getitem__(backend_dict, account_id)
+                for region_name in account_backends.keys():
+                    key = (account_backends.service_name, account_id, region_name)
+                    _dirty_backends.discard(key)
+                    _restored_backends.pop(key, None)
+                dict.__delitem__(backend_dict, account_id)
+                discarded += 1
+        _retired_accounts.clear()
+        # the moto getitem caches have references to the discarded backends
+        BackendDict.__getitem__.cache_clear()
+        _backend_getitem.cache_clear()
+
+    LOGGER.debug("Discarded %d moto account backends", discarded)
+    return discarded
+
+
+def _shared_objects(state: Any) -> Dict[int, Any]:
+    """The {id: object} for any objects in a backend state that are not copied"""
+    shared = dict()
+    seen = set()
+    stack = [state]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (str, bytes, int, float, type)):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, SHARED_TYPES):
+            shared[id(obj)] = obj
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            stack.append(obj.__dict__)
+    return shared
+
+
+class _SnapshotPickler(pickle.Pickler):
+    def __init__(self, file, shared: Dict[int, Any]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._shared = shared
+
+    def persistent_id(self, obj):
+        return id(obj) if id(obj) in self._shared else None
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def __init__(self, file, shared: Dict[int, Any]):
+        super().__init__(file)
+        self._shared = shared
+
+    def persistent_load(self, pid):
+        return self._shared[pid]
+
+
+class StateCopy:
+    """
+    A copy of some state from a backend, e.g. the versions of an s3 key, which
+    is copied like the state of a backend in a BackendSnapshot
+    """
+
+    def __init__(self, state: Any):
+        self._shared = _shared_objects(state)
+        buffer = io.BytesIO()
+        _SnapshotPickler(buffer, self._shared).dump(state)
+        self._state = buffer.getvalue()
+
+    def load(self) -> Any:
+        """A new copy of the state"""
+        return _SnapshotUnpickler(io.BytesIO(self._state), self._shared).load()
+
+
+class BackendSnapshot:
+    """
+    A copy of the state of the regional backends for some services, which is
+    restored by `restore_backends`; a snapshot can be restored many times.
+    Each backend state is pickled, because unpickling is faster than a deepcopy.
+    """
+
+    def __init__(self, service_backends: List[BackendDict]):
+        self.service_backends = service_backends
+        self._backends: Dict[Tuple[str, str, str], BaseBackend] = dict()
+        self._states: Dict[Tuple[str, str, str], bytes] = dict()
+        self._shared: Dict[int, Any] = dict()
+
+    def __contains__(self, key: Tuple[str, str, str]) -> bool:
+        return key in self._states
+
+    def keys(self) -> Set[Tuple[str, str, str]]:
+        """The (service_name, account_id, region_name) of the backends in the snapshot"""
+        return set(self._states)
+
+    def backend(self, key: Tuple[str, str, str]) -> BaseBackend:
+        return self._backends[key]
+
+    def save(self, key: Tuple[str, str, str], backend: BaseBackend):
+        self._shared.update(_shared_objects(backend.__dict__))
+        buffer = io.BytesIO()
+        _SnapshotPickler(buffer, self._shared).dump(backend.__dict__)
+        self._backends[key] = backend
+        self._states[key] = buffer.getvalue()
+
+    def state(self, key: Tuple[str, str, str]) -> Dict:
+        """A new copy of the state of a backend"""
+        return _SnapshotUnpickler(io.BytesIO(self._states[key]), self._shared).load()
+
+
+def snapshot_backends(service_backends: Iterable[BackendDict]) -> BackendSnapshot:
+    """
+    Copy the state of the regional backends for some services, e.g. after the
+    resources for a test module are created.  While tracking is enabled, a
+    backend that is not used since it was reset is not in the snapshot, so a
+    restore resets it, if it is used.
+    """
+    start = time.perf_counter()
+    tracking = backend_tracking()
+    snapshot = BackendSnapshot([b for b in service_backends if isinstance(b, BackendDict)])
+    with backend_lock:
+        for backend_dict in snapshot.service_backends:
+            for account_backends in list(backend_dict.values()):
+                for region_name, backend in list(account_backends.items()):
+                    key = (account_backends.service_name, account_backends.account_id, region_name)
+                    if tracking and key not in _dirty_backends and key not in _restored_backends:
+                        continue
+                    snapshot.save(key, backend)
+
+    LOGGER.debug(
+        "Snapshot of %d moto backends in %.4f s",
+        len(snapshot.keys()),
+        time.perf_counter() - start,
+    )
+    return snapshot
+
+
+def restore_backends(snapshot: BackendSnapshot):
+    """
+    Restore the state of the regional backends in a snapshot and reset any other
+    backends for the same services.  The backend objects are not replaced, so any
+    references to them are still valid.  While tracking is enabled, a backend that
+    is not used since the same snapshot was restored is not restored again.
+    """
+    start = time.perf_counter()
+    tracking = backend_tracking()
+    restored = 0
+    with backend_lock:
+        for key in snapshot.keys():
+            if tracking and key not in _dirty_backends and _restored_backends.get(key) is snapshot:
+                continue
+            snapshot.backend(key).__dict__ = snapshot.state(key)
+            _dirty_backends.discard(key)
+            _restored_backends[key] = snapshot
+            restored += 1
+
+        for backend_dict in snapshot.service_backends:
+            for account_backends in list(backend_dict.values()):
+                for region_name, backend in list(account_backends.items()):
+                    key = (account_backends.service_name, account_backends.account_id, region_name)
+                    if key in snapshot:
+                        continue
+                    if account_backends.account_id in _retired_accounts:
+                        continue
+                    if tracking and key not in _dirty_backends and key not in _restored_backends:
+                        continue
+                    _reset_backend(key, backend)
+
+    LOGGER.debug("Restored %d moto backends in %.4f s", restored, time.perf_counter() - start)
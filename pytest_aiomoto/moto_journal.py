@@ -0,0 +1,480 @@
+# Copyright 2019-2023 Darren Weber
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A journal of the requests that mutate the moto backends, for a rollback
+
+While the journal is recording, the moto.server application for a MotoService
+copies the state that a mutating request could change, before the request,
+and a rollback restores it.  So the resources that a session fixture creates,
+like an s3 corpus or an AWS Batch infrastructure, can last for many tests,
+rather than a reset (and a rebuild) after each test.
+
+An s3 request only copies the bucket or the keys that it could change, e.g. a
+put_object copies the versions of one key, or nothing for a new key.  For any
+other service, a mutating request copies the backends for the service, with a
+snapshot, the first time the service is mutated.  Any read request, like a GET,
+or an action like Describe*, Get* or List*, is not journaled.
+"""
+
+import io
+import ipaddress
+import logging
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
+from urllib.parse import parse_qs
+
+import moto.backends
+from moto.core import DEFAULT_ACCOUNT_ID
+from moto.core.base_backend import BackendDict
+from moto.core.base_backend import backend_lock
+from moto.settings import S3_IGNORE_SUBDOMAIN_BUCKETNAME
+
+from pytest_aiomoto.moto_backends import BackendSnapshot
+from pytest_aiomoto.moto_backends import StateCopy
+from pytest_aiomoto.moto_backends import reset_backends
+from pytest_aiomoto.moto_backends import restore_backends
+from pytest_aiomoto.moto_backends import snapshot_backends
+
+LOGGER = logging.getLogger(__name__)
+
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# the actions that only read the backends, e.g. DescribeInstances or ListQueues;
+# a REST action is in the path, e.g. '/v1/describejobqueues' for batch
+READ_ACTIONS = (
+    "batchget",
+    "describe",
+    "get",
+    "head",
+    "list",
+    "lookup",
+    "query",
+    "scan",
+    "search",
+    "select",
+)
+
+# an s3 bucket is journaled without its keys and multipart uploads
+S3_BUCKET_ENTITIES = ("keys", "multiparts")
+S3_BUCKET_HOST = re.compile(r"(.+)\.s3(.*)\.amazonaws.com")
+
+# the requests for these services can change the backends for other services,
+# e.g. a batch compute environment has ec2 instances in an ecs cluster
+RELATED_SERVICES = {
+    "batch": ["ec2", "ecs", "iam", "logs"],
+    "lambda": ["logs"],
+}
+
+
+def _read_body(environ: Dict) -> bytes:
+    # read the request body and replace it, so that moto can read it again
+    try:
+        content_length = int(environ.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        content_length = 0
+    if content_length:
+        body = environ["wsgi.input"].read(content_length)
+    elif environ.get("wsgi.input_terminated"):
+        body = environ["wsgi.input"].read()
+    else:
+        body = b""
+    environ["wsgi.input"] = io.BytesIO(body)
+    return body
+
+
+def _wsgi_path(environ: Dict) -> str:
+    # WSGI strings are bytes that are decoded as latin-1
+    path = environ.get("PATH_INFO") or "/"
+    return path.encode("latin-1").decode("utf-8", "replace")
+
+
+def request_action(environ: Dict, body: bytes = b"") -> str:
+    """The action of a moto request, e.g. 'DescribeInstances' or 'describejobqueues'"""
+    target = environ.get("HTTP_X_AMZ_TARGET")
+    if target:
+        return target.rsplit(".", 1)[-1]
+    params = parse_qs(environ.get("QUERY_STRING", ""))
+    if body and environ.get("CONTENT_TYPE", "").startswith("application/x-www-form-urlencoded"):
+        params.update(parse_qs(body.decode("utf-8", "replace")))
+    if "Action" in params:
+        return params["Action"][0]
+    return _wsgi_path(environ).rstrip("/").rsplit("/", 1)[-1]
+
+
+def is_mutation(environ: Dict, body: bytes = b"") -> bool:
+    """Could a moto request change a backend?"""
+    if environ.get("REQUEST_METHOD", "GET") in READ_METHODS:
+        return False
+    return not request_action(environ, body).lower().startswith(READ_ACTIONS)
+
+
+def request_account(environ: Dict) -> str:
+    """The moto account for a request, like `BaseResponse.get_current_account`"""
+    if "MOTO_ACCOUNT_ID" in os.environ:
+        return os.environ["MOTO_ACCOUNT_ID"]
+    if environ.get("HTTP_X_MOTO_ACCOUNT_ID"):
+        return environ["HTTP_X_MOTO_ACCOUNT_ID"]
+    auth = environ.get("HTTP_AUTHORIZATION", "")
+    if "Credential=" in auth:
+        access_key = auth.split("Credential=", 1)[1].split("/", 1)[0]
+        # the iam backends are loaded by any moto request
+        for account_id, account in list(moto.backends.get_backend("iam").items()):
+            if access_key in account["global"].access_keys:
+                return account_id
+    return DEFAULT_ACCOUNT_ID
+
+
+def s3_bucket_key(environ: Dict) -> Tuple[Optional[str], str]:
+    """The (bucket, key) for an s3 request, for a path or a virtual host"""
+    path = _wsgi_path(environ)
+    host = environ.get("HTTP_HOST", "").split(":")[0]
+    if not S3_IGNORE_SUBDOMAIN_BUCKETNAME and "." in host:
+        # like moto.s3.utils.bucket_name_from_url, which imports all of moto.s3
+        bucket = None
+        if "amazonaws.com" in host:
+            match = S3_BUCKET_HOST.search(host)
+            bucket = match.group(1) if match else None
+        else:
+            try:
+                ipaddress.ip_address(host)
+            except ValueError:
+                bucket = host.split(".")[0]
+        if bucket:
+            return bucket, path[1:]
+    bucket, _, key = path[1:].partition("/")
+    return bucket or None, key
+
+
+def s3_delete_keys(body: bytes) -> List[str]:
+    """The keys in the body of an s3 delete_objects request"""
+    keys = []
+    for obj in ET.fromstring(body):
+        if obj.tag.rsplit("}", 1)[-1] == "Object":
+            for child in obj:
+                if child.tag.rsplit("}", 1)[-1] == "Key":
+                    keys.append(child.text or "")
+    return keys
+
+
+class MotoJournal:
+    """
+    A journal of the moto backends that requests mutate, with the state before
+    the first mutation, so that a rollback restores that state.  It journals
+    the requests to the moto.server applications, i.e. for a MotoService, but
+    not the requests to the moto mocks.
+    """
+
+    def __init__(self, service_backends: Callable[[str], List[BackendDict]]):
+        self._service_backends = service_backends
+        self._lock = threading.RLock()
+        self._enabled = False
+        self._paused: Set[Hashable] = set()
+        # {service_name: snapshot} for the services without any entity journal,
+        # or None when a rollback is a reset for a service
+        self._snapshots: Dict[str, Optional[BackendSnapshot]] = dict()
+        # {account_id: {arn: tags}} for the s3 tags
+        self._s3_tags: Dict[str, Dict[str, Dict]] = dict()
+        # {(account_id, bucket): (bucket, bucket state)} or None for a new bucket
+        self._s3_buckets: Dict[Tuple[str, str], Optional[Tuple[object, StateCopy]]] = dict()
+        # {(account_id, bucket, key): key versions} or None for a new key
+        self._s3_keys: Dict[Tuple[str, str, str], Optional[StateCopy]] = dict()
+        # {(account_id, bucket): multipart uploads}
+        self._s3_uploads: Dict[Tuple[str, str], StateCopy] = dict()
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    @property
+    def recording(self) -> bool:
+        return self._enabled and not self._paused
+
+    def start(self):
+        self._enabled = True
+
+    def stop(self):
+        with self._lock:
+            self._enabled = False
+            self._paused.clear()
+            self.discard()
+
+    def pause(self, key: Hashable):
+        """Stop recording until `resume(key)`, e.g. to set up a session fixture"""
+        with self._lock:
+            self._paused.add(key)
+
+    def resume(self, key: Hashable):
+        with self._lock:
+            self._paused.discard(key)
+
+    def services(self) -> Set[str]:
+        """The services that are journaled"""
+        services = set(self._snapshots)
+        if self._s3_tags:
+            services.add("s3")
+        return services
+
+    def record(self, service_name: str, environ: Dict):
+        """Journal the state that a moto request could change, before the request"""
+        body = b""
+        if environ.get("CONTENT_TYPE", "").startswith("application/x-www-form-urlencoded"):
+            body = _read_body(environ)
+        if not is_mutation(environ, body):
+            return
+
+        with self._lock:
+            if not self.recording or service_name in self._snapshots:
+                return
+            if service_name == "s3" and self._record_s3(environ):
+                return
+            for name in [service_name] + RELATED_SERVICES.get(service_name, []):
+                if name not in self._snapshots:
+                    self._snapshots[name] = self._snapshot(name)
+
+    def _snapshot(self, service_name: str) -> Optional[BackendSnapshot]:
+        LOGGER.debug("Journal a snapshot of the moto %s backends", service_name)
+        try:
+            return snapshot_backends(self._service_backends(service_name))
+        except Exception as err:
+            # e.g. the lambda backends have a weakref dict, which cannot be copied
+            LOGGER.warning(
+                "A rollback of the moto %s backends is a reset, without a snapshot (%r)",
+                service_name,
+                err,
+            )
+            return None
+
+    def _record_s3(self, environ: Dict) -> bool:
+        bucket_name, key = s3_bucket_key(environ)
+        if not bucket_name:
+            return False
+        method = environ.get("REQUEST_METHOD")
+        query = parse_qs(environ.get("QUERY_STRING", ""), keep_blank_values=True)
+        if key:
+            keys = [key]
+        elif method == "POST" and "delete" in query:
+            try:
+                keys = s3_delete_keys(_read_body(environ))
+            except ET.ParseError:
+                return False
+        elif method in ("PUT", "DELETE"):
+            keys = []
+        else:
+            return False  # e.g. a POST of a form
+
+        uploads = "uploads" in query or "uploadId" in query
+        self._record_s3_keys(request_account(environ), bucket_name, keys, uploads)
+        return True
+
+    def record_s3(
+        self,
+        account_id: str,
+        bucket_name: str,
+        keys: Iterable[str] = (),
+        uploads: bool = False,
+    ):
+        """
+        Journal the state of an s3 bucket and some keys (or multipart uploads),
+        before they are changed without any request, e.g. by a direct write to
+        the moto backend
+        """
+        with self._lock:
+            if self.recording and "s3" not in self._snapshots:
+                self._record_s3_keys(account_id, bucket_name, keys, uploads)
+
+    def _record_s3_keys(
+        self, account_id: str, bucket_name: str, keys: Iterable[str], uploads: bool = False
+    ):
+        backend = moto.backends.get_backend("s3")[account_id]["global"]
+        if account_id not in self._s3_tags:
+            self._s3_tags[account_id] = {
+                arn: dict(tags) for arn, tags in backend.tagger.tags.items()
+            }
+
+        bucket = backend.buckets.get(bucket_name)
+        bucket_id = (account_id, bucket_name)
+        if bucket_id not in self._s3_buckets:
+            if bucket is None:
+                self._s3_buckets[bucket_id] = None
+            else:
+                state = {k: v for k, v in bucket.__dict__.items() if k not in S3_BUCKET_ENTITIES}
+                self._s3_buckets[bucket_id] = (bucket, StateCopy(state))
+        if bucket is None:
+            return  # any keys are new
+
+        for key in keys:
+            key_id = (account_id, bucket_name, key)
+            if key_id not in self._s3_keys:
+                versions = bucket.keys.getlist(key)
+                self._s3_keys[key_id] = StateCopy(list(versions)) if versions else None
+        if uploads and bucket_id not in self._s3_uploads:
+            self._s3_uploads[bucket_id] = StateCopy(dict(bucket.multiparts))
+
+    def rollback(self, service_names: Optional[Iterable[str]] = None) -> int:
+        """
+        Restore the state of the journaled backends for some services, or every
+        service, and clear the journal for them; this returns the number of
+        services that are restored.
+        """
+        start = time.perf_counter()
+        with self._lock, backend_lock:
+            services = self.services()
+            if service_names is not None:
+                services.intersection_update(service_names)
+            for service_name in services:
+                if service_name in self._snapshots:
+                    snapshot = self._snapshots.pop(service_name)
+                    if snapshot is None:
+                        reset_backends(self._service_backends(service_name))
+                    else:
+                        restore_backends(snapshot)
+                if service_name == "s3":
+                    self._rollback_s3()
+
+        if services:
+            LOGGER.debug(
+                "Rollback of the moto %s backends in %.4f s",
+                ", ".join(sorted(services)),
+                time.perf_counter() - start,
+            )
+        return len(services)
+
+    def _rollback_s3(self):
+        s3_backends = moto.backends.get_backend("s3")
+        for account_id, tags in self._s3_tags.items():
+            tagger = s3_backends[account_id]["global"].tagger
+            tagger.tags.clear()
+            tagger.tags.update(tags)
+
+        for (account_id, bucket_name), saved in self._s3_buckets.items():
+            backend = s3_backends[account_id]["global"]
+            bucket = backend.buckets.get(bucket_name)
+            if saved is None:
+                # a new bucket
+                if bucket is not None:
+                    dispose_s3_bucket(backend.buckets.pop(bucket_name))
+                    s3_backends.bucket_accounts.pop(bucket_name, None)
+                continue
+            saved_bucket, state = saved
+            if bucket is not saved_bucket:
+                # the bucket is deleted, or replaced
+                if bucket is not None:
+                    dispose_s3_bucket(bucket)
+                backend.buckets[bucket_name] = saved_bucket
+                s3_backends.bucket_accounts[bucket_name] = account_id
+            saved_bucket.__dict__.update(state.load())
+
+        for (account_id, bucket_name, key), versions in self._s3_keys.items():
+            bucket = s3_backends[account_id]["global"].buckets.get(bucket_name)
+            if bucket is None:
+                continue
+            if versions is None:
+                dispose_s3_keys(bucket, [key])
+            else:
+                bucket.keys.setlist(key, versions.load())
+
+        for (account_id, bucket_name), uploads in self._s3_uploads.items():
+            bucket = s3_backends[account_id]["global"].buckets.get(bucket_name)
+            if bucket is None:
+                continue
+            for upload_id in list(bucket.multiparts):
+                del bucket.multiparts[upload_id]
+            bucket.multiparts.update(uploads.load())
+
+        self._discard_s3()
+
+    def _discard_s3(self):
+        self._s3_tags.clear()
+        self._s3_buckets.clear()
+        self._s3_keys.clear()
+        self._s3_uploads.clear()
+
+    def discard(self, service_names: Optional[Iterable[str]] = None):
+        """
+        Clear the journal for some services, or every service, without a
+        rollback, e.g. when the backends for the services are reset.
+        """
+        with self._lock:
+            services = self.services()
+            if service_names is not None:
+                services.intersection_update(service_names)
+            for service_name in services:
+                self._snapshots.pop(service_name, None)
+                if service_name == "s3":
+                    self._discard_s3()
+
+
+def dispose_s3_keys(bucket, keys: Optional[Iterable[str]] = None):
+    """
+    Remove some keys (or all keys) from a moto s3 bucket and close the files for
+    the key versions; the moto key store cannot pop a key with a delete marker
+    """
+    if keys is None:
+        keys = list(bucket.keys)
+    for key in keys:
+        for version in dict.pop(bucket.keys, key, []):
+            if hasattr(version, "dispose"):
+                version.dispose()
+
+
+def dispose_s3_bucket(bucket):
+    """Remove all the keys and multipart uploads from a moto s3 bucket"""
+    dispose_s3_keys(bucket)
+    for upload_id in list(bucket.multiparts):
+        del bucket.multiparts[upload_id]
+
+
+class MotoJournalApp:
+    """
+    A WSGI application that journals the requests for a moto.server
+    DomainDispatcherApplication while the journal is recording; any other
+    attributes are the attributes of the dispatcher, e.g. `app_instances`.
+    """
+
+    def __init__(self, dispatcher, journal: MotoJournal):
+        self.dispatcher = dispatcher
+        self.journal = journal
+
+    def __getattr__(self, name: str):
+        return getattr(self.dispatcher, name)
+
+    def _service_name(self, environ: Dict) -> Optional[str]:
+        host = environ.get("HTTP_HOST", "").split(":")[0]
+        service_name = self.dispatcher.get_backend_for_host(host)
+        if not service_name:
+            body = b""
+            if environ.get("CONTENT_TYPE", "").startswith("application/x-www-form-urlencoded"):
+                body = _read_body(environ)
+            host = self.dispatcher.infer_service_region_host(body.decode("utf-8"), environ)
+            service_name = self.dispatcher.get_backend_for_host(host)
+        return service_name
+
+    def __call__(self, environ: Dict, start_response):
+        if self.journal.recording and not environ.get("PATH_INFO", "").startswith("/moto-api"):
+            service_name = self._service_name(environ)
+            if service_name:
+                self.journal.record(service_name, environ)
+        return self.dispatcher(environ, start_response)
@@ -0,0 +1,146 @@
+# Copyright 2019-2023 Darren Weber
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Seed (and drop) the moto s3 backends directly, without any requests
+
+A fixture that creates many s3 objects with a client spends most of the time
+in botocore, to serialize and sign each put_object (and the waiters for it).
+These functions create buckets and keys in the moto s3 backend for the account
+of a test, which is used by the moto mocks and by any MotoService (or
+AioMotoService) server in the test process.  A moto server process has its
+own backends, so it cannot be seeded.  A bucket with many keys can be dropped
+from a backend, rather than a delete request for each key.
+"""
+
+import os
+from typing import Iterable
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+import moto.backends
+from moto.core import DEFAULT_ACCOUNT_ID
+from moto.s3.models import S3Backend
+from moto.s3.models import get_canned_acl
+
+from pytest_aiomoto.moto_journal import dispose_s3_bucket
+from pytest_aiomoto.moto_services import MOTO_SERVER_PROCESS
+from pytest_aiomoto.moto_services import MotoService
+from pytest_aiomoto.moto_services import moto_journal
+from pytest_aiomoto.s3_object import S3Object
+from pytest_aiomoto.s3_object import S3ObjectSet
+
+
+def moto_account_id() -> str:
+    """The moto account for the requests of a test, like `BaseResponse.get_current_account`"""
+    return os.environ.get("MOTO_ACCOUNT_ID", DEFAULT_ACCOUNT_ID)
+
+
+def moto_s3_backend(
+    account_id: Optional[str] = None, moto_server: Optional[MotoService] = None
+) -> S3Backend:
+    """
+    The moto s3 backend for an account, or the account of a test
+
+    :param account_id: a moto account ID, or the account of a test
+    :param moto_server: a MotoService to seed, which must be in the test process
+    :raises RuntimeError: for a moto server process
+    """
+    if moto_server is not None and moto_server.server_mode == MOTO_SERVER_PROCESS:
+        raise RuntimeError("A moto server process has its own s3 backends")
+    account_id = account_id or moto_account_id()
+    return moto.backends.get_backend("s3")[account_id]["global"]
+
+
+def seed_s3_bucket(
+    bucket_name: str,
+    aws_region: str,
+    acl: Optional[str] = "public-read-write",
+    account_id: Optional[str] = None,
+    moto_server: Optional[MotoService] = None,
+) -> str:
+    """
+    Create an s3 bucket in the moto backend, like `create_s3_bucket` does
+    with a client (without the waiters for it)
+
+    :return: the bucket_name
+    :raises moto.s3.exceptions.BucketAlreadyExists: for a bucket in any account
+    """
+    account_id = account_id or moto_account_id()
+    backend = moto_s3_backend(account_id, moto_server)
+    moto_journal.record_s3(account_id, bucket_name)
+    backend.create_bucket(bucket_name, aws_region)
+    if acl:
+        backend.put_bucket_acl(bucket_name, get_canned_acl(acl))
+    return bucket_name
+
+
+def seed_s3_objects(
+    bucket_name: str,
+    objects: Iterable[Tuple[str, Union[str, bytes, memoryview]]],
+    account_id: Optional[str] = None,
+    moto_server: Optional[MotoService] = None,
+) -> S3ObjectSet:
+    """
+    Put the (key, body) pairs in an s3 bucket in the moto backend; a str body
+    is encoded as UTF-8, and a memoryview body is copied into the backend.
+
+    :return: an S3ObjectSet of the keys
+    :raises moto.s3.exceptions.MissingBucket: when the bucket does not exist
+    """
+    account_id = account_id or moto_account_id()
+    backend = moto_s3_backend(account_id, moto_server)
+    s3_objects = S3ObjectSet(bucket_name)
+    for key, body in objects:
+        if isinstance(body, str):
+            body = body.encode()
+        moto_journal.record_s3(account_id, bucket_name, [key])
+        backend.put_object(bucket_name, key, body)
+        s3_objects.append(key)
+    return s3_objects
+
+
+def seed_s3_object(
+    bucket_name: str,
+    key: str,
+    body: Union[str, bytes],
+    account_id: Optional[str] = None,
+    moto_server: Optional[MotoService] = None,
+) -> S3Object:
+    """Put one object in an s3 bucket in the moto backend"""
+    return seed_s3_objects(bucket_name, [(key, body)], account_id, moto_server)[0]
+
+
+def drop_s3_bucket(
+    bucket_name: str,
+    account_id: Optional[str] = None,
+    moto_server: Optional[MotoService] = None,
+) -> bool:
+    """
+    Delete an s3 bucket, with all of its keys (and versions) and multipart
+    uploads, in the moto backend, rather than a delete request for each key
+
+    :return: True when the bucket is dropped, or False when the bucket is
+        not in the backend for the account
+    """
+    account_id = account_id or moto_account_id()
+    backend = moto_s3_backend(account_id, moto_server)
+    bucket = backend.buckets.get(bucket_name)
+    if bucket is None:
+        return False
+    moto_journal.record_s3(account_id, bucket_name, list(bucket.keys), uploads=True)
+    dispose_s3_bucket(bucket)
+    backend.delete_bucket(bucket_name)
+    return True
@@ -12,71 +12,416 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import functools
+import importlib
 import logging
+import multiprocessing
 import os
+import socket
 import threading
 import time
+import traceback
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Set
+from typing import Tuple
 
 import moto.backends
 import moto.server
 import urllib3
 import werkzeug.serving
-
+import werkzeug.wsgi
+from aiohttp import web
+from moto.core.base_backend import BackendDict
+from moto.s3.responses import S3Response
+
+from pytest_aiomoto.aiomoto_inprocess import inprocess_app
+from pytest_aiomoto.aiomoto_inprocess import register_inprocess_app
+from pytest_aiomoto.aiomoto_inprocess import unregister_inprocess_app
+from pytest_aiomoto.aiomoto_server import HOP_BY_HOP_HEADERS
+from pytest_aiomoto.aiomoto_server import aio_wsgi_app
+from pytest_aiomoto.aiomoto_server import wsgi_call
+from pytest_aiomoto.moto_backends import BackendSnapshot
+from pytest_aiomoto.moto_backends import account_isolation
+from pytest_aiomoto.moto_backends import isolated_account
+from pytest_aiomoto.moto_backends import reset_backends
+from pytest_aiomoto.moto_backends import restore_backends
+from pytest_aiomoto.moto_backends import snapshot_backends
+from pytest_aiomoto.moto_journal import MotoJournal
+from pytest_aiomoto.moto_journal import MotoJournalApp
 from pytest_aiomoto.utils import AWS_HOST
-from pytest_aiomoto.utils import get_free_tcp_port
+from pytest_aiomoto.utils import get_server_socket
 
 _PYCHARM_HOSTED = os.environ.get("PYCHARM_HOSTED") == "1"
 CONNECT_TIMEOUT = 90 if _PYCHARM_HOSTED else 10
 
+# A MotoService for this service name dispatches requests for all
+# the moto services from one moto.server on one port.
+MOTO_ALL_SERVICES = "all"
+
+# A MotoService can run the moto.server in a thread of the test process,
+# or in a child process so the server does not compete for the GIL, or
+# on an asyncio event loop to avoid any thread hops for asyncio clients,
+# or in-process for aiobotocore clients, without any server.
+MOTO_SERVER_THREAD = "thread"
+MOTO_SERVER_PROCESS = "process"
+MOTO_SERVER_ASYNCIO = "asyncio"
+MOTO_SERVER_INPROCESS = "inprocess"
+MOTO_SERVER_MODES = (
+    MOTO_SERVER_THREAD,
+    MOTO_SERVER_PROCESS,
+    MOTO_SERVER_ASYNCIO,
+    MOTO_SERVER_INPROCESS,
+)
+
+
+# A moto service that is mocked by a 'simple' backend, which wraps the
+# backends for the full service, e.g. the moto.server uses batch_simple
+# for batch, but the batch resources are in the batch backends.
+MOTO_WRAPPED_BACKENDS = {"batch": ("moto.batch.models", "batch_backends")}
+
+
+def moto_service_backends(service_name: str) -> List[BackendDict]:
+    """
+    The backends for a moto service, including any backends that it wraps;
+    for MOTO_ALL_SERVICES, the backends for every service that is loaded.
+    """
+    if service_name == MOTO_ALL_SERVICES:
+        service_names = [name for name, _ in moto.backends.loaded_backends()]
+    else:
+        service_names = [service_name]
+
+    service_backends = []
+    for name in service_names:
+        backends = [moto.backends.get_backend(name)]
+        if name in MOTO_WRAPPED_BACKENDS:
+            module_name, backends_name = MOTO_WRAPPED_BACKENDS[name]
+            backends.append(getattr(importlib.import_module(module_name), backends_name))
+        for backend_dict in backends:
+            # e.g. s3 and s3bucket_path share the s3 backends
+            if isinstance(backend_dict, BackendDict) and backend_dict not in service_backends:
+                service_backends.append(backend_dict)
+    return service_backends
+
+
+# the journal of the requests to any moto.server application in this process
+moto_journal = MotoJournal(moto_service_backends)
+
 
 def moto_service_reset(service_name: str):
     """
     Reset a moto service backend, for all regions.
     Each service can have multiple regional backends.
+    For MOTO_ALL_SERVICES, this resets every service backend that is loaded.
+    With backend tracking, only the backends used since a reset are reset.
+    """
+    moto_journal.discard(None if service_name == MOTO_ALL_SERVICES else [service_name])
+    reset_backends(moto_service_backends(service_name))
+
+
+def moto_service_snapshot(service_names: Iterable[str]) -> BackendSnapshot:
+    """
+    Copy the state of the backends for some moto services, for all regions;
+    `restore_backends(snapshot)` restores it, e.g. before each test.
     """
-    service_backends = moto.backends.get_backend(service_name)
-    if service_backends:
-        for region_name, backend in service_backends.items():
-            backend.reset()
+    return snapshot_backends(
+        backend_dict for name in service_names for backend_dict in moto_service_backends(name)
+    )
+
+
+# werkzeug compiles the url rules of a moto app with ast.parse, which is not
+# thread safe in some python versions (cpython gh-106905), so the moto apps
+# for concurrent servers are created one at a time, with this lock
+_moto_app_lock = threading.RLock()
 
 
 def moto_service_app(service_name: str):
+    """
+    A moto.server application for one service; for MOTO_ALL_SERVICES,
+    the application dispatches requests to any service, using the host
+    or the request signature to identify the service for each request.
+    The application journals the requests while the moto_journal is recording.
+    """
+    service: Optional[str] = service_name
+    if service_name == MOTO_ALL_SERVICES:
+        service = None
     app = moto.server.DomainDispatcherApplication(
-        moto.server.create_backend_app, service=service_name
+        moto.server.create_backend_app, service=service
     )
+    # a dispatcher creates the app for a service with this lock
+    app.lock = _moto_app_lock
+    if service:
+        # create the backend app now, rather than on the first request
+        with _moto_app_lock:
+            app.app_instances[service] = app.create_app(service)
     app.debug = True
-    return app
+    return MotoJournalApp(app, moto_journal)
+
+
+# the S3Response methods for the moto s3 url paths
+S3_RESPONSE_HANDLERS = ("bucket_response", "ambiguous_response", "key_response")
+
+_s3_response_lock = threading.RLock()
+
+
+def _serialized_response(func):
+    @functools.wraps(func)
+    def serialized(self, *args, **kwargs):
+        with _s3_response_lock:
+            return func(self, *args, **kwargs)
+
+    serialized.serialized = True
+    return serialized
+
+
+def serialize_s3_responses():
+    """
+    Serve one moto s3 request at a time, for the moto mocks and servers in
+    this process, e.g. the requests from a thread pool or an asyncio.gather.
+    The moto s3 responses are not thread safe, because one S3Response
+    instance keeps each request in its attributes; moto reloads the s3 url
+    paths for the S3ResponseInstance, so this wraps the S3Response methods
+    for them.  The pytest plugin and the servers apply it; it is idempotent.
+    """
+    for name in S3_RESPONSE_HANDLERS:
+        func = getattr(S3Response, name)
+        if not getattr(func, "serialized", False):
+            setattr(S3Response, name, _serialized_response(func))
+
+
+class KeepAliveRequestHandler(werkzeug.serving.WSGIRequestHandler):
+    """
+    A werkzeug request handler for HTTP/1.1 persistent connections.
+
+    The werkzeug handler always responds with 'Connection: close' and then it
+    discards anything else the client sends.  This handler buffers each moto
+    response, drains any unread request body and keeps the connection open,
+    unless the client asks to close it.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # the headers and body are separate writes, so avoid the delayed ACK
+    # from the client on a persistent connection
+    disable_nagle_algorithm = True
+
+    def make_environ(self):
+        environ = super().make_environ()
+        if not environ.get("wsgi.input_terminated"):
+            content_length = int(environ.get("CONTENT_LENGTH") or 0)
+            environ["wsgi.input"] = werkzeug.wsgi.LimitedStream(self.rfile, content_length)
+        return environ
+
+    def run_wsgi(self):
+        if self.headers.get("Expect", "").lower().strip() == "100-continue":
+            self.wfile.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+        self.environ = environ = self.make_environ()
+        try:
+            status, headers, body = wsgi_call(self.server.app, environ)
+        except Exception:
+            self.log_error("Error on request:\n%s", traceback.format_exc())
+            status, headers, body = 500, [], b""
+            self.close_connection = True
+
+        self.send_response(status)
+        header_keys = set()
+        for key, value in headers:
+            if key.lower() not in HOP_BY_HOP_HEADERS:
+                self.send_header(key, value)
+                header_keys.add(key.lower())
+        if "content-length" not in header_keys:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+        # drain the request body, so the next request line is aligned
+        while environ["wsgi.input"].read(64 * 1024):
+            pass
+
+
+def make_moto_server(
+    ip_address: str,
+    port: int,
+    app,
+    keep_alive: bool = False,
+    sckt: Optional[socket.socket] = None,
+) -> werkzeug.serving.BaseWSGIServer:
+    """
+    A threaded werkzeug server, with HTTP/1.1 persistent connections for keep_alive;
+    the server accepts connections on a listening socket, if one is given, and
+    the socket is closed when the server has a duplicate of it.
+    """
+    request_handler = KeepAliveRequestHandler if keep_alive else None
+    if sckt is None:
+        return werkzeug.serving.make_server(
+            ip_address, port, app, True, request_handler=request_handler
+        )
+
+    with sckt:
+        return werkzeug.serving.make_server(
+            ip_address, port, app, True, request_handler=request_handler, fd=sckt.fileno()
+        )
+
+
+def moto_server_process(
+    service_name: str,
+    ip_address: str,
+    port: int,
+    conn,
+    keep_alive: bool = False,
+    sckt: Optional[socket.socket] = None,
+    account_header: bool = False,
+):
+    """
+    The target for a moto server process; it sends None on the conn
+    when the server is ready, or an error message if it cannot start.
+    With account_header, the account for each request is in the
+    'x-moto-account-id' header, rather than the MOTO_ACCOUNT_ID
+    environment variable that the process could inherit from a test.
+    """
+    if account_header:
+        os.environ.pop("MOTO_ACCOUNT_ID", None)
+    try:
+        # the moto s3 requests are concurrent for the aio helpers
+        serialize_s3_responses()
+        app = moto_service_app(service_name=service_name)
+        server = make_moto_server(ip_address, port, app, keep_alive=keep_alive, sckt=sckt)
+    except BaseException as err:
+        conn.send(repr(err))
+        conn.close()
+        return
+
+    conn.send(None)
+    conn.close()
+    server.serve_forever()
 
 
 class MotoService:
     """Will Create MotoService.
     Service is ref-counted so there will only be one per process. Real Service will
-    be returned by `__enter__`."""
+    be returned by `__enter__`.
+
+    Use MotoService(MOTO_ALL_SERVICES) for one server that handles requests for
+    all services, so that clients for many services can share one port.
+
+    Use MotoService(service_name, server_mode=MOTO_SERVER_PROCESS) to run the
+    server in a child process; the service backends are then only available
+    through the endpoint_url, and `reset` uses the moto-api reset endpoint.
+
+    Use MotoService(service_name, server_mode=MOTO_SERVER_ASYNCIO) to serve
+    requests from an aiohttp server, with up to `max_concurrency` requests in
+    progress; a MotoService runs it on a dedicated event loop thread and an
+    AioMotoService runs it on the event loop of the test.
+
+    Use keep_alive=True for HTTP/1.1 persistent connections to a werkzeug server
+    (the asyncio server always allows persistent connections).
+
+    Use MotoService(service_name, server_mode=MOTO_SERVER_INPROCESS) to serve
+    requests from aiobotocore clients in this process, without any server; the
+    clients must be created by an AioSession with the in-process handler, see
+    `aio_moto_inprocess_register`, and any other clients cannot connect.
+
+    Without a port, the service binds a listening socket on a free port and the
+    server accepts connections on it, so the port is never released for another
+    process to use; pytest-xdist workers allocate ports from separate ranges."""
 
     _services = dict()  # {name: instance}
+    _services_lock = threading.Lock()  # for the _services and each _refcount
+
+    def __init__(
+        self,
+        service_name: str,
+        port: int = None,
+        health_check: bool = False,
+        server_mode: str = MOTO_SERVER_THREAD,
+        max_concurrency: int = 100,
+        keep_alive: bool = False,
+    ):
+        if server_mode not in MOTO_SERVER_MODES:
+            raise ValueError(f"Unknown server_mode: {server_mode}")
 
-    def __init__(self, service_name: str, port: int = None):
         self._service_name = service_name
+        self._health_check = health_check
+        self._server_mode = server_mode
+        self._max_concurrency = max_concurrency
+        self._keep_alive = keep_alive
 
+        self._ip_address = AWS_HOST
         if port:
             self._socket = None
             self._port = port
         else:
-            self._socket, self._port = get_free_tcp_port()
+            # an in-process service only reserves a port for the endpoint_url
+            self._socket, self._port = get_server_socket(
+                self._ip_address, listen=server_mode != MOTO_SERVER_INPROCESS
+            )
 
         self._thread = None
         self._logger = logging.getLogger(self.__class__.__name__)
         self._refcount = 0
-        self._ip_address = AWS_HOST
+        self._registered: Optional[MotoService] = None
+        self._started = threading.Event()
         self._server = None
+        self._process = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._ready = threading.Event()
+        self._ready_callback: Optional[Callable[[], None]] = None
+        self._start_error: Optional[BaseException] = None
 
     @property
     def endpoint_url(self):
         return "http://{}:{}".format(self._ip_address, self._port)
 
-    def reset(self):
-        moto_service_reset(service_name=self._service_name)
+    @property
+    def server_mode(self) -> str:
+        return self._server_mode
+
+    def reset(self, service_name: Optional[str] = None):
+        """
+        Reset the backends for a service, by default the service for this server.
+        For a server in a child process, the moto-api resets all of its backends,
+        except with account isolation between tests, when no test can use them.
+        """
+        if self._server_mode == MOTO_SERVER_PROCESS:
+            if account_isolation() and not isolated_account():
+                return
+            if self._process and self._process.is_alive():
+                http = urllib3.PoolManager()
+                resp = http.request(
+                    "POST", self.endpoint_url + "/moto-api/reset", timeout=CONNECT_TIMEOUT
+                )
+                assert resp.status == 200
+            return
+
+        moto_service_reset(service_name=service_name or self._service_name)
+
+    def snapshot(self, service_names: Optional[Iterable[str]] = None) -> BackendSnapshot:
+        """
+        Copy the state of the backends for some services, by default the service
+        for this server, e.g. after creating the resources for many tests.  A server
+        in a child process does not share the backends, so it has no snapshots.
+        """
+        if self._server_mode == MOTO_SERVER_PROCESS:
+            raise RuntimeError("A moto server process has no backend snapshots")
+        return moto_service_snapshot(service_names or [self._service_name])
+
+    def restore(self, snapshot: BackendSnapshot):
+        """
+        Restore the state of the backends in a snapshot, which replaces any changes
+        since the snapshot; this is a reset for the services in the snapshot.
+        """
+        if self._server_mode == MOTO_SERVER_PROCESS:
+            raise RuntimeError("A moto server process has no backend snapshots")
+        moto_journal.discard({backends.service_name for backends in snapshot.service_backends})
+        restore_backends(snapshot)
 
     def __call__(self, func):
         def wrapper(*args, **kwargs):
@@ -85,6 +430,7 @@ class MotoService:
                 result = func(*args, **kwargs)
             finally:
                 self._stop()
+                self._close_socket()
             return result
 
         functools.update_wrapper(wrapper, func)
@@ -92,67 +438,437 @@ class MotoService:
         return wrapper
 
     def __enter__(self):
-        svc = self._services.get(self._service_name)
-        if svc is None:
-            self._services[self._service_name] = self
-            self._refcount = 1
-            self._start()
-            return self
-        else:
-            svc._refcount += 1
-            return svc
+        svc, is_new = self._acquire()
+        if is_new:
+            with self._starting():
+                self._start()
+        elif not svc._started.wait(CONNECT_TIMEOUT) or svc._start_error:
+            self._release()
+            raise svc._start_failed() from svc._start_error
+        return svc
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self._refcount -= 1
+        self._close_socket()
+        svc = self._release()
+        if svc:
+            svc._stop()
+
+    def _acquire(self) -> Tuple["MotoService", bool]:
+        """
+        Add a reference to the registered service for this service name, or
+        register this service; it returns the service and whether it is new,
+        in which case the caller must start it.
+        """
+        with self._services_lock:
+            svc = self._services.get(self._service_name)
+            is_new = svc is None
+            if is_new:
+                svc = self._services[self._service_name] = self
+                self._started.clear()
+                self._start_error = None
+            svc._refcount += 1
+        self._registered = svc
+        if not is_new:
+            self._close_socket()  # the registered service is used instead
+        return svc, is_new
 
+    def _close_socket(self):
+        """Close the listening socket, if a server did not take it over"""
         if self._socket:
             self._socket.close()
             self._socket = None
 
-        if self._refcount == 0:
+    def _release(self) -> Optional["MotoService"]:
+        """
+        Release a reference to the registered service; it returns the service
+        when it is no longer used and it is unregistered, so it must be stopped.
+        """
+        svc = self._registered
+        if svc is None:
+            return None
+        with self._services_lock:
+            svc._refcount -= 1
+            if svc._refcount > 0 or self._services.get(self._service_name) is not svc:
+                return None
             del self._services[self._service_name]
-            self._stop()
+            return svc
+
+    @contextmanager
+    def _starting(self):
+        """
+        Signal the end of a start to any concurrent users of a new service;
+        when the start fails, the service is unregistered.
+        """
+        try:
+            yield
+        except BaseException as err:
+            self._start_error = self._start_error or err
+            with self._services_lock:
+                if self._services.get(self._service_name) is self:
+                    del self._services[self._service_name]
+            self._release()
+            raise
+        finally:
+            self._started.set()
 
     def _server_entry(self):
-        self._main_app = moto_service_app(service_name=self._service_name)
+        try:
+            self._main_app = moto_service_app(service_name=self._service_name)
+
+            # the server takes over the listening socket, if there is one
+            sckt, self._socket = self._socket, None
+            self._server = make_moto_server(
+                self._ip_address,
+                self._port,
+                self._main_app,
+                keep_alive=self._keep_alive,
+                sckt=sckt,
+            )
+        except BaseException as err:
+            # werkzeug can sys.exit on errors, so catch anything
+            self._logger.error("Cannot start server for %s: %r", self._service_name, err)
+            self._server_ready(err)
+            return
+
+        # the server socket is bound and listening, so any requests
+        # are queued until serve_forever accepts them
+        self._server_ready()
+        self._server.serve_forever()
 
-        if self._socket:
-            self._socket.close()  # release right before we use it
-            self._socket = None
+    async def _start_web_server(self) -> web.AppRunner:
+        self._main_app = moto_service_app(service_name=self._service_name)
+        app = aio_wsgi_app(self._main_app, max_concurrency=self._max_concurrency)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+
+        # the server takes over the listening socket, if there is one
+        sckt, self._socket = self._socket, None
+        try:
+            if sckt:
+                site = web.SockSite(runner, sckt)
+            else:
+                site = web.TCPSite(runner, self._ip_address, self._port)
+            await site.start()
+        except BaseException:
+            if sckt:
+                sckt.close()
+            await runner.cleanup()
+            raise
+        return runner
+
+    def _loop_entry(self):
+        # This thread runs an event loop for an asyncio server,
+        # when it is started without an event loop.
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        try:
+            self._runner = loop.run_until_complete(self._start_web_server())
+        except BaseException as err:
+            self._logger.error("Cannot start server for %s: %r", self._service_name, err)
+            self._loop = None
+            loop.close()
+            self._server_ready(err)
+            return
+
+        self._server_ready()
+        try:
+            loop.run_forever()
+            loop.run_until_complete(self._runner.cleanup())
+        finally:
+            self._runner = None
+            self._loop = None
+            loop.close()
+
+    def _process_entry(self):
+        # This thread supervises a server process, so the readiness
+        # signals are the same as for a server thread.
+        ctx = multiprocessing.get_context("spawn")
+        recv_conn, send_conn = ctx.Pipe(duplex=False)
+
+        # the server process takes over a duplicate of the listening socket
+        sckt, self._socket = self._socket, None
+        self._process = ctx.Process(
+            target=moto_server_process,
+            args=(self._service_name, self._ip_address, self._port, send_conn),
+            kwargs=dict(
+                keep_alive=self._keep_alive, sckt=sckt, account_header=account_isolation()
+            ),
+            daemon=True,
+        )
+        try:
+            self._process.start()
+        finally:
+            send_conn.close()
+            if sckt:
+                sckt.close()
+
+        try:
+            if recv_conn.poll(CONNECT_TIMEOUT):
+                error = recv_conn.recv()
+            else:
+                error = "timeout waiting for the server process"
+        except EOFError:
+            error = "the server process exited"
+        finally:
+            recv_conn.close()
+
+        if error:
+            self._logger.error("Cannot start server for %s: %s", self._service_name, error)
+            self._server_ready(RuntimeError(error))
+        else:
+            self._server_ready()
+        self._process.join()
+
+    def _server_ready(self, error: Optional[BaseException] = None):
+        """Signal that the server thread is serving requests or failed to start"""
+        self._start_error = error
+        self._ready.set()
+        if self._ready_callback:
+            self._ready_callback()
+
+    def _start_thread(self):
+        self._ready.clear()
+        self._start_error = None
+        if self._server_mode == MOTO_SERVER_PROCESS:
+            target = self._process_entry
+        elif self._server_mode == MOTO_SERVER_ASYNCIO:
+            target = self._loop_entry
+        else:
+            target = self._server_entry
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
 
-        self._server = werkzeug.serving.make_server(
-            self._ip_address, self._port, self._main_app, True
+    def _start_failed(self) -> Exception:
+        return Exception(
+            "Cannot start {}: {}".format(self.__class__.__name__, self._service_name)
         )
-        self._server.serve_forever()
+
+    def _start_inprocess(self):
+        # requests are handled by the moto app in the event loop of the client
+        self._ready.clear()
+        try:
+            self._main_app = moto_service_app(service_name=self._service_name)
+        except Exception as err:
+            self._logger.error("Cannot start service for %s: %r", self._service_name, err)
+            self._server_ready(err)
+            return
+        register_inprocess_app(self.endpoint_url, self._main_app)
+        self._server_ready()
 
     def _start(self):
-        self._thread = threading.Thread(target=self._server_entry, daemon=True)
-        self._thread.start()
+        serialize_s3_responses()
+        if self._server_mode == MOTO_SERVER_INPROCESS:
+            self._start_inprocess()
+        else:
+            self._start_thread()
 
-        http = urllib3.PoolManager()
+        if not self._ready.wait(CONNECT_TIMEOUT) or self._start_error:
+            self._stop()  # pytest.fail doesn't call stop_process
+            raise self._start_failed() from self._start_error
 
-        start = time.time()
+        if self._health_check and not self.health_check():
+            self._stop()
+            raise self._start_failed()
 
-        while time.time() - start < 10:
-            if not self._thread.is_alive():
-                break
+    def health_check(self) -> bool:
+        """
+        An optional probe of a running server; any HTTP response is healthy.
+        """
+        if self._server_mode == MOTO_SERVER_INPROCESS:
+            return inprocess_app(self.endpoint_url) is self._main_app
 
-            try:
-                resp = http.request(
-                    "GET", self.endpoint_url + "/static", timeout=CONNECT_TIMEOUT
-                )
-                break
-            except (
-                urllib3.exceptions.NewConnectionError,
-                urllib3.exceptions.MaxRetryError,
-            ):
-                time.sleep(0.2)
-        else:
-            self._stop()  # pytest.fail doesn't call stop_process
-            raise Exception("Cannot start {}: {}".format(self.__class__.__name__, self._service_name))
+        http = urllib3.PoolManager()
+        try:
+            http.request(
+                "GET", self.endpoint_url + "/static", timeout=CONNECT_TIMEOUT, retries=False
+            )
+            return True
+        except urllib3.exceptions.HTTPError:
+            return False
+
+    def _stop_inprocess(self):
+        unregister_inprocess_app(self.endpoint_url)
+        self._close_socket()  # release the port for the endpoint_url
 
     def _stop(self):
+        if self._server_mode == MOTO_SERVER_INPROCESS:
+            self._stop_inprocess()
+
         if self._server:
             self._server.shutdown()
 
-        self._thread.join()
+        if self._process:
+            self._process.terminate()
+
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+        if self._thread:
+            self._thread.join()
+
+
+class MotoServicePool:
+    """
+    A pool of started services that linger after their last user exits,
+    so that a service is started once and then it is reset between uses;
+    the pooled services are stopped by `shutdown`, e.g. at the end of a
+    pytest session.  The pooled services are not in the MotoService registry,
+    so a `with MotoService(name)` context still starts its own server.
+    A service is pooled for its name and options, so a service with other
+    options is another server.
+    """
+
+    def __init__(self, service_class=MotoService):
+        self._service_class = service_class
+        self._services = dict()  # {(name, options): instance}
+        self._lock = threading.Lock()
+
+    def __contains__(self, service_name: str) -> bool:
+        return any(name == service_name for name, _ in self._services)
+
+    def get(self, service_name: str, **kwargs) -> MotoService:
+        """
+        Get a running service, which is started with any kwargs the first time.
+        """
+        svc, is_new = self._acquire(service_name, kwargs)
+        if is_new:
+            with self._starting(service_name, kwargs, svc):
+                svc._start()
+        elif not svc._started.wait(CONNECT_TIMEOUT) or svc._start_error:
+            raise svc._start_failed() from svc._start_error
+        return svc
+
+    @staticmethod
+    def _key(service_name: str, kwargs: Dict) -> Tuple[str, frozenset]:
+        return service_name, frozenset(kwargs.items())
+
+    def _acquire(self, service_name: str, kwargs: Dict) -> Tuple[MotoService, bool]:
+        """
+        Get the pooled service for the service name and options, or pool a
+        new service; it returns the service and whether it is new, in which
+        case the caller must start it.
+        """
+        key = self._key(service_name, kwargs)
+        with self._lock:
+            svc = self._services.get(key)
+            is_new = svc is None
+            if is_new:
+                svc = self._services[key] = self._service_class(service_name, **kwargs)
+                svc._started.clear()
+                svc._start_error = None
+        return svc, is_new
+
+    @contextmanager
+    def _starting(self, service_name: str, kwargs: Dict, svc: MotoService):
+        """
+        Signal the end of a start to any concurrent users of a new service;
+        when the start fails, the service is removed from the pool.
+        """
+        try:
+            yield
+        except BaseException as err:
+            svc._start_error = svc._start_error or err
+            with self._lock:
+                self._services.pop(self._key(service_name, kwargs), None)
+            svc._close_socket()
+            raise
+        finally:
+            svc._started.set()
+
+    def shutdown(self):
+        """Stop all the pooled services"""
+        with self._lock:
+            services, self._services = self._services, dict()
+        for svc in services.values():
+            svc._stop()
+
+
+class MotoResetCoordinator:
+    """
+    Coordinate the resets that fixtures request for the moto backends, so that
+    a reset is done once in a phase of a test, i.e. the setup or teardown of
+    the fixtures, however many fixtures request it.  For example, an s3 client fixture,
+    the s3 server fixture and the server itself all request an s3 reset when
+    a test is torn down, but the backends are only reset by the first request.
+
+    Outside of a test phase, e.g. in a test function, every request is a reset.
+
+    While the moto_journal is enabled, a reset for a server in this process is a
+    rollback of the journal, or nothing while the journal is paused, e.g. for
+    the setup of a session fixture.  The resets for the moto mocks, or for a
+    server in a child process, are not changed.  The `reset` methods of
+    a MotoService and `moto_service_reset` are not coordinated, so a test can
+    still reset the backends whenever it needs to.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._phase: Optional[Tuple[str, str]] = None  # (test nodeid, phase)
+        self._done: Set[Tuple[Optional[str], str]] = set()  # {(server, service_name)}
+        # {test nodeid: [requests, resets, seconds]}
+        self.test_stats: Dict[str, List] = defaultdict(lambda: [0, 0, 0.0])
+
+    def start_phase(self, nodeid: str, phase: str):
+        """Start a test phase, e.g. ('tests/test_s3.py::test_bucket', 'setup')"""
+        with self._lock:
+            self._phase = (nodeid, phase)
+            self._done = set()
+
+    def stop_phase(self):
+        with self._lock:
+            self._phase = None
+            self._done = set()
+
+    @staticmethod
+    def _reset_key(
+        service_name: str, moto_server: Optional["MotoService"]
+    ) -> Tuple[Optional[str], str]:
+        if moto_server is not None and moto_server.server_mode == MOTO_SERVER_PROCESS:
+            # the moto-api of a server process resets all of its backends
+            return moto_server.endpoint_url, MOTO_ALL_SERVICES
+        # any other server uses the backends in this process
+        return None, service_name
+
+    def reset(self, service_name: str, moto_server: Optional["MotoService"] = None) -> bool:
+        """
+        Request a reset of the backends for a service, with a moto_server
+        reset when it is given; this returns False when the reset is not
+        needed, because it is already done in this test phase.
+        """
+        server, service_name = self._reset_key(service_name, moto_server)
+        with self._lock:
+            phase = self._phase
+            if phase:
+                stats = self.test_stats[phase[0]]
+                stats[0] += 1
+                done = self._done
+                if (server, service_name) in done or (server, MOTO_ALL_SERVICES) in done:
+                    return False
+
+            start = time.perf_counter()
+            if moto_journal.enabled and server is None and moto_server is not None:
+                # a rollback of the journal for a server in this process
+                if moto_journal.recording:
+                    moto_journal.rollback(
+                        None if service_name == MOTO_ALL_SERVICES else [service_name]
+                    )
+            elif moto_server is not None:
+                moto_server.reset(service_name)
+            else:
+                moto_service_reset(service_name)
+            seconds = time.perf_counter() - start
+
+            if phase:
+                self._done.add((server, service_name))
+                stats[1] += 1
+                stats[2] += seconds
+            return True
+
+    def test_resets(self, nodeid: str) -> Tuple[int, int, float]:
+        """The (requests, resets, seconds) for the resets of a test"""
+        requests, resets, seconds = self.test_stats.get(nodeid, (0, 0, 0.0))
+        return requests, resets, seconds
+
+
+# the resets that fixtures request are coordinated by the pytest plugin
+moto_resets = MotoResetCoordinator()
@@ -12,6 +12,41 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+import logging
+import threading
+from typing import Any
+from typing import Dict
+from typing import List
+
+import moto.backends
+import pytest
+
+from pytest_aiomoto.aiomoto_services import aio_moto_service_pool
+from pytest_aiomoto.moto_backends import account_isolation
+from pytest_aiomoto.moto_backends import discard_isolated_accounts
+from pytest_aiomoto.moto_backends import new_isolated_account
+from pytest_aiomoto.moto_backends import reset_stats
+from pytest_aiomoto.moto_backends import retire_isolated_account
+from pytest_aiomoto.moto_backends import start_account_isolation
+from pytest_aiomoto.moto_backends import start_backend_tracking
+from pytest_aiomoto.moto_backends import stop_account_isolation
+from pytest_aiomoto.moto_backends import stop_backend_tracking
+from pytest_aiomoto.moto_services import MOTO_ALL_SERVICES
+from pytest_aiomoto.moto_services import MOTO_SERVER_MODES
+from pytest_aiomoto.moto_services import MOTO_SERVER_THREAD
+from pytest_aiomoto.moto_services import moto_journal
+from pytest_aiomoto.moto_services import moto_resets
+from pytest_aiomoto.moto_services import moto_service_backends
+from pytest_aiomoto.moto_services import serialize_s3_responses
+from pytest_aiomoto.s3_corpus_cache import s3_corpus_cache
+from pytest_aiomoto.s3_verify import S3_VERIFY_POLICIES
+from pytest_aiomoto.s3_verify import S3_VERIFY_STRICT
+from pytest_aiomoto.s3_verify import s3_verify_policy
+from pytest_aiomoto.utils import process_memory_mb
+
+# the thread that starts the moto servers while pytest collects tests
+aiomoto_preload_key = pytest.StashKey[threading.Thread]()
 
 pytest_plugins = [
     "pytest_aiomoto.aws_regions",
@@ -28,6 +63,239 @@ pytest_plugins = [
 ]
 
 
+def pytest_addoption(parser):
+    group = parser.getgroup("aiomoto")
+    group.addoption(
+        "--aiomoto-shared-server",
+        action="store_true",
+        default=None,
+        help="serve all the aio_aws_*_server fixtures from one moto server per session",
+    )
+    parser.addini(
+        "aiomoto_shared_server",
+        type="bool",
+        default=False,
+        help="serve all the aio_aws_*_server fixtures from one moto server per session",
+    )
+
+    group.addoption(
+        "--aiomoto-server-mode",
+        choices=MOTO_SERVER_MODES,
+        default=None,
+        help="run the aiomoto servers in a 'thread', a 'process', on 'asyncio'"
+        " or 'inprocess' for aiobotocore clients",
+    )
+    parser.addini(
+        "aiomoto_server_mode",
+        default=MOTO_SERVER_THREAD,
+        help="run the aiomoto servers in a 'thread' (default), a 'process', on 'asyncio'"
+        " or 'inprocess' for aiobotocore clients",
+    )
+
+    group.addoption(
+        "--aiomoto-keep-alive",
+        action="store_true",
+        default=None,
+        help="use HTTP/1.1 persistent connections for the aiomoto werkzeug servers",
+    )
+    parser.addini(
+        "aiomoto_keep_alive",
+        type="bool",
+        default=False,
+        help="use HTTP/1.1 persistent connections for the aiomoto werkzeug servers",
+    )
+
+    group.addoption(
+        "--aiomoto-server-pool",
+        action="store_true",
+        default=None,
+        help="keep each aiomoto server running until the session finishes",
+    )
+    parser.addini(
+        "aiomoto_server_pool",
+        type="bool",
+        default=False,
+        help="keep each aiomoto server running until the session finishes",
+    )
+
+    group.addoption(
+        "--aiomoto-preload",
+        default=None,
+        help="start the aiomoto servers for these services (comma separated, or 'all'"
+        " for the shared server) in a background thread during test collection",
+    )
+    parser.addini(
+        "aiomoto_preload",
+        type="args",
+        default=[],
+        help="start the aiomoto servers for these services (or 'all' for the shared"
+        " server) in a background thread during test collection",
+    )
+
+    group.addoption(
+        "--aiomoto-reset-tracking",
+        action="store_true",
+        default=None,
+        help="only reset the moto backends that a test used, and report the reset times",
+    )
+    parser.addini(
+        "aiomoto_reset_tracking",
+        type="bool",
+        default=False,
+        help="only reset the moto backends that a test used, and report the reset times",
+    )
+
+    group.addoption(
+        "--aiomoto-account-isolation",
+        action="store_true",
+        default=None,
+        help="use a new moto account for each test, rather than a reset of the moto backends",
+    )
+    parser.addini(
+        "aiomoto_account_isolation",
+        type="bool",
+        default=False,
+        help="use a new moto account for each test, rather than a reset of the moto backends",
+    )
+
+    group.addoption(
+        "--aiomoto-account-memory",
+        type=int,
+        default=None,
+        help="with account isolation, discard the moto backends for previous tests"
+        " when the process memory is above this size (MiB)",
+    )
+    parser.addini(
+        "aiomoto_account_memory",
+        default="1024",
+        help="with account isolation, discard the moto backends for previous tests"
+        " when the process memory is above this size (MiB); the default is 1024",
+    )
+
+    group.addoption(
+        "--aiomoto-batch-snapshot",
+        action="store_true",
+        default=None,
+        help="create the AWS Batch infrastructure once and restore a snapshot of it for each test",
+    )
+    parser.addini(
+        "aiomoto_batch_snapshot",
+        type="bool",
+        default=False,
+        help="create the AWS Batch infrastructure once and restore a snapshot of it for each test",
+    )
+
+    group.addoption(
+        "--aiomoto-journal",
+        action="store_true",
+        default=None,
+        help="journal the requests that mutate the moto backends and roll them back"
+        " after each test, rather than a reset",
+    )
+    parser.addini(
+        "aiomoto_journal",
+        type="bool",
+        default=False,
+        help="journal the requests that mutate the moto backends and roll them back"
+        " after each test, rather than a reset",
+    )
+
+    group.addoption(
+        "--aiomoto-s3-verify",
+        choices=S3_VERIFY_POLICIES,
+        default=None,
+        help="verify the mutations of the s3 helpers with waiters and head requests:"
+        " 'strict', 'sampled' (1 in N) or 'off'",
+    )
+    parser.addini(
+        "aiomoto_s3_verify",
+        default=S3_VERIFY_STRICT,
+        help="verify the mutations of the s3 helpers with waiters and head requests:"
+        " 'strict' (default), 'sampled' (1 in N) or 'off'",
+    )
+
+    group.addoption(
+        "--aiomoto-s3-verify-sample",
+        type=int,
+        default=None,
+        help="with the 'sampled' s3 verify policy, verify 1 in N mutations",
+    )
+    parser.addini(
+        "aiomoto_s3_verify_sample",
+        default="10",
+        help="with the 'sampled' s3 verify policy, verify 1 in N mutations; the default is 10",
+    )
+
+    group.addoption(
+        "--aiomoto-s3-corpus-cache",
+        action="store_true",
+        default=None,
+        help="cache the bodies of the s3 corpora in the pytest cache_dir, for later runs",
+    )
+    parser.addini(
+        "aiomoto_s3_corpus_cache",
+        type="bool",
+        default=False,
+        help="cache the bodies of the s3 corpora in the pytest cache_dir, for later runs",
+    )
+
+
+def aiomoto_option(config: pytest.Config, name: str) -> Any:
+    """
+    Get an aiomoto option, where a command line option overrides an ini option;
+    the command line option uses the ini name with dashes, e.g.
+    'aiomoto_shared_server' is '--aiomoto-shared-server'.
+    """
+    value = config.getoption(name, default=None)
+    if value is None:
+        value = config.getini(name)
+    return value
+
+
+def aiomoto_server_options(config: pytest.Config) -> Dict:
+    """
+    Options for any AioMotoService, from the aiomoto plugin options
+    """
+    return dict(
+        server_mode=aiomoto_option(config, "aiomoto_server_mode"),
+        keep_alive=aiomoto_option(config, "aiomoto_keep_alive"),
+    )
+
+
+def aiomoto_preload_services(config: pytest.Config) -> List[str]:
+    """
+    The services for the `aiomoto_preload` option, e.g. '--aiomoto-preload=s3,sqs'
+    """
+    services = aiomoto_option(config, "aiomoto_preload")
+    if isinstance(services, str):
+        services = services.split(",")
+    return [name.strip() for name in services if name.strip()]
+
+
+def aiomoto_preload(config: pytest.Config, service_names: List[str]):
+    """
+    Start the servers that last for the session, i.e. the shared server or any
+    pooled servers for the services; otherwise, import the moto backends for
+    the services, so that each test only starts a server for them.
+    """
+    options = aiomoto_server_options(config)
+    shared_server = aiomoto_option(config, "aiomoto_shared_server")
+    server_pool = aiomoto_option(config, "aiomoto_server_pool")
+    try:
+        if shared_server:
+            aio_moto_service_pool.get(MOTO_ALL_SERVICES, **options)
+        for name in service_names:
+            if name == MOTO_ALL_SERVICES:
+                continue
+            if server_pool and not shared_server:
+                aio_moto_service_pool.get(name, **options)
+            else:
+                moto.backends.get_backend(name)
+    except Exception as err:
+        # the fixtures try again to start the servers and report any errors
+        logging.getLogger(__name__).warning("Cannot preload aiomoto servers: %r", err)
+
+
 def pytest_configure(config):
     config.addinivalue_line(
         "markers",
@@ -37,3 +305,163 @@ def pytest_configure(config):
         "markers",
         "aws_s3: tests that require credentials for live AWS S3 network requests"
     )
+
+    # the s3 helpers and fixtures make concurrent requests to the moto mocks
+    serialize_s3_responses()
+
+    # account isolation tracks the backends, so that the backends for the default
+    # account are only reset when a test uses them
+    if aiomoto_option(config, "aiomoto_reset_tracking") or aiomoto_option(
+        config, "aiomoto_account_isolation"
+    ):
+        start_backend_tracking()
+    if aiomoto_option(config, "aiomoto_account_isolation"):
+        start_account_isolation()
+    if aiomoto_option(config, "aiomoto_journal"):
+        moto_journal.start()
+    s3_verify_policy.configure(
+        aiomoto_option(config, "aiomoto_s3_verify"),
+        int(aiomoto_option(config, "aiomoto_s3_verify_sample")),
+    )
+    # the pytest cache is not available with '-p no:cacheprovider'
+    if aiomoto_option(config, "aiomoto_s3_corpus_cache") and hasattr(config, "cache"):
+        s3_corpus_cache.configure(config.cache.mkdir("aiomoto_s3_corpora"))
+
+    service_names = aiomoto_preload_services(config)
+    xdist_controller = config.getoption("dist", "no") != "no" and not hasattr(
+        config, "workerinput"
+    )
+    if service_names and not xdist_controller:
+        thread = threading.Thread(
+            target=aiomoto_preload, args=(config, service_names), daemon=True
+        )
+        thread.start()
+        config.stash[aiomoto_preload_key] = thread
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_setup(item):
+    if account_isolation():
+        memory = process_memory_mb()
+        max_memory = int(aiomoto_option(item.config, "aiomoto_account_memory"))
+        if memory and memory > max_memory:
+            discard_isolated_accounts(moto_service_backends(MOTO_ALL_SERVICES))
+        new_isolated_account()
+
+    s3_verify_policy.start_test(item.nodeid)
+    moto_resets.start_phase(item.nodeid, "setup")
+    try:
+        yield
+    finally:
+        moto_resets.stop_phase()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_teardown(item, nextitem):
+    # the fixtures do not need to reset the backends for the account of this test
+    if account_isolation():
+        retire_isolated_account()
+
+    moto_resets.start_phase(item.nodeid, "teardown")
+    try:
+        yield
+    finally:
+        moto_resets.stop_phase()
+        # any mutations that the fixtures did not roll back
+        if moto_journal.recording:
+            moto_journal.rollback()
+        s3_verify_policy.stop_test()
+        skipped = s3_verify_policy.test_skipped(item.nodeid)
+        if skipped:
+            item.user_properties.append(("aiomoto_s3_verify_skipped", skipped))
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_fixture_setup(fixturedef, request):
+    # the resources that a session (or module) fixture creates are not journaled,
+    # so they last for the tests that use them, until the fixture is finalized
+    if fixturedef.scope == "function" or not moto_journal.enabled:
+        yield
+        return
+    moto_journal.pause(fixturedef)
+    try:
+        yield
+    finally:
+        moto_journal.resume(fixturedef)
+    fixturedef.addfinalizer(functools.partial(moto_journal.pause, fixturedef))
+
+
+def pytest_fixture_post_finalizer(fixturedef, request):
+    moto_journal.resume(fixturedef)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    # stop any servers that lingered for the session
+    preload = session.config.stash.get(aiomoto_preload_key, None)
+    if preload:
+        preload.join()
+    aio_moto_service_pool.shutdown()
+    if account_isolation():
+        discard_isolated_accounts(moto_service_backends(MOTO_ALL_SERVICES))
+
+
+def pytest_unconfigure(config):
+    if aiomoto_option(config, "aiomoto_reset_tracking") or aiomoto_option(
+        config, "aiomoto_account_isolation"
+    ):
+        stop_backend_tracking()
+    if aiomoto_option(config, "aiomoto_account_isolation"):
+        stop_account_isolation()
+    if aiomoto_option(config, "aiomoto_journal"):
+        moto_journal.stop()
+    s3_verify_policy.configure(S3_VERIFY_STRICT)
+    s3_corpus_cache.configure(None)
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    s3_verify_summary(terminalreporter)
+    if s3_corpus_cache.enabled and (s3_corpus_cache.hits or s3_corpus_cache.misses):
+        terminalreporter.section("aiomoto s3 corpus cache")
+        terminalreporter.write_line(
+            f"{s3_corpus_cache.hits} hits, {s3_corpus_cache.misses} misses"
+            f" in {s3_corpus_cache.directory}"
+        )
+    if not aiomoto_option(config, "aiomoto_reset_tracking") or not reset_stats:
+        return
+    terminalreporter.section("aiomoto backend resets")
+    for service_name, (count, seconds) in sorted(
+        reset_stats.items(), key=lambda item: item[1][1], reverse=True
+    ):
+        terminalreporter.write_line(
+            f"{service_name:<24} {count:>6} resets {seconds:>9.3f} s"
+        )
+
+    # the tests with the slowest resets, and the resets that fixtures requested
+    test_stats = sorted(
+        moto_resets.test_stats.items(), key=lambda item: item[1][2], reverse=True
+    )
+    if test_stats:
+        terminalreporter.write_line("")
+    for nodeid, (requests, resets, seconds) in test_stats[:10]:
+        terminalreporter.write_line(
+            f"{seconds:>9.3f} s {resets:>4} of {requests:>4} requested resets  {nodeid}"
+        )
+
+
+def s3_verify_summary(terminalreporter):
+    """The tests with the most s3 verification calls that are skipped"""
+    test_stats = sorted(
+        (item for item in s3_verify_policy.test_stats.items() if item[1][1]),
+        key=lambda item: item[1][1],
+        reverse=True,
+    )
+    if not test_stats:
+        return
+    terminalreporter.section("aiomoto s3 verification")
+    verified = sum(stats[0] for stats in s3_verify_policy.test_stats.values())
+    skipped = sum(stats[1] for stats in s3_verify_policy.test_stats.values())
+    terminalreporter.write_line(
+        f"{s3_verify_policy.policy} policy: {verified} verification calls, {skipped} skipped"
+    )
+    for nodeid, (verified, skipped) in test_stats[:10]:
+        terminalreporter.write_line(f"{skipped:>6} of {verified + skipped:>6} skipped  {nodeid}")
@@ -0,0 +1,136 @@
+# Copyright 2019-2023 Darren Weber
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A synthetic s3 corpus, to reproduce the listing and read patterns for many
+objects (or large objects) in a bucket
+
+An S3Corpus is a compact listing of the keys and sizes of the objects; the key
+layout, extensions and sizes come from a seeded random generator, and so do the
+bodies, which are generated for one object at a time.  So a corpus with 100k
+objects, or many GB, is never held in memory.
+"""
+
+import random
+from array import array
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from pytest_aiomoto.s3_object import S3Object
+
+# a size for every object, a (min, max) size, or a function of a random generator
+S3CorpusSizes = Union[int, Tuple[int, int], Callable[[random.Random], int]]
+
+
+class S3Corpus:
+    """
+    The listing of a synthetic s3 corpus, with `count` objects below a prefix,
+    e.g. for fanout=10 and depth=2 the keys are like
+    '{prefix}/d3/d7/obj_000073.txt', where the objects are spread over
+    the directories in turn.
+
+    :param bucket: the s3 bucket for the corpus
+    :param prefix: the key prefix for the corpus
+    :param count: the number of objects
+    :param fanout: the number of sub-directories for each directory
+    :param depth: the number of directory levels below the prefix
+    :param extensions: {extension: weight} for the object keys; the default is
+        an equal mix of 'txt' and 'tif'
+    :param sizes: a size for every object, a (min, max) size, or a function of
+        a random.Random that returns a size
+    :param seed: a seed for the random generator
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str,
+        count: int,
+        fanout: int = 10,
+        depth: int = 2,
+        extensions: Optional[Dict[str, float]] = None,
+        sizes: S3CorpusSizes = (16, 1024),
+        seed: int = 0,
+    ):
+        if count < 0 or fanout < 1 or depth < 0:
+            raise ValueError("An s3 corpus has a count >= 0, a fanout >= 1 and a depth >= 0")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.fanout = fanout
+        self.depth = depth
+        self.seed = seed
+        self.extensions = extensions or {"txt": 1, "tif": 1}
+
+        rng = random.Random(seed)
+        names = list(self.extensions)
+        weights = list(self.extensions.values())
+        size = self._size_function(sizes)
+        # the compact listing, i.e. an extension index and a size for each object
+        self._names = names
+        choices = rng.choices(range(len(names)), weights, k=count)
+        self._extensions = array("H", choices)
+        self.sizes = array("q", (size(rng) for _ in range(count)))
+
+    @staticmethod
+    def _size_function(sizes: S3CorpusSizes) -> Callable[[random.Random], int]:
+        if callable(sizes):
+            return lambda rng: max(0, int(sizes(rng)))
+        if isinstance(sizes, int):
+            return lambda rng: sizes
+        min_size, max_size = sizes
+        return lambda rng: rng.randint(min_size, max_size)
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def __iter__(self) -> Iterator[S3Object]:
+        for index in range(len(self)):
+            yield S3Object(bucket=self.bucket, key=self.key(index))
+
+    @property
+    def total_size(self) -> int:
+        return sum(self.sizes)
+
+    def key(self, index: int) -> str:
+        """The key for an object in the corpus"""
+        parts = [self.prefix] if self.prefix else []
+        width = len(str(self.fanout - 1))
+        directory = index
+        for _ in range(self.depth):
+            directory, part = divmod(directory, self.fanout)
+            parts.append(f"d{part:0{width}d}")
+        extension = self._names[self._extensions[index]]
+        parts.append(f"obj_{index:06d}.{extension}")
+        return "/".join(parts)
+
+    def keys(self) -> List[str]:
+        return [self.key(index) for index in range(len(self))]
+
+    def body(self, index: int) -> bytes:
+        """The body for an object in the corpus, which is the same for every call"""
+        size = self.sizes[index]
+        if size == 0:
+            return b""
+        rng = random.Random(f"{self.seed}-{index}")
+        return rng.getrandbits(size * 8).to_bytes(size, "little")
+
+    def objects(self) -> Iterator[Tuple[str, bytes]]:
+        """The (key, body) for each object, which generates each body in turn"""
+        for index in range(len(self)):
+            yield self.key(index), self.body(index)
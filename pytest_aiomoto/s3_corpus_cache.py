@@ -0,0 +1,172 @@
+# Copyright 2019-2023 Darren Weber
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+An on-disk cache of the bodies of synthetic s3 corpora, for later test runs
+
+The bodies of an S3Corpus are the same for a seed and the sizes of the
+objects, so they are packed into one file for a digest of them, e.g. in the
+pytest cache_dir.  A later run maps the file into memory and the objects are
+created from memoryviews of it, rather than generating each body again.
+
+The moto backend state for a corpus is not cached, because the keys of a
+corpus are usually below a new prefix for each test, and a pickle of the
+moto keys is slower to load than seeding the keys again.
+"""
+
+import hashlib
+import mmap
+import os
+import threading
+from contextlib import contextmanager
+from itertools import accumulate
+from pathlib import Path
+from typing import Iterator
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from pytest_aiomoto.s3_corpus import S3Corpus
+
+# the version of the bodies in a pack, for any change in how they are generated
+S3_CORPUS_PACK_VERSION = 1
+
+
+class S3CorpusPack:
+    """
+    The bodies of an S3Corpus in a pack file, which is mapped into memory; a
+    body is a memoryview of the map, so a pack should be closed when the
+    bodies are no longer used (e.g. when they are put in the moto backend).
+    """
+
+    def __init__(self, corpus: S3Corpus, path: Path):
+        self.corpus = corpus
+        self.path = path
+        self._offsets = [0, *accumulate(corpus.sizes)]
+        self._file = open(path, "rb")
+        self._map = None
+        if self._offsets[-1]:
+            # a file of zero bytes cannot be mapped
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)
+        else:
+            self._view = memoryview(b"")
+
+    def __enter__(self) -> "S3CorpusPack":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        try:
+            self._view.release()
+            if self._map is not None:
+                self._map.close()
+        except BufferError:
+            # a body is still used, so the map is closed when it is collected
+            pass
+        self._file.close()
+
+    def body(self, index: int) -> memoryview:
+        return self._view[self._offsets[index] : self._offsets[index + 1]]
+
+    def objects(self) -> Iterator[Tuple[str, memoryview]]:
+        """The (key, body) for each object, like `S3Corpus.objects`"""
+        for index in range(len(self.corpus)):
+            yield self.corpus.key(index), self.body(index)
+
+
+class S3CorpusCache:
+    """
+    A directory of S3CorpusPack files, for a digest of the seed and sizes of
+    each corpus; it is disabled without a directory.  The plugin configures
+    it for the `aiomoto_s3_corpus_cache` option, with a directory in the
+    pytest cache_dir.
+    """
+
+    def __init__(self, directory: Optional[Union[str, os.PathLike]] = None):
+        self._lock = threading.Lock()
+        self.directory: Optional[Path] = None
+        self.hits = 0
+        self.misses = 0
+        self.configure(directory)
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def configure(self, directory: Optional[Union[str, os.PathLike]]):
+        with self._lock:
+            self.directory = Path(directory) if directory is not None else None
+            if self.directory is not None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def override(self, directory: Optional[Union[str, os.PathLike]]):
+        """Use another directory in a context, or None to disable the cache"""
+        saved = self.directory
+        self.configure(directory)
+        try:
+            yield self
+        finally:
+            self.configure(saved)
+
+    @staticmethod
+    def digest(corpus: S3Corpus) -> str:
+        """A digest of the bodies of a corpus, i.e. of its seed and sizes"""
+        sha = hashlib.sha256(f"{S3_CORPUS_PACK_VERSION}-{corpus.seed}-".encode())
+        sha.update(corpus.sizes.tobytes())
+        return sha.hexdigest()
+
+    def path(self, corpus: S3Corpus) -> Path:
+        if self.directory is None:
+            raise RuntimeError("The s3 corpus cache is not enabled")
+        return self.directory / f"{self.digest(corpus)}.pack"
+
+    def store(self, corpus: S3Corpus) -> Path:
+        """Write the bodies of a corpus to a pack, one body at a time"""
+        path = self.path(corpus)
+        # other processes (e.g. xdist workers) can store the same pack, so
+        # it is written to a temporary file that replaces any other
+        temp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(temp_path, "wb") as pack_file:
+                for index in range(len(corpus)):
+                    pack_file.write(corpus.body(index))
+            os.replace(temp_path, path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+        return path
+
+    def open(self, corpus: S3Corpus) -> S3CorpusPack:
+        """The pack for a corpus, which is stored when it is not in the cache"""
+        path = self.path(corpus)
+        try:
+            hit = path.stat().st_size == corpus.total_size
+        except FileNotFoundError:
+            hit = False
+        if not hit:
+            self.store(corpus)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return S3CorpusPack(corpus, path)
+
+
+# the cache for the s3_corpus_factory fixture
+s3_corpus_cache = S3CorpusCache()
@@ -0,0 +1,333 @@
+# Copyright 2019-2023 Darren Weber
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Sources for large s3 objects, which are uploaded in parts
+
+A large object is uploaded from a file, which is mapped into memory, so each
+part is a memoryview of the map, rather than a copy of the part (or a read of
+the whole object).  The pages of a part are read from the file when a client
+sends the part, so a test can check that the upload of a large object does not
+buffer the whole object, e.g. with :code:`utils.memory_ceiling`.
+"""
+
+import io
+import logging
+import mmap
+import os
+import random
+import time
+from contextlib import nullcontext
+from typing import IO
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from pytest_aiomoto.s3_object import S3Object
+from pytest_aiomoto.utils import memory_ceiling
+from pytest_aiomoto.utils import response_success
+
+LOGGER = logging.getLogger(__name__)
+
+# the minimum size of an s3 multipart upload part (except the last part)
+S3_MULTIPART_PART_SIZE = 5 * 2**20
+
+# the size of the chunks to write a source file
+S3_SOURCE_CHUNK_SIZE = 2**20
+
+S3SourceFile = Union[str, os.PathLike, IO[bytes]]
+
+
+class S3PartBody(io.RawIOBase):
+    """
+    A readable and seekable file for the memoryview of a part, for the Body of
+    an upload_part, which botocore only accepts as bytes or a file; a read
+    copies only the size that is read, e.g. a block for a socket.
+    """
+
+    def __init__(self, view: memoryview):
+        super().__init__()
+        self._view = view
+        self._position = 0
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), len(self._view) - self._position)
+        if size <= 0:
+            return 0
+        buffer[:size] = self._view[self._position : self._position + size]
+        self._position += size
+        return size
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = len(self._view) - self._position
+        data = bytes(self._view[self._position : self._position + size])
+        self._position += len(data)
+        return data
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, offset)
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+
+class S3MultipartSource:
+    """
+    A file that is mapped into memory, to slice it into the parts of a
+    multipart upload, e.g.
+
+    .. code-block::
+
+        with S3MultipartSource(path) as source:
+            for part_number, part in source.parts(S3_MULTIPART_PART_SIZE):
+                s3_client.upload_part(..., PartNumber=part_number, Body=S3PartBody(part))
+
+    :param source: a file path, or a binary file that has a fileno (a
+        SpooledTemporaryFile is rolled over to a file for it)
+    """
+
+    def __init__(self, source: S3SourceFile):
+        self._source = source
+        self._file = None
+        self._map = None
+        self._view = None
+
+    def __enter__(self) -> "S3MultipartSource":
+        if isinstance(self._source, (str, os.PathLike)):
+            self._file = open(self._source, "rb")
+            fileno = self._file.fileno()
+        else:
+            if hasattr(self._source, "rollover"):
+                self._source.rollover()
+            self._source.flush()
+            fileno = self._source.fileno()
+        size = os.fstat(fileno).st_size
+        if size:
+            # a file of zero bytes cannot be mapped
+            self._map = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._map)
+        else:
+            self._view = memoryview(b"")
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def parts(self, part_size: int = S3_MULTIPART_PART_SIZE) -> Iterator[Tuple[int, memoryview]]:
+        """
+        The (part_number, memoryview) for each part; release each part (e.g.
+        `with part:`) when it is sent, because the map cannot be closed while
+        a part is not released.  An empty file has one empty part.
+        """
+        if part_size < 1:
+            raise ValueError(f"The part size must be 1 or more: {part_size}")
+        if not len(self._view):
+            yield 1, self._view
+            return
+        for part_number, offset in enumerate(range(0, len(self._view), part_size), start=1):
+            yield part_number, self._view[offset : offset + part_size]
+
+
+class S3MultipartUpload(NamedTuple):
+    """
+    The s3 object for a multipart upload, with its size and upload time, and
+    the memory peak (bytes) for the upload of the parts, when it is checked
+    """
+
+    s3_object: S3Object
+    size: int
+    parts: int
+    seconds: float
+    memory_peak: Optional[int] = None
+
+    @property
+    def mib_per_second(self) -> float:
+        return self.size / 2**20 / self.seconds if self.seconds else 0.0
+
+
+class S3MultipartUploader:
+    """
+    The requests for a multipart upload of a source file to an s3 object, and
+    the S3MultipartUpload for it, so that a sync or async client only has to
+    send the requests, e.g.
+
+    .. code-block::
+
+        uploader = S3MultipartUploader(bucket_name, key, source)
+        uploader.start(s3_client.create_multipart_upload(**uploader.object_request()))
+        try:
+            with closing(uploader.part_requests()) as part_requests:
+                for request in part_requests:
+                    uploader.add_part(request, s3_client.upload_part(**request))
+            uploader.complete(
+                s3_client.complete_multipart_upload(**uploader.complete_request())
+            )
+        except BaseException:
+            s3_client.abort_multipart_upload(**uploader.upload_request())
+            raise
+        upload = uploader.result()
+
+    With a memory_limit (bytes), the upload of the parts is in a
+    `memory_ceiling`; the complete_multipart_upload is not, because a moto
+    backend in the test process assembles the whole object in memory for it.
+    """
+
+    def __init__(
+        self,
+        bucket_name: str,
+        key: str,
+        source: S3SourceFile,
+        part_size: int = S3_MULTIPART_PART_SIZE,
+        memory_limit: Optional[int] = None,
+    ):
+        self.bucket_name = bucket_name
+        self.key = key
+        self.source = source
+        self.part_size = part_size
+        self.memory_limit = memory_limit
+        self.upload_id: Optional[str] = None
+        self.parts: List[Dict] = []
+        self.size = 0
+        self.memory_peak: Optional[int] = None
+        self._start = time.perf_counter()
+
+    def object_request(self) -> Dict:
+        return {"Bucket": self.bucket_name, "Key": self.key}
+
+    def upload_request(self) -> Dict:
+        return {"Bucket": self.bucket_name, "Key": self.key, "UploadId": self.upload_id}
+
+    def start(self, resp: Dict):
+        """Start the upload, with the response to a create_multipart_upload"""
+        assert response_success(resp)
+        self.upload_id = resp["UploadId"]
+
+    def part_requests(self) -> Iterator[Dict]:
+        """
+        The upload_part requests, where the Body of each part is a file for a
+        memoryview of the source; a part is released when the next one is
+        requested, so each response must be added before that.
+        """
+        with S3MultipartSource(self.source) as s3_source:
+            self.size = len(s3_source)
+            ceiling = memory_ceiling(self.memory_limit) if self.memory_limit else nullcontext()
+            with ceiling as peak:
+                for part_number, part in s3_source.parts(self.part_size):
+                    with part:
+                        yield dict(
+                            self.upload_request(),
+                            PartNumber=part_number,
+                            Body=S3PartBody(part),
+                            ContentLength=len(part),
+                        )
+            if peak is not None:
+                self.memory_peak = peak.peak
+
+    def add_part(self, request: Dict, resp: Dict):
+        """Add a part, with the response to its upload_part request"""
+        assert response_success(resp)
+        self.parts.append({"ETag": resp["ETag"], "PartNumber": request["PartNumber"]})
+
+    def complete_request(self) -> Dict:
+        return dict(self.upload_request(), MultipartUpload={"Parts": self.parts})
+
+    def complete(self, resp: Dict):
+        """Complete the upload, with the response to a complete_multipart_upload"""
+        assert response_success(resp)
+
+    def check_head(self, head: Dict):
+        """Check the response to a head_object request for the uploaded object"""
+        assert response_success(head)
+        assert head["ContentLength"] == self.size
+
+    def result(self) -> S3MultipartUpload:
+        """The S3MultipartUpload for a completed upload, which is logged"""
+        upload = S3MultipartUpload(
+            s3_object=S3Object(bucket=self.bucket_name, key=self.key),
+            size=self.size,
+            parts=len(self.parts),
+            seconds=time.perf_counter() - self._start,
+            memory_peak=self.memory_peak,
+        )
+        LOGGER.info(
+            "Uploaded %s in %d parts: %.1f MiB in %.3f s (%.1f MiB per second)",
+            upload.s3_object.s3_uri,
+            upload.parts,
+            upload.size / 2**20,
+            upload.seconds,
+            upload.mib_per_second,
+        )
+        return upload
+
+
+def write_s3_source_file(
+    file: Union[str, os.PathLike, IO[bytes]],
+    size: int,
+    seed: int = 0,
+    chunk_size: int = S3_SOURCE_CHUNK_SIZE,
+) -> int:
+    """
+    Write `size` bytes, from a seeded random generator, to a file path or a
+    binary file, one chunk at a time; the bytes are the same for a seed and
+    chunk_size.
+
+    :return: the size
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "wb") as fd:
+            return write_s3_source_file(fd, size, seed, chunk_size)
+    rng = random.Random(seed)
+    remaining = size
+    while remaining > 0:
+        chunk = min(chunk_size, remaining)
+        file.write(rng.getrandbits(chunk * 8).to_bytes(chunk, "little"))
+        remaining -= chunk
+    file.flush()
+    return size
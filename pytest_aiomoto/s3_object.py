@@ -12,7 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
 from typing import NamedTuple
+from typing import Union
 
 
 class S3Object(NamedTuple):
@@ -32,3 +41,184 @@ class S3Object(NamedTuple):
     @property
     def s3_uri(self) -> str:
         return f"s3://{self.bucket}/{self.key}"
+
+
+class S3ObjectSet(Sequence):
+    """
+    A compact sequence of :code:`S3Object` in one bucket, for fixtures with many
+    objects.  The keys are split into a table of the unique key prefixes (up to
+    the last '/') and the key names, which are UTF-8 in one bytes array, so an
+    object takes a few bytes more than its key name, rather than two strings
+    and a tuple; it is indexed in O(1) and it pickles as a few arrays.
+
+    :param bucket: the bucket for all the objects
+    :param keys: the object keys
+    """
+
+    def __init__(self, bucket: str, keys: Iterable[str] = ()):
+        self.bucket = bucket
+        self._prefixes: List[str] = []
+        self._prefix_ids: Dict[str, int] = {}
+        self._key_prefixes = array("I")
+        self._names = bytearray()
+        self._offsets = array("Q", [0])
+        self._sorted = None
+        self.extend(keys)
+
+    @classmethod
+    def from_objects(cls, s3_objects: Iterable[S3Object]) -> "S3ObjectSet":
+        """
+        A set of the S3Object (or s3.ObjectSummary), which must be in one bucket
+        """
+        object_set = None
+        for s3_obj in s3_objects:
+            if object_set is None:
+                object_set = cls(s3_obj.bucket_name)
+            object_set.append(s3_obj)
+        if object_set is None:
+            raise ValueError("An S3ObjectSet needs a bucket, for a set of no objects")
+        return object_set
+
+    def append(self, key: Union[str, S3Object]):
+        if not isinstance(key, str):
+            if key.bucket_name != self.bucket:
+                raise ValueError(f"An S3ObjectSet is for one bucket: {self.bucket}")
+            key = key.key
+        prefix, sep, name = key.rpartition("/")
+        prefix += sep
+        prefix_id = self._prefix_ids.get(prefix)
+        if prefix_id is None:
+            prefix_id = self._prefix_ids[prefix] = len(self._prefixes)
+            self._prefixes.append(prefix)
+        self._key_prefixes.append(prefix_id)
+        self._names += name.encode()
+        self._offsets.append(len(self._names))
+        self._sorted = None
+
+    def extend(self, keys: Iterable[Union[str, S3Object]]):
+        for key in keys:
+            self.append(key)
+
+    def __len__(self) -> int:
+        return len(self._key_prefixes)
+
+    def key(self, index: int) -> str:
+        """The key for an object, in O(1)"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("S3ObjectSet index out of range")
+        name = self._names[self._offsets[index] : self._offsets[index + 1]]
+        return self._prefixes[self._key_prefixes[index]] + name.decode()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return S3Object(bucket=self.bucket, key=self.key(index))
+
+    def __iter__(self) -> Iterator[S3Object]:
+        for index in range(len(self)):
+            yield S3Object(bucket=self.bucket, key=self.key(index))
+
+    def __contains__(self, s3_obj) -> bool:
+        if not isinstance(s3_obj, S3Object) or s3_obj.bucket != self.bucket:
+            return False
+        return bool(self.with_prefix(s3_obj.key).count(s3_obj))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"S3ObjectSet(bucket={self.bucket!r}, objects={len(self)})"
+
+    def keys(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self.key(index)
+
+    def _sorted_index(self) -> array:
+        if self._sorted is None:
+            self._sorted = array("I", sorted(range(len(self)), key=self.key))
+        return self._sorted
+
+    def with_prefix(self, prefix: str) -> List[S3Object]:
+        """The objects with a key prefix, in key order, from a sorted index"""
+        order = self._sorted_index()
+        sorted_keys = _SortedKeys(self, order)
+        start = bisect_left(sorted_keys, prefix)
+        s3_objects = []
+        for position in range(start, len(order)):
+            key = sorted_keys[position]
+            if not key.startswith(prefix):
+                break
+            s3_objects.append(S3Object(bucket=self.bucket, key=key))
+        return s3_objects
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        # these are derived from the other state
+        del state["_prefix_ids"]
+        state["_sorted"] = None
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._prefix_ids = {prefix: i for i, prefix in enumerate(self._prefixes)}
+
+
+class _SortedKeys:
+    # the keys of an S3ObjectSet in the order of a sorted index, for a bisect
+    def __init__(self, object_set: S3ObjectSet, order: array):
+        self.object_set = object_set
+        self.order = order
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __getitem__(self, position: int) -> str:
+        return self.object_set.key(self.order[position])
+
+
+class S3KeyIndex:
+    """
+    An index of the s3 keys that fixtures create, for each bucket, so a
+    cleanup can delete them without a listing, e.g.
+
+    .. code-block::
+
+        s3_key_index.add(s3_bucket, create_s3_objects(s3_bucket, objects, s3_client))
+        ...
+        delete_s3_prefix(s3_client, s3_bucket, prefix, key_index=s3_key_index)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, S3ObjectSet] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(object_set) for object_set in self._buckets.values())
+
+    def add(self, bucket: str, keys: Iterable[Union[str, S3Object]]):
+        with self._lock:
+            object_set = self._buckets.get(bucket)
+            if object_set is None:
+                object_set = self._buckets[bucket] = S3ObjectSet(bucket)
+            object_set.extend(keys)
+
+    def pop_prefix(self, bucket: str, prefix: str) -> List[str]:
+        """Remove the keys with a prefix from the index, and return them in key order"""
+        with self._lock:
+            object_set = self._buckets.get(bucket)
+            if object_set is None:
+                return []
+            # a key can be added more than once
+            keys = list(dict.fromkeys(s3_obj.key for s3_obj in object_set.with_prefix(prefix)))
+            if keys:
+                remaining = [key for key in object_set.keys() if not key.startswith(prefix)]
+                if remaining:
+                    self._buckets[bucket] = S3ObjectSet(bucket, remaining)
+                else:
+                    del self._buckets[bucket]
+            return keys
@@ -0,0 +1,128 @@
+# Copyright 2019-2023 Darren Weber
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A verification policy for the s3 helpers
+
+The s3 helpers and fixtures follow a mutation, like a create_bucket or a
+put_object, with a waiter and/or a head request to verify it.  For the
+in-memory moto backends, a mutation is done when the response is, so these
+requests can double (or triple) the requests for a fixture.
+
+- strict: verify every mutation (the default)
+- sampled: verify 1 in N mutations
+- off: do not verify any mutations
+"""
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict
+from typing import List
+from typing import Optional
+
+S3_VERIFY_STRICT = "strict"
+S3_VERIFY_SAMPLED = "sampled"
+S3_VERIFY_OFF = "off"
+S3_VERIFY_POLICIES = (S3_VERIFY_STRICT, S3_VERIFY_SAMPLED, S3_VERIFY_OFF)
+
+
+class S3VerifyPolicy:
+    """
+    The policy for the s3 helpers to verify a mutation; the helpers ask for
+    each mutation whether to `verify(calls)` it, with the number of calls that
+    it takes to verify it, so the calls that are skipped are counted for each
+    test.
+
+    A fixture can use another policy while it creates its resources, e.g.
+
+    .. code-block::
+
+        with s3_verify_policy.override(S3_VERIFY_OFF):
+            create_s3_bucket(bucket_name, aws_s3_client, aws_region)
+    """
+
+    def __init__(self, policy: str = S3_VERIFY_STRICT, sample: int = 10):
+        self._lock = threading.Lock()
+        self._policy = S3_VERIFY_STRICT
+        self._sample = 10
+        self._mutations = 0
+        self._nodeid: Optional[str] = None
+        # {nodeid: [verified calls, skipped calls]}
+        self.test_stats: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        self.configure(policy, sample)
+
+    @property
+    def policy(self) -> str:
+        return self._policy
+
+    @property
+    def sample(self) -> int:
+        return self._sample
+
+    def configure(self, policy: str, sample: Optional[int] = None):
+        if policy not in S3_VERIFY_POLICIES:
+            raise ValueError(f"Unknown s3 verify policy: {policy}")
+        sample = self._sample if sample is None else int(sample)
+        if sample < 1:
+            raise ValueError(f"The s3 verify sample must be 1 or more: {sample}")
+        with self._lock:
+            self._policy = policy
+            self._sample = sample
+
+    @contextmanager
+    def override(self, policy: str, sample: Optional[int] = None):
+        """Use another policy in a context, e.g. for the setup of a fixture"""
+        saved = (self._policy, self._sample)
+        self.configure(policy, sample)
+        try:
+            yield self
+        finally:
+            self.configure(*saved)
+
+    def start_test(self, nodeid: str):
+        with self._lock:
+            self._nodeid = nodeid
+
+    def stop_test(self):
+        with self._lock:
+            self._nodeid = None
+
+    def verify(self, calls: int = 1) -> bool:
+        """
+        Whether to verify a mutation, which takes some calls to verify it
+        (e.g. a waiter and a head request are 2 calls)
+        """
+        with self._lock:
+            self._mutations += 1
+            if self._policy == S3_VERIFY_STRICT:
+                verify = True
+            elif self._policy == S3_VERIFY_SAMPLED:
+                # the first of every sample is verified
+                verify = (self._mutations - 1) % self._sample == 0
+            else:
+                verify = False
+            if self._nodeid is not None:
+                self.test_stats[self._nodeid][0 if verify else 1] += calls
+            return verify
+
+    def test_skipped(self, nodeid: str) -> int:
+        """The verification calls that are skipped for a test"""
+        with self._lock:
+            stats = self.test_stats.get(nodeid)
+            return stats[1] if stats else 0
+
+
+# the policy for all of the s3 helpers and fixtures
+s3_verify_policy = S3VerifyPolicy()
@@ -12,9 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import errno
 import os
 import socket
+import tracemalloc
+from contextlib import contextmanager
 from typing import Dict
+from typing import Optional
+from typing import Tuple
 
 import boto3.session
 import pytest
@@ -28,6 +33,13 @@ AWS_REGION = "us-west-2"
 AWS_ACCESS_KEY_ID = "test_AWS_ACCESS_KEY_ID"
 AWS_SECRET_ACCESS_KEY = "test_AWS_SECRET_ACCESS_KEY"
 
+# the concurrent requests of the aio helpers, and the connection pool of the aio clients
+AIO_AWS_CONCURRENCY = 10
+
+# pytest-xdist workers allocate server ports from a partition of this range
+XDIST_PORT_BASE = 20000
+XDIST_PORT_COUNT = 10000
+
 
 def assert_status_code(response, status_code: int):
     assert (
@@ -55,12 +67,125 @@ def get_free_tcp_port(release_socket: bool = False):
     return sckt, port
 
 
+def bind_tcp_socket(host: str, port: int = 0, listen: bool = True) -> socket.socket:
+    """
+    A TCP socket that is bound and listening, so a server can accept connections
+    on it without releasing the port; the port is assigned by the OS when it is 0.
+    Without listen, the socket only reserves the port and connections are refused;
+    it does not reuse the address, because a socket with SO_REUSEADDR that is not
+    listening does not stop another socket from binding the same port.
+    """
+    sckt = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        if listen and os.name == "posix":
+            sckt.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sckt.bind((host, port))
+        if listen:
+            sckt.listen(128)
+    except OSError:
+        sckt.close()
+        raise
+    return sckt
+
+
+def xdist_port_range(
+    worker_id: Optional[str] = None, worker_count: Optional[int] = None
+) -> Optional[range]:
+    """
+    The ports for a pytest-xdist worker, e.g. 'gw1', which is a partition of the
+    XDIST_PORT_COUNT ports from XDIST_PORT_BASE; this is None without xdist workers.
+    """
+    worker_id = worker_id or os.getenv("PYTEST_XDIST_WORKER")
+    if not worker_id or not worker_id.startswith("gw"):
+        return None
+    worker_count = worker_count or int(os.getenv("PYTEST_XDIST_WORKER_COUNT", "1"))
+    worker_index = int(worker_id[2:])
+    size = XDIST_PORT_COUNT // max(worker_count, worker_index + 1)
+    start = XDIST_PORT_BASE + worker_index * size
+    return range(start, start + size)
+
+
+def get_server_socket(host: str, listen: bool = True) -> Tuple[socket.socket, int]:
+    """
+    A listening socket and port for a server; pytest-xdist workers use a port
+    from the xdist_port_range for the worker, otherwise the OS assigns a port.
+    """
+    ports = xdist_port_range()
+    if ports is None:
+        sckt = bind_tcp_socket(host, listen=listen)
+        return sckt, sckt.getsockname()[1]
+
+    for port in ports:
+        try:
+            return bind_tcp_socket(host, port, listen=listen), port
+        except OSError:
+            continue
+    raise OSError(errno.EADDRNOTAVAIL, f"No free port in {ports}")
+
+
+def process_memory_mb() -> Optional[float]:
+    """The resident memory of this process (MiB), where /proc is available"""
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+class MemoryPeak:
+    """The peak of the python memory allocations (bytes) in a `memory_ceiling`"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.peak = 0
+
+    @property
+    def peak_mb(self) -> float:
+        return self.peak / 2**20
+
+
+@contextmanager
+def memory_ceiling(limit: int):
+    """
+    Assert that the peak of the python memory allocations in a context, above
+    the allocations at the start of it, is no more than a limit (bytes), e.g.
+    to check that a large object is not buffered in memory.  It uses
+    tracemalloc, which traces the allocations in all threads (e.g. a moto
+    server thread) but not a memory map.  When tracemalloc is already tracing,
+    it resets the peak (python >= 3.9).
+
+    :yield: a MemoryPeak, which has the peak after the context
+    :raises AssertionError: when the peak is above the limit
+    """
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    elif hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    memory_peak = MemoryPeak(limit)
+    baseline = tracemalloc.get_traced_memory()[0]
+    try:
+        yield memory_peak
+    finally:
+        memory_peak.peak = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+        if not tracing:
+            tracemalloc.stop()
+    assert memory_peak.peak <= limit, (
+        f"The memory peak {memory_peak.peak} is above the ceiling {limit} (bytes)"
+    )
+
+
 def has_moto_mocks(client, event_name):
     # moto registers mock callbacks with the `before-send` event-name, using
     # specific callbacks for the methods that are generated dynamically. By
     # checking that the first callback is a BotocoreStubber, this verifies
     # that moto mocks are intercepting client requests.
-    callbacks = client.meta.events._emitter._lookup_cache[event_name]
+    emitter = client.meta.events._emitter
+    callbacks = emitter._lookup_cache.get(event_name)
+    if callbacks is None:
+        # the client has not emitted the event yet, e.g. it has not sent a HeadBucket
+        callbacks = emitter._handlers.prefix_search(event_name)
     if len(callbacks) > 0:
         stub = callbacks[0]
         assert isinstance(stub, BotocoreStubber)
@@ -19,6 +19,11 @@ import botocore.exceptions
 import pytest
 from aiobotocore.session import get_session
 
+from pytest_aiomoto.aiomoto_s3 import aio_create_bucket
+from pytest_aiomoto.aiomoto_s3 import aio_create_s3_multipart_object
+from pytest_aiomoto.aiomoto_services import AioMotoService
+from pytest_aiomoto.moto_services import MOTO_SERVER_PROCESS
+from pytest_aiomoto.s3_multipart import S3_MULTIPART_PART_SIZE
 from pytest_aiomoto.utils import response_success
 
 
@@ -35,7 +40,20 @@ async def test_aio_s3_list_buckets(aio_aws_s3_client, aio_s3_buckets):
     resp = await aio_aws_s3_client.list_buckets()
     assert response_success(resp)
     bucket_names = [b["Name"] for b in resp["Buckets"]]
-    assert bucket_names == aio_s3_buckets
+    assert sorted(bucket_names) == sorted(aio_s3_buckets)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("aio_aws_concurrency, aio_s3_bucket_count", [(1, 3), (8, 30)])
+async def test_aio_s3_buckets_concurrency(
+    aio_aws_concurrency, aio_s3_bucket_count, aio_aws_s3_client, aio_s3_buckets
+):
+    assert aio_aws_s3_client.meta.config.max_pool_connections == aio_aws_concurrency
+    assert len(aio_s3_buckets) == aio_s3_bucket_count
+    resp = await aio_aws_s3_client.list_buckets()
+    assert response_success(resp)
+    bucket_names = [b["Name"] for b in resp["Buckets"]]
+    assert sorted(bucket_names) == sorted(aio_s3_buckets)
 
 
 @pytest.mark.asyncio
@@ -92,3 +110,41 @@ async def test_aio_s3_bucket_head_too_many_requests():
     assert "HeadBucket operation" in msg
     assert "403" in msg
     assert "Forbidden" in msg
+
+
+@pytest.mark.asyncio
+async def test_aio_s3_multipart_factory(aio_aws_s3_client, aio_s3_multipart_factory):
+    size = 12 * S3_MULTIPART_PART_SIZE + 1024
+    upload = await aio_s3_multipart_factory(size=size)
+    assert upload.size == size
+    assert upload.parts == 13
+    assert upload.memory_peak is None
+    resp = await aio_aws_s3_client.head_object(
+        Bucket=upload.s3_object.bucket, Key=upload.s3_object.key
+    )
+    assert resp["ContentLength"] == size
+
+
+@pytest.mark.asyncio
+async def test_aio_create_s3_multipart_object_process(
+    aio_aws_session, aws_region, s3_source_file_factory
+):
+    # the upload of 13 parts does not buffer more than 2 parts in the client;
+    # a server process keeps the copies of the moto backend out of the ceiling
+    size = 12 * S3_MULTIPART_PART_SIZE + 1024
+    source = s3_source_file_factory(size)
+    async with AioMotoService("s3", server_mode=MOTO_SERVER_PROCESS) as svc:
+        url = svc.endpoint_url
+        async with aio_aws_session.create_client("s3", endpoint_url=url) as s3_client:
+            await aio_create_bucket("multipart-bucket", s3_client, aws_region)
+            upload = await aio_create_s3_multipart_object(
+                "multipart-bucket",
+                "multipart.bin",
+                source,
+                s3_client,
+                memory_limit=2 * S3_MULTIPART_PART_SIZE,
+            )
+            assert upload.parts == 13
+            assert upload.memory_peak <= 2 * S3_MULTIPART_PART_SIZE
+            resp = await s3_client.head_object(Bucket="multipart-bucket", Key="multipart.bin")
+            assert resp["ContentLength"] == size
@@ -0,0 +1,103 @@
+# Copyright 2019-2023 Darren Weber
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark AioMotoService options
+
+The `make test` recipe disables benchmarks, so each benchmark only runs
+once as a test; to compare the options, run:
+
+    pytest tests/test_aiomoto_benchmarks.py --benchmark-only
+"""
+import asyncio
+import time
+from contextlib import AsyncExitStack
+
+import pytest
+from aiobotocore.session import get_session
+
+from pytest_aiomoto.aiomoto_inprocess import aio_moto_inprocess_register
+from pytest_aiomoto.aiomoto_services import AioMotoService
+from pytest_aiomoto.moto_services import MOTO_SERVER_ASYNCIO
+from pytest_aiomoto.moto_services import MOTO_SERVER_INPROCESS
+from pytest_aiomoto.moto_services import MOTO_SERVER_THREAD
+from pytest_aiomoto.utils import AWS_ACCESS_KEY_ID
+from pytest_aiomoto.utils import AWS_REGION
+from pytest_aiomoto.utils import AWS_SECRET_ACCESS_KEY
+
+pytest.importorskip("pytest_benchmark")
+
+BENCHMARK_REQUESTS = 100
+
+
+@pytest.fixture
+def benchmark_loop():
+    # pytest-benchmark calls a synchronous function, so it
+    # runs the requests on an event loop owned by the test
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+async def s3_benchmark_client(stack: AsyncExitStack, **service_kwargs):
+    svc = await stack.enter_async_context(AioMotoService("s3", **service_kwargs))
+    session = get_session()
+    session.set_credentials(AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY)
+    aio_moto_inprocess_register(session)
+    s3_client = await stack.enter_async_context(
+        session.create_client("s3", region_name=AWS_REGION, endpoint_url=svc.endpoint_url)
+    )
+    await s3_client.create_bucket(
+        Bucket="benchmark-bucket",
+        CreateBucketConfiguration={"LocationConstraint": AWS_REGION},
+    )
+    return s3_client
+
+
+async def s3_benchmark_requests(s3_client, count: int):
+    for i in range(count):
+        await s3_client.put_object(Bucket="benchmark-bucket", Key=f"key_{i % 10}", Body=b"x")
+
+
+def run_s3_benchmark(benchmark, benchmark_loop, **service_kwargs):
+    stack = AsyncExitStack()
+    try:
+        s3_client = benchmark_loop.run_until_complete(
+            s3_benchmark_client(stack, **service_kwargs)
+        )
+
+        def requests():
+            start = time.perf_counter()
+            benchmark_loop.run_until_complete(
+                s3_benchmark_requests(s3_client, BENCHMARK_REQUESTS)
+            )
+            return BENCHMARK_REQUESTS / (time.perf_counter() - start)
+
+        requests_per_second = benchmark(requests)
+        benchmark.extra_info["requests_per_second"] = requests_per_second
+        assert requests_per_second > 0
+    finally:
+        benchmark_loop.run_until_complete(stack.aclose())
+
+
+@pytest.mark.parametrize(
+    "server_mode", [MOTO_SERVER_THREAD, MOTO_SERVER_ASYNCIO, MOTO_SERVER_INPROCESS]
+)
+def test_benchmark_server_mode(benchmark, benchmark_loop, server_mode):
+    run_s3_benchmark(benchmark, benchmark_loop, server_mode=server_mode)
+
+
+@pytest.mark.parametrize("keep_alive", [False, True])
+def test_benchmark_keep_alive(benchmark, benchmark_loop, keep_alive):
+    run_s3_benchmark(benchmark, benchmark_loop, keep_alive=keep_alive)
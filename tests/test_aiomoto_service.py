@@ -19,13 +19,27 @@ Test the aiohttp wrappers on moto.server, which run moto.server in a
 thread for each service (batch, s3, etc), using async/await wrappers
 to start and stop each server.
 """
+import asyncio
+import http.client
 import json
+import socket
 
 import aiohttp
+import moto.backends
 import pytest
 
 from pytest_aiomoto.aiomoto_services import AioMotoService
+from pytest_aiomoto.aiomoto_services import AioMotoServicePool
+from pytest_aiomoto.aiomoto_services import aio_moto_service
+from pytest_aiomoto.moto_services import MOTO_ALL_SERVICES
+from pytest_aiomoto.moto_services import MOTO_SERVER_ASYNCIO
+from pytest_aiomoto.moto_services import MOTO_SERVER_INPROCESS
+from pytest_aiomoto.moto_services import MOTO_SERVER_PROCESS
 from pytest_aiomoto.utils import AWS_HOST
+from pytest_aiomoto.utils import AWS_REGION
+from pytest_aiomoto.utils import get_free_tcp_port
+from pytest_aiomoto.utils import response_success
+from pytest_aiomoto.utils import xdist_port_range
 
 
 def test_moto_service():
@@ -73,6 +87,362 @@ async def test_moto_s3_service():
                 assert s3_xmlns in content
 
 
+@pytest.mark.asyncio
+async def test_moto_service_health_check():
+    async with AioMotoService("s3", health_check=True) as s3_service:
+        assert s3_service._ready.is_set()
+        assert await s3_service.aio_health_check()
+        assert s3_service.health_check()
+
+
+@pytest.mark.asyncio
+async def test_moto_service_start_error():
+    # the server thread signals the bind error, without waiting for a timeout
+    sckt, port = get_free_tcp_port()
+    sckt.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 0)
+    sckt.listen()
+    try:
+        with pytest.raises(Exception, match="Cannot start AioMotoService"):
+            async with AioMotoService("sqs", port=port):
+                pass
+        assert "sqs" not in AioMotoService._services
+    finally:
+        sckt.close()
+
+
+@pytest.mark.parametrize(
+    "server_mode", ["thread", MOTO_SERVER_PROCESS, MOTO_SERVER_ASYNCIO]
+)
+@pytest.mark.asyncio
+async def test_moto_service_socket(server_mode):
+    # the port is bound from the start, so no other socket can take it
+    service = AioMotoService("sqs", server_mode=server_mode)
+    sckt = service._socket
+    assert sckt.getsockname() == (AWS_HOST, service._port)
+    with pytest.raises(OSError):
+        socket.create_server((AWS_HOST, service._port))
+
+    async with service:
+        assert service._socket is None  # the server accepts connections on it
+        async with aiohttp.ClientSession() as session:
+            async with session.get(service.endpoint_url + "/static") as resp:
+                assert resp.status
+
+
+@pytest.mark.asyncio
+async def test_moto_service_pool(aio_aws_session):
+    pool = AioMotoServicePool()
+    try:
+        async with aio_moto_service("sns", moto_pool=pool) as sns_service:
+            assert "sns" in pool
+            assert "sns" not in AioMotoService._services
+            url = sns_service.endpoint_url
+            async with aio_aws_session.create_client("sns", endpoint_url=url) as client:
+                await client.create_topic(Name="pool-topic")
+
+        # the service lingers after use, with reset backends
+        assert sns_service._thread.is_alive()
+        async with aio_moto_service("sns", moto_pool=pool) as svc:
+            assert svc is sns_service
+            async with aio_aws_session.create_client("sns", endpoint_url=url) as client:
+                resp = await client.list_topics()
+                assert resp["Topics"] == []
+    finally:
+        pool.shutdown()
+
+    assert "sns" not in pool
+    assert not sns_service._thread.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_moto_service_pool_options():
+    # a service is pooled for its options, so other options get another server
+    pool = AioMotoServicePool()
+    try:
+        svc = await pool.aio_get("sqs")
+        assert await pool.aio_get("sqs") is svc
+        keep_alive = await pool.aio_get("sqs", keep_alive=True)
+        assert keep_alive is not svc
+        assert keep_alive._keep_alive and not svc._keep_alive
+        assert pool.get("sqs", keep_alive=True) is keep_alive
+        assert "sqs" in pool
+    finally:
+        pool.shutdown()
+    assert "sqs" not in pool
+    assert not svc._thread.is_alive()
+    assert not keep_alive._thread.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_moto_service_pool_asyncio():
+    # a pooled asyncio server runs on a loop thread, which outlives this loop
+    pool = AioMotoServicePool()
+    try:
+        services = await asyncio.gather(
+            *(pool.aio_get("sqs", server_mode=MOTO_SERVER_ASYNCIO) for _ in range(3))
+        )
+        svc = services[0]
+        assert all(other is svc for other in services)
+        assert svc._loop is not asyncio.get_running_loop()
+        assert svc._thread.is_alive()
+        async with aiohttp.ClientSession() as session:
+            async with session.get(svc.endpoint_url + "/static") as resp:
+                assert resp.status
+    finally:
+        pool.shutdown()
+    assert not svc._thread.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_moto_service_start_many():
+    service_names = ["ec2", "iam", "logs"]
+    services = await AioMotoService.start_many(service_names)
+    try:
+        assert [svc._service_name for svc in services] == service_names
+        assert len({svc.endpoint_url for svc in services}) == 3
+        for svc in services:
+            assert AioMotoService._services[svc._service_name] is svc
+            assert svc._refcount == 1
+            # another user of the service gets the running server
+            joining = AioMotoService(svc._service_name)
+            async with joining as other:
+                assert other is svc
+                assert svc._refcount == 2
+                assert joining._socket is None  # the joined service has the port
+            assert svc._refcount == 1
+    finally:
+        await AioMotoService.stop_many(services)
+
+    assert not any(name in AioMotoService._services for name in service_names)
+    assert not any(svc._thread.is_alive() for svc in services)
+
+
+@pytest.mark.asyncio
+async def test_moto_service_concurrent_enter():
+    # concurrent users of a service share one server, once it is started
+    starts = []
+
+    class CountingService(AioMotoService):
+        async def _aio_start(self):
+            starts.append(self._service_name)
+            await super()._aio_start()
+
+    async def enter():
+        svc = CountingService("sqs")
+        return svc, await svc.__aenter__()
+
+    entered = await asyncio.gather(*(enter() for _ in range(4)))
+    services = {svc for _, svc in entered}
+    assert len(starts) == 1
+    assert len(services) == 1
+    svc = services.pop()
+    assert svc._started.is_set() and svc._refcount == 4
+
+    for wrapper, _ in entered:
+        await wrapper.__aexit__(None, None, None)
+    assert "sqs" not in AioMotoService._services
+    assert not svc._thread.is_alive()
+
+
+@pytest.mark.asyncio
+async def test_moto_service_start_many_error():
+    sckt, port = get_free_tcp_port()
+    sckt.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 0)
+    sckt.listen()
+    try:
+        with pytest.raises(Exception, match="Cannot start AioMotoService"):
+            await AioMotoService.start_many(["sqs", "sns"], port=port)
+        assert "sqs" not in AioMotoService._services
+        assert "sns" not in AioMotoService._services
+    finally:
+        sckt.close()
+
+
+def test_xdist_port_range():
+    assert xdist_port_range(worker_id="master") is None
+    ports = [xdist_port_range(worker_id=f"gw{i}", worker_count=4) for i in range(4)]
+    assert all(len(p) == 2500 for p in ports)
+    assert [p.start for p in ports] == [20000, 22500, 25000, 27500]
+
+
+def test_xdist_inprocess_endpoints(monkeypatch):
+    # the ports that in-process services reserve are not taken by any other service
+    monkeypatch.setenv("PYTEST_XDIST_WORKER", "gw0")
+    monkeypatch.setenv("PYTEST_XDIST_WORKER_COUNT", "2")
+    services = [
+        AioMotoService("ec2", server_mode=MOTO_SERVER_INPROCESS),
+        AioMotoService("batch", server_mode=MOTO_SERVER_INPROCESS),
+        AioMotoService("iam"),
+    ]
+    try:
+        assert all(svc._port in xdist_port_range() for svc in services)
+        assert len({svc.endpoint_url for svc in services}) == 3
+    finally:
+        for svc in services:
+            svc._close_socket()
+
+
+@pytest.mark.asyncio
+async def test_moto_all_services(aio_aws_session):
+    async with AioMotoService(MOTO_ALL_SERVICES) as moto_service:
+        assert moto_service._server  # __aenter__ starts a moto.server
+        assert moto_service._main_app.service is None
+
+        # requests for any service are dispatched by the request signature
+        url = moto_service.endpoint_url
+        async with aio_aws_session.create_client("s3", endpoint_url=url) as s3_client:
+            resp = await s3_client.list_buckets()
+            assert response_success(resp)
+        async with aio_aws_session.create_client("batch", endpoint_url=url) as batch_client:
+            resp = await batch_client.describe_job_queues()
+            assert response_success(resp)
+            assert resp.get("jobQueues") == []
+
+        assert {"s3", "batch"} <= set(moto_service._main_app.app_instances)
+
+
+@pytest.mark.asyncio
+async def test_moto_all_services_process(aio_aws_session):
+    async with AioMotoService(MOTO_ALL_SERVICES, server_mode=MOTO_SERVER_PROCESS) as moto_service:
+        assert moto_service._ready.is_set()  # __aenter__ starts a server process
+        assert moto_service._server is None
+        assert moto_service._process.is_alive()
+
+        # the server process dispatches requests for any service
+        url = moto_service.endpoint_url
+        async with aio_aws_session.create_client("s3", endpoint_url=url) as s3_client:
+            resp = await s3_client.list_buckets()
+            assert response_success(resp)
+        async with aio_aws_session.create_client("batch", endpoint_url=url) as batch_client:
+            resp = await batch_client.describe_job_queues()
+            assert response_success(resp)
+            assert resp.get("jobQueues") == []
+
+
+@pytest.mark.asyncio
+async def test_moto_process_service(aio_aws_session):
+    async with AioMotoService("s3", server_mode=MOTO_SERVER_PROCESS) as s3_service:
+        assert s3_service._server is None  # the server is not in this process
+        assert s3_service._process.is_alive()
+
+        url = s3_service.endpoint_url
+        async with aio_aws_session.create_client("s3", endpoint_url=url) as s3_client:
+            resp = await s3_client.create_bucket(
+                Bucket="process-bucket",
+                CreateBucketConfiguration={"LocationConstraint": AWS_REGION},
+            )
+            assert response_success(resp)
+            # the bucket is in the server process backends, not this process
+            s3_backends = moto.backends.get_backend("s3")
+            assert all(
+                "process-bucket" not in backend.buckets
+                for account_backends in s3_backends.values()
+                for backend in account_backends.values()
+            )
+            resp = await s3_client.list_buckets()
+            assert [b["Name"] for b in resp["Buckets"]] == ["process-bucket"]
+
+            s3_service.reset()  # uses the moto-api reset endpoint
+            resp = await s3_client.list_buckets()
+            assert resp["Buckets"] == []
+
+        process = s3_service._process
+
+    assert not process.is_alive()
+    assert "s3" not in AioMotoService._services
+
+
+@pytest.mark.asyncio
+async def test_moto_asyncio_service(aio_aws_session):
+    async with AioMotoService("s3", server_mode=MOTO_SERVER_ASYNCIO) as s3_service:
+        assert s3_service._server is None  # there is no werkzeug server
+        assert s3_service._loop is None  # the server runs on this event loop
+        assert s3_service._runner
+
+        url = s3_service.endpoint_url
+        async with aio_aws_session.create_client("s3", endpoint_url=url) as s3_client:
+            resp = await s3_client.create_bucket(
+                Bucket="asyncio-bucket",
+                CreateBucketConfiguration={"LocationConstraint": AWS_REGION},
+            )
+            assert response_success(resp)
+            key = "asyncio key/with ünicode.txt"
+            resp = await s3_client.put_object(Bucket="asyncio-bucket", Key=key, Body=b"data")
+            assert response_success(resp)
+            resp = await s3_client.get_object(Bucket="asyncio-bucket", Key=key)
+            assert await resp["Body"].read() == b"data"
+            resp = await s3_client.head_object(Bucket="asyncio-bucket", Key=key)
+            assert resp["ContentLength"] == 4
+
+    assert s3_service._runner is None
+
+
+@pytest.mark.asyncio
+async def test_moto_inprocess_service(aio_aws_session):
+    async with AioMotoService("s3", server_mode=MOTO_SERVER_INPROCESS) as s3_service:
+        assert s3_service._server is None and s3_service._thread is None
+        assert await s3_service.aio_health_check()
+
+        # there is no server for any client without the in-process handler
+        with pytest.raises(ConnectionRefusedError):
+            socket.create_connection((AWS_HOST, s3_service._port))
+
+        url = s3_service.endpoint_url
+        async with aio_aws_session.create_client("s3", endpoint_url=url) as s3_client:
+            resp = await s3_client.create_bucket(
+                Bucket="inprocess-bucket",
+                CreateBucketConfiguration={"LocationConstraint": AWS_REGION},
+            )
+            assert response_success(resp)
+            body = b"in-process " * 1000
+            await s3_client.put_object(Bucket="inprocess-bucket", Key="ü/key", Body=body)
+
+            resp = await s3_client.head_object(Bucket="inprocess-bucket", Key="ü/key")
+            assert resp["ContentLength"] == len(body)
+
+            resp = await s3_client.get_object(Bucket="inprocess-bucket", Key="ü/key")
+            chunks = [chunk async for chunk in resp["Body"].iter_chunks(4096)]
+            assert b"".join(chunks) == body
+            assert [len(chunk) for chunk in chunks[:2]] == [4096, 4096]
+
+            with pytest.raises(s3_client.exceptions.NoSuchKey):
+                await s3_client.get_object(Bucket="inprocess-bucket", Key="missing")
+
+    assert not await s3_service.aio_health_check()
+
+
+def test_moto_asyncio_loop_thread():
+    # a synchronous start runs the asyncio server on an event loop thread
+    with AioMotoService("sqs", server_mode=MOTO_SERVER_ASYNCIO) as sqs_service:
+        assert sqs_service._loop.is_running()
+        assert sqs_service.health_check()
+    assert sqs_service._loop is None
+
+
+@pytest.mark.parametrize("keep_alive", [False, True])
+def test_moto_service_keep_alive(keep_alive):
+    with AioMotoService("sqs", keep_alive=keep_alive) as sqs_service:
+        conn = http.client.HTTPConnection(AWS_HOST, sqs_service._port, timeout=5)
+        try:
+            conn.request("GET", "/static")
+            resp = conn.getresponse()
+            resp.read()
+            assert resp.status == 404
+            assert resp.will_close is not keep_alive
+            # an unread request body is drained before the next request
+            conn.request("POST", "/static", body=b"unread request body")
+            resp = conn.getresponse()
+            resp.read()
+            assert resp.status == 404
+            conn.request("GET", "/?Action=ListQueues")
+            resp = conn.getresponse()
+            resp.read()
+            assert resp.status == 200
+            assert resp.will_close is not keep_alive
+        finally:
+            conn.close()
+
+
 # This test is not necessary to run every time, but might be useful later.
 # @pytest.mark.asyncio
 # async def test_moto_api_service():
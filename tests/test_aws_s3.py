@@ -12,6 +12,33 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import pickle
+
+import boto3
+import pytest
+
+from pytest_aiomoto.aws_s3 import create_s3_bucket
+from pytest_aiomoto.aws_s3 import create_s3_buckets
+from pytest_aiomoto.aws_s3 import create_s3_multipart_object
+from pytest_aiomoto.aws_s3 import create_s3_objects
+from pytest_aiomoto.aws_s3 import delete_s3_bucket
+from pytest_aiomoto.aws_s3 import delete_s3_prefix
+from pytest_aiomoto.moto_s3 import seed_s3_objects
+from pytest_aiomoto.moto_services import MOTO_SERVER_PROCESS
+from pytest_aiomoto.moto_services import MotoService
+from pytest_aiomoto.moto_services import moto_service_reset
+from pytest_aiomoto.s3_corpus import S3Corpus
+from pytest_aiomoto.s3_corpus_cache import S3CorpusCache
+from pytest_aiomoto.s3_corpus_cache import s3_corpus_cache
+from pytest_aiomoto.s3_multipart import S3_MULTIPART_PART_SIZE
+from pytest_aiomoto.s3_multipart import S3MultipartSource
+from pytest_aiomoto.s3_object import S3KeyIndex
+from pytest_aiomoto.s3_object import S3Object
+from pytest_aiomoto.s3_object import S3ObjectSet
+from pytest_aiomoto.s3_verify import S3_VERIFY_OFF
+from pytest_aiomoto.s3_verify import S3_VERIFY_SAMPLED
+from pytest_aiomoto.s3_verify import S3VerifyPolicy
+from pytest_aiomoto.s3_verify import s3_verify_policy
 from pytest_aiomoto.utils import response_success
 
 
@@ -19,4 +46,232 @@ def test_s3_list_buckets(aws_s3_client, s3_buckets):
     resp = aws_s3_client.list_buckets()
     assert response_success(resp)
     bucket_names = [b["Name"] for b in resp["Buckets"]]
-    assert bucket_names == s3_buckets
+    # the buckets are created concurrently, and moto lists them in that order
+    assert sorted(bucket_names) == s3_buckets
+
+
+def test_s3_temp_1000s_objects(aws_s3_client, s3_temp_1000s_objects, s3_temp_dir):
+    paginator = aws_s3_client.get_paginator("list_objects_v2")
+    keys = []
+    for page in paginator.paginate(Bucket=s3_temp_1000s_objects[0].bucket, Prefix=s3_temp_dir):
+        keys.extend(obj["Key"] for obj in page["Contents"])
+    assert sorted(keys) == sorted(s3_obj.key for s3_obj in s3_temp_1000s_objects)
+
+
+def test_s3_verify_policy():
+    policy = S3VerifyPolicy(S3_VERIFY_SAMPLED, sample=3)
+    policy.start_test("test_node")
+    assert [policy.verify(2) for _ in range(6)] == [True, False, False] * 2
+    policy.stop_test()
+    assert policy.test_stats["test_node"] == [4, 8]
+    assert policy.test_skipped("test_node") == 8
+    with policy.override(S3_VERIFY_OFF):
+        assert not policy.verify()
+    assert (policy.policy, policy.sample) == (S3_VERIFY_SAMPLED, 3)
+
+
+def test_s3_verify_policy_off(request, aws_s3_client, s3_bucket_name, aws_region):
+    skipped = s3_verify_policy.test_skipped(request.node.nodeid)
+    with s3_verify_policy.override(S3_VERIFY_OFF):
+        create_s3_bucket(s3_bucket_name, aws_s3_client, aws_region)
+        delete_s3_bucket(s3_bucket_name, aws_s3_client, drop=False)
+    assert s3_verify_policy.test_skipped(request.node.nodeid) == skipped + 4
+    assert aws_s3_client.list_buckets()["Buckets"] == []
+
+
+@pytest.mark.parametrize("drop", [True, False])
+def test_delete_s3_bucket(drop, aws_s3_client, s3_bucket_name, aws_region):
+    create_s3_bucket(s3_bucket_name, aws_s3_client, aws_region)
+    aws_s3_client.put_bucket_versioning(
+        Bucket=s3_bucket_name, VersioningConfiguration={"Status": "Enabled"}
+    )
+    objects = [(f"key-{i:04d}", b"v1") for i in range(1200)]
+    seed_s3_objects(s3_bucket_name, objects)
+    seed_s3_objects(s3_bucket_name, objects[:10])  # new versions
+    aws_s3_client.delete_object(Bucket=s3_bucket_name, Key="key-1199")  # a delete marker
+
+    delete_s3_bucket(s3_bucket_name, aws_s3_client, drop=drop)
+    assert aws_s3_client.list_buckets()["Buckets"] == []
+
+
+@pytest.mark.parametrize("seed", [True, False])
+def test_create_s3_objects(seed, aws_s3_client, s3_bucket):
+    objects = [(f"key-{i:04d}", f"body-{i}") for i in range(50)]
+    s3_objects = create_s3_objects(s3_bucket, objects, aws_s3_client, max_workers=4, seed=seed)
+    assert [s3_obj.key for s3_obj in s3_objects] == [key for key, _ in objects]
+    resp = aws_s3_client.get_object(Bucket=s3_bucket, Key="key-0049")
+    assert resp["Body"].read() == b"body-49"
+
+
+def test_create_s3_objects_server(aws_credentials, aws_region):
+    with MotoService("s3") as svc:
+        moto_service_reset("s3")
+        s3 = boto3.client("s3", region_name=aws_region, endpoint_url=svc.endpoint_url)
+        buckets = create_s3_buckets(["bulk-a", "bulk-b"], s3, aws_region, max_workers=2)
+        assert sorted(bucket["Name"] for bucket in s3.list_buckets()["Buckets"]) == buckets
+        objects = [(f"key-{i:04d}", b"body") for i in range(20)]
+        create_s3_objects("bulk-a", objects, s3, max_workers=4)
+        assert s3.list_objects_v2(Bucket="bulk-a")["KeyCount"] == 20
+        moto_service_reset("s3")
+
+
+def test_s3_corpus():
+    corpus = S3Corpus("bucket", "corpus/", 1000, fanout=4, depth=2, sizes=(0, 64), seed=7)
+    assert len(corpus) == 1000
+    assert corpus.key(5).startswith("corpus/d1/d1/obj_000005.")
+    assert len({key.rsplit("/", 1)[0] for key in corpus.keys()}) == 16
+    assert {key.rsplit(".", 1)[1] for key in corpus.keys()} == {"txt", "tif"}
+    assert all(0 <= size <= 64 for size in corpus.sizes)
+    # the listing and bodies are the same for the same seed
+    same = S3Corpus("bucket", "corpus", 1000, fanout=4, depth=2, sizes=(0, 64), seed=7)
+    assert same.keys() == corpus.keys()
+    assert [len(body) for _, body in corpus.objects()] == list(corpus.sizes)
+    assert same.body(999) == corpus.body(999)
+
+
+def test_s3_corpus_factory(aws_s3_client, s3_corpus_factory):
+    corpus = s3_corpus_factory(
+        count=1200, fanout=3, depth=2, extensions={"tif": 3, "json": 1}, sizes=lambda rng: 100
+    )
+    assert corpus.total_size == 1200 * 100
+    paginator = aws_s3_client.get_paginator("list_objects_v2")
+    listing = {}
+    for page in paginator.paginate(Bucket=corpus.bucket, Prefix=corpus.prefix):
+        listing.update((obj["Key"], obj["Size"]) for obj in page["Contents"])
+    assert listing == dict(zip(corpus.keys(), corpus.sizes))
+    resp = aws_s3_client.get_object(Bucket=corpus.bucket, Key=corpus.key(42))
+    assert resp["Body"].read() == corpus.body(42)
+
+
+def test_s3_corpus_cache(tmp_path):
+    cache = S3CorpusCache(tmp_path)
+    corpus = S3Corpus("bucket", "prefix", 100, sizes=(0, 512), seed=7)
+    with cache.open(corpus) as pack:
+        assert all(pack.body(i) == corpus.body(i) for i in range(len(corpus)))
+    # the digest is for the bodies, not the keys
+    other = S3Corpus("other", "other", 100, fanout=3, sizes=(0, 512), seed=7)
+    assert cache.path(other) == cache.path(corpus)
+    with cache.open(other) as pack:
+        key, body = next(pack.objects())
+        assert key == other.key(0)
+        assert body == other.body(0)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.path(S3Corpus("bucket", "prefix", 100, seed=8)) != cache.path(corpus)
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_s3_corpus_factory_cache(aws_s3_client, s3_corpus_factory, tmp_path):
+    with s3_corpus_cache.override(tmp_path):
+        for _ in range(2):
+            corpus = s3_corpus_factory(count=200, seed=3)
+            resp = aws_s3_client.get_object(Bucket=corpus.bucket, Key=corpus.key(42))
+            assert resp["Body"].read() == corpus.body(42)
+        assert len(list(tmp_path.glob("*.pack"))) == 1
+
+
+def test_s3_object_set():
+    keys = ["b/x/2.txt", "a/1.txt", "b/x/1.txt", "b/y/1.txt", "c.txt"]
+    object_set = S3ObjectSet("bucket", keys)
+    assert len(object_set) == 5
+    assert object_set[1] == S3Object(bucket="bucket", key="a/1.txt")
+    assert object_set[-1].key == "c.txt"
+    assert object_set == [S3Object(bucket="bucket", key=key) for key in keys]
+    assert [s3_obj.key for s3_obj in object_set.with_prefix("b/x/")] == ["b/x/1.txt", "b/x/2.txt"]
+    assert object_set.with_prefix("d") == []
+    assert S3Object(bucket="bucket", key="b/y/1.txt") in object_set
+    assert S3Object(bucket="bucket", key="b/y") not in object_set
+
+    restored = pickle.loads(pickle.dumps(object_set))
+    assert restored == object_set
+    restored.append("b/x/0.txt")
+    assert restored.with_prefix("b/x/")[0].key == "b/x/0.txt"
+    with pytest.raises(ValueError):
+        restored.append(S3Object(bucket="other", key="a/2.txt"))
+
+
+def test_s3_multipart_source(s3_source_file_factory):
+    source = s3_source_file_factory(2 * 2**20 + 1, seed=3)
+    data = source.read_bytes()
+    assert data == s3_source_file_factory(2 * 2**20 + 1, seed=3).read_bytes()
+    with S3MultipartSource(source) as s3_source:
+        assert len(s3_source) == len(data)
+        sizes = []
+        for part_number, part in s3_source.parts(2**20):
+            with part:
+                assert isinstance(part, memoryview)
+                offset = (part_number - 1) * 2**20
+                assert part == data[offset : offset + 2**20]
+                sizes.append(len(part))
+        assert sizes == [2**20, 2**20, 1]
+
+
+def test_s3_multipart_factory(aws_s3_client, s3_multipart_factory):
+    size = 12 * S3_MULTIPART_PART_SIZE + 1024
+    upload = s3_multipart_factory(size=size)
+    assert upload.size == size
+    assert upload.parts == 13
+    assert upload.memory_peak is None
+    assert upload.mib_per_second > 0
+    resp = aws_s3_client.head_object(Bucket=upload.s3_object.bucket, Key=upload.s3_object.key)
+    assert resp["ContentLength"] == size
+
+
+def test_create_s3_multipart_object_process(aws_credentials, aws_region, s3_source_file_factory):
+    # the upload of 13 parts does not buffer more than 2 parts in the client;
+    # a server process keeps the copies of the moto backend out of the ceiling
+    size = 12 * S3_MULTIPART_PART_SIZE + 1024
+    source = s3_source_file_factory(size)
+    with MotoService("s3", server_mode=MOTO_SERVER_PROCESS) as svc:
+        s3 = boto3.client("s3", region_name=aws_region, endpoint_url=svc.endpoint_url)
+        create_s3_bucket("multipart-bucket", s3, aws_region)
+        upload = create_s3_multipart_object(
+            "multipart-bucket",
+            "multipart.bin",
+            source,
+            s3,
+            memory_limit=2 * S3_MULTIPART_PART_SIZE,
+        )
+        assert upload.parts == 13
+        assert upload.memory_peak <= 2 * S3_MULTIPART_PART_SIZE
+        resp = s3.head_object(Bucket="multipart-bucket", Key="multipart.bin")
+        assert resp["ContentLength"] == size
+
+
+def test_create_s3_multipart_object_abort(aws_s3_client, s3_bucket, s3_source_file_factory):
+    source = s3_source_file_factory(2 * S3_MULTIPART_PART_SIZE)
+    with pytest.raises(AssertionError, match="memory peak"):
+        create_s3_multipart_object(
+            s3_bucket, "aborted.bin", source, aws_s3_client, memory_limit=1024
+        )
+    resp = aws_s3_client.list_multipart_uploads(Bucket=s3_bucket)
+    assert not resp.get("Uploads")
+
+
+def test_s3_key_index():
+    key_index = S3KeyIndex()
+    key_index.add("bucket", ["a/1.txt", "a/2.txt", "b/1.txt"])
+    key_index.add("bucket", [S3Object(bucket="bucket", key="a/1.txt")])
+    key_index.add("other", ["a/1.txt"])
+    assert len(key_index) == 5
+    assert key_index.pop_prefix("bucket", "a/") == ["a/1.txt", "a/2.txt"]
+    assert key_index.pop_prefix("bucket", "a/") == []
+    assert key_index.pop_prefix("missing", "a/") == []
+    assert len(key_index) == 2
+
+
+@pytest.mark.parametrize("test_key", [False, True])
+def test_delete_s3_prefix_key_index(
+    test_key, aws_s3_client, s3_bucket, s3_temp_dir, s3_temp_objects, s3_key_index
+):
+    listings = []
+    aws_s3_client.meta.events.register(
+        "before-call.s3.ListObjectsV2", lambda **kwargs: listings.append(kwargs)
+    )
+    if test_key:
+        # a key that a test wrote is not in the index
+        aws_s3_client.put_object(Bucket=s3_bucket, Key=f"{s3_temp_dir}/test.txt", Body=b"test")
+    delete_s3_prefix(aws_s3_client, s3_bucket, s3_temp_dir, key_index=s3_key_index)
+    assert len(s3_key_index) == 0
+    assert len(listings) == (1 if test_key else 0)
+    resp = aws_s3_client.list_objects_v2(Bucket=s3_bucket, Prefix=s3_temp_dir)
+    assert resp["KeyCount"] == 0
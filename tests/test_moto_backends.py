@@ -0,0 +1,212 @@
+# Copyright 2019-2023 Darren Weber
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the tracking, snapshots, resets and account isolation of moto backends
+"""
+
+import moto.backends
+import pytest
+from moto.core import DEFAULT_ACCOUNT_ID
+
+from pytest_aiomoto.moto_backends import account_isolation
+from pytest_aiomoto.moto_backends import backend_tracking
+from pytest_aiomoto.moto_backends import dirty_backends
+from pytest_aiomoto.moto_backends import discard_isolated_accounts
+from pytest_aiomoto.moto_backends import isolated_account
+from pytest_aiomoto.moto_backends import new_isolated_account
+from pytest_aiomoto.moto_backends import reset_stats
+from pytest_aiomoto.moto_backends import restore_backends
+from pytest_aiomoto.moto_backends import retire_isolated_account
+from pytest_aiomoto.moto_backends import start_account_isolation
+from pytest_aiomoto.moto_backends import start_backend_tracking
+from pytest_aiomoto.moto_backends import stop_account_isolation
+from pytest_aiomoto.moto_backends import stop_backend_tracking
+from pytest_aiomoto.moto_services import MOTO_ALL_SERVICES
+from pytest_aiomoto.moto_services import MOTO_SERVER_PROCESS
+from pytest_aiomoto.moto_services import MotoResetCoordinator
+from pytest_aiomoto.moto_services import MotoService
+from pytest_aiomoto.moto_services import moto_service_backends
+from pytest_aiomoto.moto_services import moto_service_reset
+from pytest_aiomoto.moto_services import moto_service_snapshot
+
+
+@pytest.fixture
+def backend_tracking_enabled():
+    tracking = backend_tracking()
+    start_backend_tracking()
+    yield
+    if not tracking:
+        stop_backend_tracking()
+
+
+def test_moto_backend_tracking(backend_tracking_enabled):
+    sqs_backends = moto.backends.get_backend("sqs")[DEFAULT_ACCOUNT_ID]
+    west_backend = sqs_backends["us-west-2"]
+    east_backend = sqs_backends["us-east-1"]
+    west_backend.create_queue("west-queue")
+    east_backend.create_queue("east-queue")
+    assert ("sqs", DEFAULT_ACCOUNT_ID, "us-west-2") in dirty_backends()
+    assert ("sqs", DEFAULT_ACCOUNT_ID, "us-east-1") in dirty_backends()
+
+    resets = reset_stats["sqs"][0]
+    moto_service_reset("sqs")
+    assert not any(key[0] == "sqs" for key in dirty_backends())
+    assert reset_stats["sqs"][0] >= resets + 2
+    # any access marks a backend as dirty, so use the dict without tracking
+    assert dict.__getitem__(sqs_backends, "us-west-2").queues == {}
+    assert dict.__getitem__(sqs_backends, "us-east-1").queues == {}
+
+    # only the backend that is used again is reset again
+    sqs_backends["us-west-2"].create_queue("west-queue")
+    east_backend = dict.__getitem__(sqs_backends, "us-east-1")
+    east_backend.create_queue("east-queue")
+    resets = reset_stats["sqs"][0]
+    moto_service_reset("sqs")
+    assert reset_stats["sqs"][0] == resets + 1
+    assert dict.__getitem__(sqs_backends, "us-west-2").queues == {}
+    assert list(east_backend.queues) == ["east-queue"]
+    east_backend.reset()
+
+
+def test_moto_backend_tracking_stop():
+    tracking = backend_tracking()
+    start_backend_tracking()
+    assert backend_tracking()
+    stop_backend_tracking()
+    assert not backend_tracking()
+    assert dirty_backends() == set()
+    if tracking:
+        start_backend_tracking()
+
+
+def test_moto_backend_snapshot():
+    sqs_backends = moto.backends.get_backend("sqs")[DEFAULT_ACCOUNT_ID]
+    backend = sqs_backends["us-west-2"]
+    backend.create_queue("snapshot-queue")
+    snapshot = moto_service_snapshot(["sqs"])
+    assert ("sqs", DEFAULT_ACCOUNT_ID, "us-west-2") in snapshot
+
+    backend.create_queue("test-queue")
+    backend.delete_queue("snapshot-queue")
+    restore_backends(snapshot)
+    # the backend object is restored, so the cached backend is still valid
+    assert sqs_backends["us-west-2"] is backend
+    assert list(backend.queues) == ["snapshot-queue"]
+
+    # a snapshot is not changed by the backends that are restored from it
+    backend.queues["snapshot-queue"].visibility_timeout = 120
+    restore_backends(snapshot)
+    assert backend.queues["snapshot-queue"].visibility_timeout != 120
+    moto_service_reset("sqs")
+    assert backend.queues == {}
+
+
+def test_moto_backend_snapshot_shared_objects():
+    ec2_backend = moto.backends.get_backend("ec2")[DEFAULT_ACCOUNT_ID]["us-west-2"]
+    vpc = ec2_backend.create_vpc("172.30.0.0/24")
+    subnet = ec2_backend.create_subnet(vpc.id, "172.30.0.0/25", availability_zone="us-west-2a")
+    snapshot = moto_service_snapshot(["ec2"])
+    moto_service_reset("ec2")
+    assert vpc.id not in ec2_backend.vpcs
+
+    restore_backends(snapshot)
+    assert vpc.id in ec2_backend.vpcs
+    # a model refers to the backend that is restored, not a copy of it
+    restored_subnet = ec2_backend.get_subnet(subnet.id)
+    assert restored_subnet.ec2_backend is ec2_backend
+    # the subnet IP generator is shared by the snapshot and the backend
+    eni = ec2_backend.create_network_interface(restored_subnet, private_ip_address=None)
+    assert eni.private_ip_address.startswith("172.30.0.")
+    moto_service_reset("ec2")
+
+
+def test_moto_backend_snapshot_wrapped_backends():
+    # moto serves batch with the batch_simple backends, which wrap the batch backends
+    backend_names = [
+        backend_dict.backend.__name__ for backend_dict in moto_service_backends("batch")
+    ]
+    assert backend_names == ["BatchSimpleBackend", "BatchBackend"]
+
+
+def test_moto_backend_snapshot_process():
+    svc = MotoService("sqs", server_mode=MOTO_SERVER_PROCESS)
+    with pytest.raises(RuntimeError):
+        svc.snapshot()
+    svc._socket.close()
+
+
+@pytest.fixture
+def account_isolation_enabled():
+    isolation = account_isolation()
+    start_account_isolation()
+    yield
+    retire_isolated_account()
+    discard_isolated_accounts(moto_service_backends("sqs"))
+    if not isolation:
+        stop_account_isolation()
+
+
+def test_moto_account_isolation(account_isolation_enabled):
+    sqs_backends = moto.backends.get_backend("sqs")
+    first_account = new_isolated_account()
+    assert isolated_account() == first_account
+    sqs_backends[first_account]["us-west-2"].create_queue("first-queue")
+    # a new account copies the regions from another account
+    assert sqs_backends[first_account].regions == sqs_backends[DEFAULT_ACCOUNT_ID].regions
+
+    second_account = new_isolated_account()
+    assert second_account != first_account
+    second_backend = sqs_backends[second_account]["us-west-2"]
+    assert second_backend.queues == {}
+    second_backend.create_queue("second-queue")
+
+    # only the backends for the account of the current test are reset
+    moto_service_reset("sqs")
+    assert second_backend.queues == {}
+    first_backend = dict.__getitem__(sqs_backends[first_account], "us-west-2")
+    assert list(first_backend.queues) == ["first-queue"]
+
+    # the backends for previous accounts are discarded
+    retire_isolated_account()
+    assert discard_isolated_accounts(moto_service_backends("sqs")) == 2
+    assert first_account not in dict.keys(sqs_backends)
+    assert second_account not in dict.keys(sqs_backends)
+
+
+def test_moto_reset_coordinator():
+    coordinator = MotoResetCoordinator()
+    sqs_backends = moto.backends.get_backend("sqs")[DEFAULT_ACCOUNT_ID]
+    sqs_backend = sqs_backends["us-west-2"]
+    sqs_backend.create_queue("coordinated-queue")
+
+    coordinator.start_phase("test_node", "teardown")
+    assert coordinator.reset("sqs")
+    assert sqs_backend.queues == {}
+    # a reset is only done once in a test phase
+    sqs_backends["us-west-2"].create_queue("coordinated-queue")
+    assert not coordinator.reset("sqs")
+    assert list(sqs_backend.queues) == ["coordinated-queue"]
+    assert coordinator.reset(MOTO_ALL_SERVICES)
+    assert not coordinator.reset("s3")
+    coordinator.stop_phase()
+
+    requests, resets, seconds = coordinator.test_resets("test_node")
+    assert (requests, resets) == (4, 2)
+    assert seconds > 0
+    # every reset is done outside of a test phase
+    sqs_backends["us-west-2"].create_queue("coordinated-queue")
+    assert coordinator.reset("sqs")
+    assert sqs_backend.queues == {}
+    assert coordinator.test_resets("test_node")[0] == 4
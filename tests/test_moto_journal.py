@@ -0,0 +1,116 @@
+# Copyright 2019-2023 Darren Weber
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the journal and rollback of the requests that mutate moto backends
+"""
+
+import boto3
+import moto.backends
+import pytest
+from moto.core import DEFAULT_ACCOUNT_ID
+
+from pytest_aiomoto.moto_journal import is_mutation
+from pytest_aiomoto.moto_journal import s3_bucket_key
+from pytest_aiomoto.moto_journal import s3_delete_keys
+from pytest_aiomoto.moto_s3 import seed_s3_object
+from pytest_aiomoto.moto_services import MotoService
+from pytest_aiomoto.moto_services import moto_journal
+from pytest_aiomoto.moto_services import moto_service_reset
+
+
+@pytest.fixture
+def journal_enabled():
+    enabled = moto_journal.enabled
+    moto_journal.start()
+    yield moto_journal
+    if not enabled:
+        moto_journal.stop()
+
+
+@pytest.fixture
+def s3_journal_server(aws_credentials, aws_region):
+    with MotoService("s3") as svc:
+        moto_service_reset("s3")
+        yield svc
+        moto_service_reset("s3")
+
+
+def test_moto_journal_requests():
+    assert not is_mutation({"REQUEST_METHOD": "GET", "PATH_INFO": "/bucket/key"})
+    assert is_mutation({"REQUEST_METHOD": "PUT", "PATH_INFO": "/bucket/key"})
+    assert not is_mutation(
+        {"REQUEST_METHOD": "POST", "HTTP_X_AMZ_TARGET": "Logs_20140328.DescribeLogGroups"}
+    )
+    assert is_mutation({"REQUEST_METHOD": "POST", "QUERY_STRING": "Action=RunInstances"})
+    assert not is_mutation({"REQUEST_METHOD": "POST", "PATH_INFO": "/v1/describejobqueues"})
+    assert is_mutation({"REQUEST_METHOD": "POST", "PATH_INFO": "/v1/submitjob"})
+
+    environ = {"PATH_INFO": "/bucket/a/key", "HTTP_HOST": "127.0.0.1:5000"}
+    assert s3_bucket_key(environ) == ("bucket", "a/key")
+    environ = {"PATH_INFO": "/a/key", "HTTP_HOST": "bucket.s3.us-west-2.amazonaws.com"}
+    assert s3_bucket_key(environ) == ("bucket", "a/key")
+    body = b"<Delete><Object><Key>a</Key></Object><Object><Key>b</Key></Object></Delete>"
+    assert s3_delete_keys(body) == ["a", "b"]
+
+
+def test_moto_journal_s3_rollback(journal_enabled, s3_journal_server, aws_region):
+    s3 = boto3.client("s3", region_name=aws_region, endpoint_url=s3_journal_server.endpoint_url)
+    location = {"LocationConstraint": aws_region}
+
+    # the resources created while the journal is paused are not journaled
+    journal_enabled.pause("corpus")
+    s3.create_bucket(Bucket="corpus-bucket", CreateBucketConfiguration=location)
+    s3.put_object(Bucket="corpus-bucket", Key="a", Body=b"corpus-a")
+    s3.put_object(Bucket="corpus-bucket", Key="b", Body=b"corpus-b")
+    journal_enabled.resume("corpus")
+
+    s3.put_object(Bucket="corpus-bucket", Key="a", Body=b"changed")
+    s3.put_object(Bucket="corpus-bucket", Key="c", Body=b"new")
+    s3.delete_objects(Bucket="corpus-bucket", Delete={"Objects": [{"Key": "b"}]})
+    s3.put_bucket_tagging(
+        Bucket="corpus-bucket", Tagging={"TagSet": [{"Key": "test", "Value": "tag"}]}
+    )
+    s3.create_bucket(Bucket="test-bucket", CreateBucketConfiguration=location)
+    # a direct write to the backend is journaled too
+    seed_s3_object("corpus-bucket", "d", b"seeded")
+    assert journal_enabled.services() == {"s3"}
+
+    assert journal_enabled.rollback() == 1
+    assert journal_enabled.services() == set()
+    buckets = [bucket["Name"] for bucket in s3.list_buckets()["Buckets"]]
+    assert buckets == ["corpus-bucket"]
+    keys = [obj["Key"] for obj in s3.list_objects_v2(Bucket="corpus-bucket")["Contents"]]
+    assert keys == ["a", "b"]
+    assert s3.get_object(Bucket="corpus-bucket", Key="a")["Body"].read() == b"corpus-a"
+    with pytest.raises(s3.exceptions.ClientError):
+        s3.get_bucket_tagging(Bucket="corpus-bucket")  # NoSuchTagSet
+
+
+def test_moto_journal_service_rollback(journal_enabled, aws_credentials, aws_region):
+    with MotoService("sqs") as svc:
+        moto_service_reset("sqs")
+        sqs = boto3.client("sqs", region_name=aws_region, endpoint_url=svc.endpoint_url)
+        sqs.create_queue(QueueName="test-queue")
+        assert journal_enabled.services() == {"sqs"}
+
+        # a reset discards the journal for a service
+        journal_enabled.rollback()
+        assert sqs.list_queues().get("QueueUrls", []) == []
+        sqs.create_queue(QueueName="test-queue")
+        moto_service_reset("sqs")
+        assert journal_enabled.services() == set()
+
+    sqs_backend = moto.backends.get_backend("sqs")[DEFAULT_ACCOUNT_ID][aws_region]
+    assert sqs_backend.queues == {}
@@ -0,0 +1,61 @@
+# Copyright 2019-2023 Darren Weber
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the seeding of moto s3 backends
+"""
+
+import boto3
+import pytest
+
+from pytest_aiomoto.moto_s3 import seed_s3_bucket
+from pytest_aiomoto.moto_s3 import seed_s3_object
+from pytest_aiomoto.moto_s3 import seed_s3_objects
+from pytest_aiomoto.moto_services import MOTO_SERVER_PROCESS
+from pytest_aiomoto.moto_services import MotoService
+from pytest_aiomoto.moto_services import moto_service_reset
+from pytest_aiomoto.s3_object import S3Object
+
+
+def test_seed_s3_mocks(aws_s3_client, aws_region):
+    bucket = seed_s3_bucket("seed-bucket", aws_region)
+    s3_obj = seed_s3_object(bucket, "a/key", "text")
+    assert s3_obj == S3Object(bucket="seed-bucket", key="a/key")
+    resp = aws_s3_client.get_object(Bucket=bucket, Key="a/key")
+    assert resp["Body"].read() == b"text"
+    grants = aws_s3_client.get_bucket_acl(Bucket=bucket)["Grants"]
+    # like create_s3_bucket, the bucket has a public-read-write ACL
+    assert any(grant["Grantee"].get("URI", "").endswith("AllUsers") for grant in grants)
+
+
+def test_seed_s3_server(aws_credentials, aws_region):
+    with MotoService("s3") as svc:
+        bucket = seed_s3_bucket("seed-bucket", aws_region, moto_server=svc)
+        objects = ((f"key-{i:04d}", f"body-{i}".encode()) for i in range(1500))
+        s3_objects = seed_s3_objects(bucket, objects, moto_server=svc)
+        assert len(s3_objects) == 1500
+
+        s3 = boto3.client("s3", region_name=aws_region, endpoint_url=svc.endpoint_url)
+        paginator = s3.get_paginator("list_objects_v2")
+        counts = [page["KeyCount"] for page in paginator.paginate(Bucket=bucket)]
+        assert counts == [1000, 500]
+        assert s3.get_object(Bucket=bucket, Key="key-1499")["Body"].read() == b"body-1499"
+        moto_service_reset("s3")
+
+
+def test_seed_s3_process():
+    svc = MotoService("s3", server_mode=MOTO_SERVER_PROCESS)
+    with pytest.raises(RuntimeError):
+        seed_s3_bucket("seed-bucket", "us-west-2", moto_server=svc)
+    svc._socket.close()
@@ -25,3 +25,77 @@ def test_aio_aws_package():
 
 def test_aio_aws_version():
     assert pytest_aiomoto.VERSION == pytest_aiomoto.version.__version__
+
+
+def test_aiomoto_preload(pytester):
+    # the preload starts the pooled server while pytest collects the tests
+    pytester.makepyfile(
+        """
+        from pytest_aiomoto.aiomoto_services import aio_moto_service_pool
+        from pytest_aiomoto.plugin import aiomoto_preload_key
+
+        def test_preload(pytestconfig):
+            pytestconfig.stash[aiomoto_preload_key].join()
+            assert "sqs" in aio_moto_service_pool
+        """
+    )
+    # a subprocess has its own pool, which is shut down when the session finishes
+    result = pytester.runpytest_subprocess(
+        "-p", "no:cacheprovider", "--aiomoto-preload=sqs", "--aiomoto-server-pool"
+    )
+    result.assert_outcomes(passed=1)
+
+
+def test_aiomoto_batch_snapshot(pytester):
+    # the second test of each kind restores the snapshot of the first test
+    pytester.makepyfile(
+        """
+        import pytest
+
+        described = {}
+
+        def describe(batch):
+            queues = batch.describe_job_queues()["jobQueues"]
+            compute_envs = batch.describe_compute_environments()["computeEnvironments"]
+            return (
+                sorted((q["jobQueueName"], q["jobQueueArn"], q["state"]) for q in queues),
+                sorted((c["computeEnvironmentName"], c["computeEnvironmentArn"]) for c in compute_envs),
+            )
+
+        @pytest.mark.parametrize("run", [1, 2])
+        def test_batch(run, aws_batch_infrastructure, aws_batch_snapshots):
+            batch = aws_batch_infrastructure.aws_clients.batch
+            assert aws_batch_infrastructure.aws_region in aws_batch_snapshots
+            queues, compute_envs = described.setdefault("batch", describe(batch))
+            assert describe(batch) == (queues, compute_envs)
+            assert queues == [(
+                aws_batch_infrastructure.job_queue_name,
+                aws_batch_infrastructure.job_queue_arn,
+                "ENABLED",
+            )]
+            assert compute_envs == [(
+                aws_batch_infrastructure.compute_env_name,
+                aws_batch_infrastructure.compute_env_arn,
+            )]
+
+        @pytest.mark.asyncio
+        @pytest.mark.parametrize("run", [1, 2])
+        async def test_aio_batch(run, aio_aws_batch_infrastructure, aio_aws_batch_snapshots):
+            batch = aio_aws_batch_infrastructure.aio_aws_clients.batch
+            assert aio_aws_batch_infrastructure.aws_region in aio_aws_batch_snapshots
+            queues = (await batch.describe_job_queues())["jobQueues"]
+            compute_envs = (await batch.describe_compute_environments())["computeEnvironments"]
+            result = (
+                sorted((q["jobQueueName"], q["jobQueueArn"], q["state"]) for q in queues),
+                sorted((c["computeEnvironmentName"], c["computeEnvironmentArn"]) for c in compute_envs),
+            )
+            assert result == described.setdefault("aio_batch", result)
+            assert result[0] == [(
+                aio_aws_batch_infrastructure.job_queue_name,
+                aio_aws_batch_infrastructure.job_queue_arn,
+                "ENABLED",
+            )]
+        """
+    )
+    result = pytester.runpytest_subprocess("-p", "no:cacheprovider", "--aiomoto-batch-snapshot")
+    result.assert_outcomes(passed=4)